@@ -0,0 +1,448 @@
+"""ASGI entry point: I/O-bound routes served natively async, everything else by Flask.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+``POST /generate`` (JSON clients), ``POST /analytics/<slug>``,
+``POST /feedback/<slug>`` and ``GET /feedback-summary/<slug>`` await
+AsyncOpenAI and an async SQLAlchemy engine (asyncpg for PostgreSQL,
+aiosqlite for SQLite) on the event loop instead of holding a thread.
+Other requests go to the Flask app on a thread pool of WSGI_THREADS.
+Needs uvicorn, greenlet and the async driver installed.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.formparser import FormDataParser
+from werkzeug.http import parse_accept_header, parse_options_header
+
+import logsetup
+import main
+from cache import engagement_cache
+from dbmetrics import db_metrics, engine_options
+from ingest import analytics_ingest
+from jobs import generation_jobs, JobCancelled
+from llm import make_async_client
+from metrics import http_request_duration
+from model_router import answered_by
+from models import db, CVFeedback, CVRollup
+from retention import retention_cutoff
+from rollups import apply_feedback, summarize, unique_visitors_query
+
+logger = logging.getLogger(__name__)
+
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", 8))
+
+# Async drivers for the sync DATABASE_URL schemes; ASYNC_DATABASE_URL overrides
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+async_client = make_async_client()
+
+
+def async_database_url(database_url):
+    """The async-driver equivalent of a sync SQLAlchemy URL."""
+    scheme, _, rest = database_url.partition('://')
+    driver = ASYNC_DRIVERS.get(scheme.split('+', 1)[0])
+    if driver is None:
+        raise RuntimeError(f"No async driver for {scheme}; set ASYNC_DATABASE_URL")
+    url = f"{driver}://{rest}"
+    if driver == 'postgresql+asyncpg':
+        # asyncpg spells libpq's sslmode as ssl
+        parts = urlsplit(url)
+        query = [('ssl' if key == 'sslmode' else key, value) for key, value in parse_qsl(parts.query)]
+        url = urlunsplit(parts._replace(query=urlencode(query)))
+    return url
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the async handlers read."""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.body = body
+        self.headers = {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope['headers']}
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin1')))
+        client = scope.get('client')
+        self.remote_addr = client[0] if client else None
+
+    @property
+    def mimetype(self):
+        return parse_options_header(self.headers.get('content-type', ''))[0]
+
+    def get_json(self):
+        """Parsed JSON body, or None unless it was sent as application/json."""
+        if self.mimetype != 'application/json':
+            return None
+        return json.loads(self.body or b'null')
+
+    def form(self):
+        mimetype, options = parse_options_header(self.headers.get('content-type', ''))
+        _, form, _ = FormDataParser().parse(io.BytesIO(self.body), mimetype, len(self.body), options)
+        return form
+
+    def wants_json(self):
+        return parse_accept_header(self.headers.get('accept'), MIMEAccept).best == 'application/json'
+
+
+class WSGIBridge:
+    """Runs the Flask app for an ASGI request on a thread pool.
+
+    Response chunks are forwarded as the WSGI iterable yields them, so
+    server-sent events keep streaming.
+    """
+
+    def __init__(self, wsgi_app, threads=WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, body, send):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._run, scope, body, send, loop)
+
+    def _run(self, scope, body, send, loop):
+        def push(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start['message'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+            }
+
+        result = self.wsgi_app(_environ(scope, body), start_response)
+        try:
+            started = False
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not started:
+                    push(start['message'])
+                    started = True
+                push({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                push(start['message'])
+            push({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def _environ(scope, body):
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf8').decode('latin1'),
+        'PATH_INFO': path.encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        environ[key] = f"{environ[key]}{'; ' if key == 'HTTP_COOKIE' else ','}{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def in_app_context(fn, *args):
+    """Run sync app code (profile store, completion cache) on a thread with an app context."""
+    def call():
+        with main.app.app_context():
+            return fn(*args)
+    return await asyncio.to_thread(call)
+
+
+async def generate_summary(job, form):
+    """``main.run_generation`` awaiting AsyncOpenAI instead of blocking a worker thread"""
+    logsetup.bind(job_id=job.id)
+    try:
+        logger.info("Starting CV generation for %s at %s", form['job'], form['company'])
+        messages = main.generation_messages(form['job'], form['company'], form['summary'])
+
+        # Identical requests reuse the cached completion unless the user asked for a fresh one
+        if form.get('bypass_cache'):
+            main.completion_cache.record_bypass()
+            cached = None
+        else:
+            cached = await in_app_context(main.completion_cache.get, form['model'], messages)
+
+        job.set_stage('generating')
+        if form.get('stream'):
+            rewritten = await stream_summary(job, form['model'], messages, cached)
+        else:
+            if cached is not None:
+                ai_content = cached
+            else:
+                response = await async_client.chat.completions.create(model=form['model'], messages=messages)
+                ai_content = response.choices[0].message.content.strip()
+                await in_app_context(main.completion_cache.set, answered_by(response, form['model']), messages, ai_content)
+            job.set_stage('humanizing')
+            rewritten = main.humanize_text(ai_content)
+
+        job.check_cancelled()
+        job.set_stage('saving')
+        slug = await in_app_context(
+            main.save_profile, form['name'], form['job'], form['company'], rewritten, form['skills'], form['video']
+        )
+        return {'slug': slug, 'funnel_style': form['funnel_style']}
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        raise main.generation_failure(e) from e
+
+
+async def stream_summary(job, model, messages, cached=None):
+    """``main.stream_summary`` over an AsyncOpenAI stream"""
+    summary = main.SummaryStream(job)
+    if cached is not None:
+        summary.feed(cached)
+        return summary.finish()
+
+    stream = await async_client.chat.completions.create(model=model, messages=messages, stream=True)
+    try:
+        async for chunk in stream:
+            if chunk.choices:
+                summary.feed(chunk.choices[0].delta.content)
+    finally:
+        # Stop the upstream request early when the job is cancelled
+        await stream.aclose()
+
+    rewritten = summary.finish()
+    await in_app_context(main.completion_cache.set, answered_by(stream, model), messages, summary.text)
+    return rewritten
+
+
+class AsyncApp:
+    """ASGI application: async handlers for a few routes, Flask for the rest."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIBridge(flask_app)
+        self.engine = None
+        self.sessions = None
+        self.routes = [
+            ('POST', re.compile(r'^/generate$'), '/generate', self.generate),
+            ('POST', re.compile(r'^/analytics/(?P<slug>[^/]+)$'), '/analytics/<slug>', self.track_analytics),
+            ('POST', re.compile(r'^/feedback/(?P<slug>[^/]+)$'), '/feedback/<slug>', self.submit_feedback),
+            ('GET', re.compile(r'^/feedback-summary/(?P<slug>[^/]+)$'), '/feedback-summary/<slug>', self.feedback_summary),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        body = await _read_body(receive)
+        for method, pattern, rule, handler in self.routes:
+            match = pattern.match(scope['path'])
+            if match and scope['method'] == method:
+                break
+        else:
+            return await self.wsgi(scope, body, send)
+
+        request = AsyncRequest(scope, body)
+        incoming = request.headers.get('x-request-id', '')
+        request_id = incoming if logsetup._REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        logsetup.log_context.set({'request_id': request_id})
+        started = time.perf_counter()
+        try:
+            result = await handler(request, **match.groupdict())
+        finally:
+            logsetup.log_context.set({})
+        if result is None:
+            # Handler defers to the Flask view (e.g. HTML form posts)
+            return await self.wsgi(scope, body, send)
+
+        status, payload, headers = result if len(result) == 3 else (*result, {})
+        http_request_duration.observe((time.perf_counter() - started) * 1000, rule, method, status)
+        content = json.dumps(payload).encode('utf-8') + b'\n'
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(content)),
+                   'X-Request-ID': request_id, **headers}
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                self.wsgi.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def start(self):
+        """Create the async engine; without a database the DB routes fall back to Flask."""
+        if not main.database_url:
+            return
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = os.environ.get("ASYNC_DATABASE_URL") or async_database_url(main.database_url)
+        self.engine = create_async_engine(url, **engine_options(url))
+        db_metrics.instrument(self.engine.sync_engine)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        logger.info("Async database engine ready (%s)", self.engine.dialect.driver)
+
+    async def generate(self, request):
+        # Plain form posts wait for the result and render HTML, which stays in Flask
+        if not request.wants_json():
+            return None
+        form = main.generation_form(request.form())
+        if form is None:
+            return 400, {'status': 'error', 'message': main.GENERATION_FIELDS_MISSING}
+        if form['model'] not in main.allowed_models():
+            return 400, {'status': 'error', 'message': main.GENERATION_UNKNOWN_MODEL}
+
+        job = generation_jobs.submit_async(generate_summary, form)
+        if job is None:
+            return 503, {'status': 'error', 'message': main.GENERATION_BUSY}, {'Retry-After': '10'}
+
+        urls = self.flask_app.url_map.bind('')
+        return 202, {
+            'status': 'accepted',
+            'job_id': job.id,
+            'status_url': urls.build('main.generation_status', {'job_id': job.id}),
+            'events_url': urls.build('main.generation_events', {'job_id': job.id}),
+            'cancel_url': urls.build('main.cancel_generation', {'job_id': job.id}),
+        }
+
+    async def track_analytics(self, request, slug):
+        if not main.database_url:
+            return 503, {'status': 'error', 'message': 'Database not configured'}
+        try:
+            data = request.get_json()
+            if not data or not data.get('event'):
+                return 400, {'status': 'error', 'message': 'Missing event type'}
+
+            # Queue the event; the ingest worker writes it in the next batch
+            accepted = analytics_ingest.submit(
+                cv_slug=slug,
+                event_type=data.get('event'),
+                event_data=data.get('data') or None,
+                visitor_ip=request.remote_addr,
+                user_agent=request.headers.get('user-agent', '')[:500]
+            )
+            if not accepted:
+                return 503, {'status': 'error', 'message': 'Analytics backlog full'}, {'Retry-After': '5'}
+            return 202, {'status': 'accepted'}
+
+        except Exception as e:
+            logger.error("Error tracking analytics: %s", e)
+            return 500, {'status': 'error'}
+
+    async def submit_feedback(self, request, slug):
+        if self.sessions is None:
+            return None
+        async with self.sessions() as session:
+            try:
+                data = request.get_json()
+                feedback = CVFeedback(
+                    cv_slug=slug,
+                    feedback_type=data.get('feedback_type'),
+                    message=data.get('message'),
+                    detailed_ratings=data.get('detailed_ratings') or None,
+                    improvement_tips=data.get('improvement_tips') or None,
+                    time_spent=data.get('time_spent'),
+                    section_times=data.get('section_times') or None,
+                    hr_ip=request.remote_addr
+                )
+                session.add(feedback)
+                # The rollup upsert is shared sync code; run_sync drives it over the async connection
+                await session.run_sync(lambda sync_session: apply_feedback(
+                    slug,
+                    feedback.feedback_type,
+                    time_spent=feedback.time_spent,
+                    ratings=data.get('detailed_ratings'),
+                    tips=data.get('improvement_tips'),
+                    session=sync_session
+                ))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error("Error submitting feedback: %s", e)
+                return 500, {'status': 'error', 'message': 'Failed to submit feedback'}
+
+        engagement_cache.invalidate((slug,))
+        logger.info("Feedback submitted for CV %s: %s", slug, data.get('feedback_type'))
+        return 200, {'status': 'success', 'message': 'Feedback submitted successfully'}
+
+    async def feedback_summary(self, request, slug):
+        if self.sessions is None:
+            return None
+        try:
+            async with self.sessions() as session:
+                # Aggregates are maintained on ingest, so this is a single-row lookup
+                rollup = (await session.execute(db.select(CVRollup).filter_by(cv_slug=slug))).scalars().first()
+                if not rollup or not (rollup.total_feedback or rollup.event_count):
+                    return 200, {'status': 'no_data', 'message': 'No feedback or analytics data available yet'}
+
+                summary = summarize(rollup)
+                if request.args.get('exact') == '1':
+                    query = unique_visitors_query(slug, since=retention_cutoff())
+                    summary['total_views'] = (await session.execute(query)).scalar_one()
+            return 200, {'status': 'success', 'data': summary}
+
+        except Exception as e:
+            logger.error("Error getting feedback summary: %s", e)
+            return 500, {'status': 'error', 'message': 'Failed to get feedback summary'}
+
+
+app = AsyncApp(main.app)
@@ -0,0 +1,216 @@
+"""Compare one gunicorn gthread worker against one uvicorn worker running asgi:app.
+
+Run from the FunnelUp-CV directory (needs gunicorn, uvicorn, greenlet and
+aiosqlite, or asyncpg for a PostgreSQL --database-url):
+
+    python benchmarks/async_bench.py [--clients 64] [--jobs 128] [--latency 0.5] [--json benchmarks/results/async.json]
+
+Both servers get the offline OpenAI stub with --latency seconds per
+completion, so generation is pure waiting on I/O. For each server the
+benchmark submits --jobs generations from --clients threads and polls
+until all have finished (completions/s), then hammers the feedback,
+feedback summary and analytics routes for --duration seconds each
+(requests/s and latency percentiles). The sync worker runs generations on
+GENERATION_WORKERS threads (set to --threads here); the async worker runs
+them as tasks on its event loop.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM = 'application/x-www-form-urlencoded'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Client:
+    """One keep-alive connection per client thread."""
+
+    def __init__(self, port):
+        self.port = port
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self.local.connection = None
+            connection.close()
+            raise
+
+
+def start_server(mode, port, env, threads, workers=1):
+    if mode == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', str(threads),
+                   '-b', f'127.0.0.1:{port}', 'main:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--port', str(port),
+                   '--log-level', 'warning', 'asgi:app']
+    server = subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if Client(port).request('GET', '/generate/stats')[0] == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} did not start")
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+
+def bench_generate(client, jobs, clients):
+    """Submit jobs and wait for all of them; returns completions per second."""
+    body = 'name=Bench+User&job=Engineer&company=Acme&summary=Builds+things.&bypass_cache=1'
+    headers = {'Content-Type': FORM, 'Accept': 'application/json'}
+
+    def one(_):
+        started = time.perf_counter()
+        status, payload = client.request('POST', '/generate', body, headers)
+        if status != 202:
+            return 'rejected', time.perf_counter() - started
+        status_url = json.loads(payload)['status_url']
+        while True:
+            job = json.loads(client.request('GET', status_url)[1])
+            if job['status'] not in ('queued', 'running'):
+                return job['status'], time.perf_counter() - started
+            time.sleep(0.05)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(one, range(jobs)))
+    elapsed = time.perf_counter() - started
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        'jobs': jobs,
+        'elapsed_s': round(elapsed, 2),
+        'completions_per_s': round(outcomes.get('succeeded', 0) / elapsed, 1),
+        'outcomes': outcomes,
+        **percentiles([latency for outcome, latency in results if outcome == 'succeeded'] or [0]),
+    }
+
+
+def bench_route(client, method, path, body, headers, clients, duration):
+    """Send requests from every client thread for duration seconds."""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def loop():
+        mine, failed = [], 0
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body, headers)
+            except OSError:
+                status = None
+            if status is not None and status < 400:
+                mine.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / duration, 1),
+        **percentiles(latencies or [0]),
+    }
+
+
+def run(mode, args, env):
+    port = free_port()
+    server = start_server(mode, port, env, args.threads)
+    try:
+        client = Client(port)
+        json_headers = {'Content-Type': 'application/json'}
+        feedback = json.dumps({'feedback_type': 'interested', 'time_spent': 40, 'detailed_ratings': {'skills': 4}})
+        event = json.dumps({'event': 'page_view', 'data': {'section': 'summary'}})
+        result = {'generate': bench_generate(client, args.jobs, args.clients)}
+        result['feedback'] = bench_route(client, 'POST', '/feedback/bench-cv', feedback, json_headers,
+                                         args.clients, args.duration)
+        result['feedback_summary'] = bench_route(client, 'GET', '/feedback-summary/bench-cv', None, {},
+                                                 args.clients, args.duration)
+        result['analytics'] = bench_route(client, 'POST', '/analytics/bench-cv', event, json_headers,
+                                          args.clients, args.duration)
+        return result
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=64, help='concurrent client threads')
+    parser.add_argument('--jobs', type=int, default=128, help='generations per server')
+    parser.add_argument('--latency', type=float, default=0.5, help='stub completion latency in seconds')
+    parser.add_argument('--threads', type=int, default=8, help='gthread threads and generation workers')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per route benchmark')
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file per server')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ('gunicorn', 'uvicorn'):
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'async.db')}"
+        env = dict(os.environ, DATABASE_URL=database_url, OPENAI_STUB='1', OPENAI_STUB_LATENCY=str(args.latency),
+                   GENERATION_WORKERS=str(args.threads), GENERATION_MAX_PENDING=str(args.jobs * 2),
+                   WSGI_THREADS=str(args.threads), LOG_LEVEL='WARNING')
+        results[mode] = run(mode, args, env)
+
+    print(f"{'server':<10}{'route':<18}{'rate/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for mode, routes in results.items():
+        for route, numbers in routes.items():
+            rate = numbers.get('completions_per_s', numbers.get('rps'))
+            print(f"{mode:<10}{route:<18}{rate:>10}{numbers['p50_ms']:>10}{numbers['p95_ms']:>10}{numbers['p99_ms']:>10}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'database': (args.database_url or 'sqlite').split(':', 1)[0],
+                'settings': {key: getattr(args, key) for key in ('clients', 'jobs', 'latency', 'threads', 'duration')},
+                'results': results,
+            }, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
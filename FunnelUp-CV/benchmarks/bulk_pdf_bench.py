@@ -0,0 +1,69 @@
+"""Compare rendering a bulk CV export serially and on the PDF process pool.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/bulk_pdf_bench.py [--cvs 40] [--processes 4]
+
+Times build_pdf in a loop against PDFCache.render_many with an empty
+cache (pool start-up included, then again with the pool warm), and
+checks that every PDF came back. The speed-up is bounded by the CPU
+count; with one CPU the pool only adds its start-up cost.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def profiles(count):
+    paragraph = ("Results-driven engineer with a decade of experience building reliable web services, "
+                 "leading small teams and shipping measurable improvements to latency and cost. ")
+    return {
+        f"bench-cv-{i}": {
+            'name': f"Bench Candidate {i}",
+            'job': 'Engineer',
+            'company': 'Acme',
+            'summary': '\n\n'.join(paragraph * 4 for _ in range(4)),
+            'skills': 'Python, SQL, Flask, PostgreSQL, Docker',
+            'video': '',
+        } for i in range(count)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cvs', type=int, default=40)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    os.environ['PDF_RENDER_PROCESSES'] = str(args.processes)
+
+    import pdf
+
+    data = profiles(args.cvs)
+    pdf.warm()
+    started = time.perf_counter()
+    for profile in data.values():
+        pdf.build_pdf(profile)
+    serial = time.perf_counter() - started
+
+    timings = []
+    cache = pdf.PDFCache(tempfile.mkdtemp(), max_bytes=1 << 30)
+    for run in ('cold pool', 'warm pool'):
+        # Same pool, empty cache directory
+        cache.directory = tempfile.mkdtemp()
+        started = time.perf_counter()
+        rendered = [slug for slug, content in cache.render_many(data) if content]
+        timings.append((run, time.perf_counter() - started))
+        assert len(rendered) == args.cvs, f"{run}: only {len(rendered)} of {args.cvs} PDFs rendered"
+
+    print(f"{args.cvs} CVs, {args.processes} processes, {os.cpu_count()} CPUs")
+    print(f"{'serial':<12}{serial * 1000:>10.0f} ms")
+    for run, elapsed in timings:
+        print(f"{run:<12}{elapsed * 1000:>10.0f} ms  ({serial / elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Time the section-engagement analytics on a large synthetic cohort.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/engagement_bench.py [--rows 100000] [--sections 8] [--db]
+
+Generates feedback rows shaped like the funnel page's submissions and
+reports how long it takes to build the NumPy arrays (from the flat numbers
+load_engagement selects, and from raw JSON documents) and to compute every
+statistic. With --db the rows are also written to a throwaway SQLite
+database and the full load_engagement path is timed. A plain-Python
+reference checks the funnel and correlations on a small sample first.
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engagement import EngagementData, compute_engagement, load_engagement  # noqa: E402
+from rollups import RATING_SECTIONS  # noqa: E402
+
+
+def make_rows(count, sections, rng):
+    rows = []
+    for _ in range(count):
+        # Sessions read the page in order and drop off somewhere along it
+        depth = rng.randint(0, sections)
+        section_times = {str(i): rng.randint(200, 90000) for i in range(depth)}
+        ratings = {section: rng.randint(1, 5) for section in RATING_SECTIONS if rng.random() < 0.6}
+        spent = sum(section_times.values()) if rng.random() < 0.95 else None
+        rows.append((spent, section_times, ratings or None))
+    return rows
+
+
+def reference(rows, sections):
+    """Funnel counts and dwell/rating correlations the slow, obvious way"""
+    funnel = [sum(1 for _, times, _ in rows if times and max(int(k) for k in times) >= i)
+              for i in range(sections)]
+    correlations = {}
+    for i in range(sections):
+        for rating in RATING_SECTIONS:
+            pairs = [(times[str(i)], ratings[rating]) for _, times, ratings in rows
+                     if times and str(i) in times and ratings and rating in ratings]
+            if len(pairs) < 3:
+                correlations[(str(i), rating)] = None
+                continue
+            xs, ys = zip(*pairs)
+            mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+            cov = sum((x - mx) * (y - my) for x, y in pairs)
+            spread = math.sqrt(sum((x - mx) ** 2 for x in xs) * sum((y - my) ** 2 for y in ys))
+            correlations[(str(i), rating)] = cov / spread if spread else None
+    return funnel, correlations
+
+
+def check(rows, sections):
+    result = compute_engagement(EngagementData.from_documents(rows))
+    funnel, correlations = reference(rows, sections)
+    assert [step['reached'] for step in result['funnel']] == funnel, "funnel mismatch"
+    for section in result['sections']:
+        for rating, value in section['rating_correlation'].items():
+            expected = correlations[(section['section'], rating)]
+            assert (value is None) == (expected is None), "correlation presence mismatch"
+            if value is not None:
+                assert abs(value - expected) < 1e-3, f"correlation mismatch: {value} != {expected}"
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def time_db(rows, repeat):
+    from flask import Flask
+    from models import db, CVFeedback
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(CVFeedback), [
+            {'cv_slug': f"cv-{i % 20}", 'feedback_type': 'maybe', 'time_spent': spent,
+             'section_times': times or None, 'detailed_ratings': ratings}
+            for i, (spent, times, ratings) in enumerate(rows)
+        ])
+        db.session.commit()
+        slugs = [f"cv-{i}" for i in range(20)]
+        elapsed, result = best_of(lambda: compute_engagement(load_engagement(slugs)), repeat)
+        db.drop_all()
+    assert result == compute_engagement(EngagementData.from_documents(rows)), "SQL extraction mismatch"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--sections', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--db', action='store_true', help='also time loading from SQLite')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    check(make_rows(2000, args.sections, rng), args.sections)
+    print("reference check: ok")
+
+    rows = make_rows(args.rows, args.sections, rng)
+    sections = [str(i) for i in range(args.sections)]
+    # What load_engagement gets back from SQL: numbers already pulled out of the JSON
+    flat_rows = [
+        (spent, *[(ratings or {}).get(rating) for rating in RATING_SECTIONS], *[times.get(s) for s in sections])
+        for spent, times, ratings in rows
+    ]
+    flat, data = best_of(lambda: EngagementData.from_matrix(sections, flat_rows), args.repeat)
+    documents, _ = best_of(lambda: EngagementData.from_documents(rows), args.repeat)
+    compute, _ = best_of(lambda: compute_engagement(data), args.repeat)
+    print(f"rows:                {args.rows} x {args.sections} sections")
+    print(f"arrays from numbers: {flat * 1000:.1f} ms")
+    print(f"arrays from JSON:    {documents * 1000:.1f} ms (fallback for other databases)")
+    print(f"compute:             {compute * 1000:.1f} ms")
+    print(f"numbers + compute:   {(flat + compute) * 1000:.1f} ms")
+    if args.db:
+        print(f"from SQLite:         {time_db(rows, args.repeat) * 1000:.1f} ms (load_engagement + compute)")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,171 @@
+"""Local stand-in for the OpenAI chat completions API with configurable latency and failures.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/fake_openai.py [--port 8099] [--model gpt-5-nano=300:3000:0.1:0.0 ...]
+
+then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8099/v1
+and any OPENAI_API_KEY. Each --model is name=latency_ms[:slow_ms:slow_fraction[:error_rate]]:
+most answers take about latency_ms, slow_fraction of them take slow_ms
+(the tail that hedging is meant to cut) and error_rate of them fail with
+a 500. Unknown models answer after 200 ms. Both plain and streaming
+(server-sent events) completions are served.
+
+Benchmarks import ``FakeCompletionServer`` to run it in-process and
+change a model's profile mid-run, e.g. to make it fail and watch its
+circuit breaker open.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Profile:
+    def __init__(self, latency_ms=200, slow_ms=None, slow_fraction=0.0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.slow_ms = slow_ms if slow_ms is not None else latency_ms
+        self.slow_fraction = slow_fraction
+        self.error_rate = error_rate
+
+    @classmethod
+    def parse(cls, spec):
+        """'300:3000:0.1:0.05' -> Profile(300, 3000, 0.1, 0.05)"""
+        parts = [float(part) for part in spec.split(':')]
+        return cls(*parts)
+
+    def delay(self, rng):
+        base = self.slow_ms if rng.random() < self.slow_fraction else self.latency_ms
+        # +-10% so identical profiles do not answer in lockstep
+        return base * rng.uniform(0.9, 1.1) / 1000
+
+
+class FakeCompletionServer:
+    """Threaded HTTP server answering /v1/chat/completions from per-model profiles."""
+
+    def __init__(self, profiles=None, port=0, seed=None):
+        self.profiles = dict(profiles or {})
+        self.default = Profile()
+        self.calls = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def set_profile(self, model, profile):
+        with self._lock:
+            self.profiles[model] = profile
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _plan(self, model):
+        """(seconds to wait, whether to fail) for one call."""
+        with self._lock:
+            profile = self.profiles.get(model, self.default)
+            self.calls[model] = self.calls.get(model, 0) + 1
+            return profile.delay(self._rng), self._rng.random() < profile.error_rate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                if self.path.rstrip('/') != '/v1/chat/completions':
+                    return self._json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+                model = body.get('model', 'unknown')
+                delay, fail = server._plan(model)
+                time.sleep(delay)
+                if fail:
+                    return self._json(500, {'error': {'message': f'{model} is having a bad day', 'type': 'server_error'}})
+
+                user = next((m.get('content', '') for m in body.get('messages', []) if m.get('role') == 'user'), '')
+                content = f"{user.strip()[:400]}\n\nSummary written by the fake {model}."
+                if body.get('stream'):
+                    return self._stream(model, content)
+                self._json(200, {
+                    'id': f'chatcmpl-{uuid.uuid4().hex}',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': len(user) // 4, 'completion_tokens': len(content) // 4,
+                              'total_tokens': (len(user) + len(content)) // 4},
+                })
+
+            def _json(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model, content):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+                pieces = [piece + ' ' for piece in content.split(' ')]
+                for index, piece in enumerate(pieces):
+                    chunk = {
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': piece},
+                                     'finish_reason': 'stop' if index == len(pieces) - 1 else None}],
+                    }
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--model', action='append', default=[],
+                        help='name=latency_ms[:slow_ms:slow_fraction[:error_rate]], repeatable')
+    args = parser.parse_args()
+
+    profiles = {}
+    for item in args.model or ['gpt-5-nano=300:3000:0.1', 'gpt-4o-mini=500']:
+        name, _, spec = item.partition('=')
+        profiles[name] = Profile.parse(spec)
+    server = FakeCompletionServer(profiles, port=args.port).start()
+    print(f"Fake OpenAI API on {server.base_url} ({', '.join(profiles)})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
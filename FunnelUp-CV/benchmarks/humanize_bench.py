@@ -0,0 +1,135 @@
+"""Compare the compiled humanizer against the original humanize_text.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/humanize_bench.py [--summaries 2000] [--repeat 5]
+
+Both implementations are seeded identically, so the script first checks
+they produce the same output and then reports summaries per second.
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from humanizer import Humanizer  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    "The candidate demonstrates strong leadership, and the team is being managed effectively across regions.",
+    "Furthermore, they utilize modern tooling to deliver results efficiently improve processes.",
+    "In addition, the projects are being delivered on time and within budget.",
+    "Subsequently, the platform grew to serve thousands of users every day.",
+    "• Built responsive WordPress websites for clients",
+    "Short one.",
+    "Working closely with stakeholders, the designer effectively communicates complex ideas.",
+]
+
+
+def legacy_humanize_text(text):
+    """The original per-call implementation from main.py, kept for comparison"""
+    if not text:
+        return text
+    
+    try:
+        # Split into paragraphs
+        paragraphs = text.split('\n\n')
+        humanized_paragraphs = []
+        
+        for paragraph in paragraphs:
+            if not paragraph.strip():
+                continue
+                
+            # Vary sentence structure in paragraphs
+            sentences = re.split(r'(?<=[.!?])\s+', paragraph)
+            for i in range(len(sentences)):
+                # Skip short sentences and bullet points
+                if len(sentences[i]) < 15 or sentences[i].strip().startswith('•'):
+                    continue
+                    
+                # Randomly convert some sentences to active voice
+                if random.random() < 0.3:
+                    # Replace passive constructions with active ones
+                    sentences[i] = re.sub(r'is being ([a-z]+ed)', r'actively \1s', sentences[i])
+                    sentences[i] = re.sub(r'are being ([a-z]+ed)', r'actively \1', sentences[i])
+                
+                # Occasionally vary sentence structures
+                if random.random() < 0.2 and ',' in sentences[i]:
+                    parts = sentences[i].split(',', 1)
+                    sentences[i] = f"{parts[1].strip()}, {parts[0].strip()[0].lower()}{parts[0].strip()[1:]}"
+            
+            # Replace overly formal or AI-like phrases
+            modified_para = ' '.join(sentences)
+            modified_para = modified_para.replace("utilize", "use")
+            modified_para = modified_para.replace("furthermore", "also")
+            modified_para = modified_para.replace("in addition", "plus")
+            modified_para = modified_para.replace("subsequently", "then")
+            modified_para = modified_para.replace("demonstrates", "shows")
+            
+            # Strengthen verbs instead of using adverbs
+            modified_para = re.sub(r'effectively ([a-z]+)', r'excel at \1ing', modified_para)
+            modified_para = re.sub(r'efficiently ([a-z]+)', r'streamline \1ing', modified_para)
+            
+            humanized_paragraphs.append(modified_para)
+        
+        # Join paragraphs back together
+        return '\n\n'.join(humanized_paragraphs)
+    except Exception as e:
+        logging.error(f"Error in humanizing text: {str(e)}")
+        return text  # Return original text if humanizing fails
+
+
+def make_corpus(count, rng):
+    corpus = []
+    for _ in range(count):
+        paragraphs = []
+        for _ in range(rng.randint(2, 4)):
+            paragraphs.append(' '.join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(3, 6))))
+        corpus.append('\n\n'.join(paragraphs))
+    return corpus
+
+
+def time_it(fn, corpus, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(corpus)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--summaries', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.summaries, random.Random(1))
+
+    random.seed(42)
+    expected = [legacy_humanize_text(text) for text in corpus]
+    actual = Humanizer(seed=42).humanize_many(corpus)
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"Seeded output mismatches: {mismatches}/{len(corpus)}")
+
+    def run_legacy(texts):
+        random.seed(42)
+        for text in texts:
+            legacy_humanize_text(text)
+
+    def run_compiled(texts):
+        Humanizer(seed=42).humanize_many(texts)
+
+    legacy_time = time_it(run_legacy, corpus, args.repeat)
+    compiled_time = time_it(run_compiled, corpus, args.repeat)
+    print(f"legacy:   {len(corpus) / legacy_time:10.0f} summaries/s ({legacy_time * 1000:.1f} ms)")
+    print(f"compiled: {len(corpus) / compiled_time:10.0f} summaries/s ({compiled_time * 1000:.1f} ms)")
+    print(f"speedup:  {legacy_time / compiled_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
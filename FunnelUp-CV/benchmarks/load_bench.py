@@ -0,0 +1,302 @@
+"""Seed a database, run a server and drive a mixed workload against it.
+
+Run from the FunnelUp-CV directory (needs gunicorn, or uvicorn for --server uvicorn):
+
+    python benchmarks/load_bench.py [--profiles 200] [--events 500] [--feedback 20]
+        [--mix view=40,summary=20,analytics=20,feedback=10,pdf=5,generate=5]
+        [--clients 32] [--duration 30] [--json benchmarks/results/load.json]
+        [--compare benchmarks/results/load-baseline.json]
+
+Seeds CV profiles with analytics events and feedback (a throwaway SQLite
+file unless --database-url points at a scratch PostgreSQL database; its
+tables are created but not dropped), rebuilds the rollups, then starts
+gunicorn (or uvicorn with asgi:app) with the offline OpenAI stub and
+sends --clients concurrent streams of requests picked by weight from
+--mix for --duration seconds, after a --warmup period that is not
+counted. Operations:
+
+    view       GET /cv/<slug>
+    summary    GET /feedback-summary/<slug>
+    analytics  POST /analytics/<slug>/batch with --burst events
+    feedback   POST /feedback/<slug>
+    pdf        GET /cv/<slug>/download
+    generate   POST /generate (JSON; the 202 is timed, the job runs on)
+
+Reports requests/s and p50/p95/p99 latency per operation. --json saves
+them with the commit and settings; --compare prints the change against
+an earlier saved run.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_bench import HERE, FORM, Client, free_port, percentiles, start_server  # noqa: E402
+
+EVENT_TYPES = ['page_view', 'section_view', 'chat_opened', 'page_exit', 'video_play']
+FEEDBACK_TYPES = ['interested', 'maybe', 'not-match', 'improve']
+DEFAULT_MIX = 'view=40,summary=20,analytics=20,feedback=10,pdf=5,generate=5'
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+PARAGRAPH = ("Results-driven engineer with {years} years of experience building reliable web services, "
+             "leading small teams and shipping measurable improvements to latency and cost.")
+
+
+def parse_mix(spec):
+    """'view=40,summary=20' -> {'view': 40.0, 'summary': 20.0}"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name} (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed(database_url, profiles, events, feedback, rng):
+    """Insert profiles, events and feedback, then rebuild rollups; returns the slugs."""
+    os.environ.update(DATABASE_URL=database_url, PROFILE_STORE='sql', AUTO_MIGRATE='1', LOG_LEVEL='WARNING')
+    import main
+    from models import db, CVAnalytics, CVFeedback, CVProfile
+    from rollups import RATING_SECTIONS, rebuild_rollups
+
+    start = datetime.utcnow() - timedelta(days=30)
+    slugs = [f"load-cv-{i}" for i in range(profiles)]
+    with main.app.app_context():
+        db.session.execute(db.insert(CVProfile), [{
+            'slug': slug,
+            'name': f"Load Tester {i}",
+            'job': rng.choice(['Engineer', 'Designer', 'Analyst', 'Product Manager']),
+            'company': rng.choice(['Acme', 'Globex', 'Initech', 'Umbrella']),
+            'summary': '\n\n'.join(PARAGRAPH.format(years=rng.randint(2, 15)) for _ in range(3)),
+            'skills': 'Python, SQL, Flask, PostgreSQL, Docker',
+            'video': '',
+            'created_by': f"owner-{i % 10}",
+        } for i, slug in enumerate(slugs)])
+        for slug in slugs:
+            if events:
+                db.session.execute(db.insert(CVAnalytics), [{
+                    'cv_slug': slug,
+                    'event_type': rng.choice(EVENT_TYPES),
+                    'event_data': {'section': rng.choice(RATING_SECTIONS), 'ms': rng.randint(100, 9000)},
+                    'timestamp': start + timedelta(seconds=rng.randint(0, 30 * 86400)),
+                    'visitor_ip': f"10.0.{rng.randint(0, 3)}.{rng.randint(0, 40)}",
+                    'user_agent': 'load-bench',
+                } for _ in range(events)])
+            if feedback:
+                db.session.execute(db.insert(CVFeedback), [{
+                    'cv_slug': slug,
+                    'feedback_type': rng.choice(FEEDBACK_TYPES),
+                    'detailed_ratings': {section: rng.randint(1, 5) for section in RATING_SECTIONS},
+                    'improvement_tips': [f"tip {rng.randint(0, 9)}"],
+                    'time_spent': rng.randint(1000, 60000),
+                    'timestamp': start + timedelta(seconds=rng.randint(0, 30 * 86400)),
+                } for _ in range(feedback)])
+        db.session.commit()
+        rebuild_rollups()
+    return slugs
+
+
+def op_view(client, slug, args, rng):
+    return client.request('GET', f'/cv/{slug}')
+
+
+def op_summary(client, slug, args, rng):
+    return client.request('GET', f'/feedback-summary/{slug}')
+
+
+def op_analytics(client, slug, args, rng):
+    events = [{'event': rng.choice(EVENT_TYPES), 'data': {'section': 'summary', 'ms': rng.randint(100, 9000)}}
+              for _ in range(args.burst)]
+    return client.request('POST', f'/analytics/{slug}/batch', json.dumps(events), JSON_HEADERS)
+
+
+def op_feedback(client, slug, args, rng):
+    body = json.dumps({
+        'feedback_type': rng.choice(FEEDBACK_TYPES),
+        'time_spent': rng.randint(1000, 60000),
+        'detailed_ratings': {'skills': rng.randint(1, 5), 'experience': rng.randint(1, 5)},
+        'improvement_tips': ['Add metrics to the summary'],
+    })
+    return client.request('POST', f'/feedback/{slug}', body, JSON_HEADERS)
+
+
+def op_pdf(client, slug, args, rng):
+    return client.request('GET', f'/cv/{slug}/download')
+
+
+def op_generate(client, slug, args, rng):
+    body = f'name=Load+Tester&job=Engineer&company=Acme&summary=Builds+things+{rng.randint(0, 10 ** 6)}.'
+    return client.request('POST', '/generate', body, {'Content-Type': FORM, 'Accept': 'application/json'})
+
+
+OPERATIONS = {
+    'view': op_view,
+    'summary': op_summary,
+    'analytics': op_analytics,
+    'feedback': op_feedback,
+    'pdf': op_pdf,
+    'generate': op_generate,
+}
+
+
+def drive(port, slugs, mix, args):
+    """Run the mix from every client; returns {operation: [latency, ...]} and error counts."""
+    names, weights = list(mix), list(mix.values())
+    client = Client(port)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + args.warmup
+    stop = measure_from + args.duration
+
+    def loop(seed):
+        rng = random.Random(seed)
+        mine = {name: [] for name in names}
+        failed = {name: 0 for name in names}
+        while True:
+            started = time.perf_counter()
+            if started >= stop:
+                break
+            name = rng.choices(names, weights)[0]
+            try:
+                status, _ = OPERATIONS[name](client, rng.choice(slugs), args, rng)
+            except OSError:
+                status = None
+            if started < measure_from:
+                continue
+            if status is not None and status < 400:
+                mine[name].append(time.perf_counter() - started)
+            else:
+                failed[name] += 1
+        with lock:
+            for name in names:
+                latencies[name].extend(mine[name])
+                errors[name] += failed[name]
+
+    threads = [threading.Thread(target=loop, args=(args.seed + i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def report(latencies, errors, duration):
+    results = {}
+    for name, samples in latencies.items():
+        results[name] = {
+            'requests': len(samples),
+            'errors': errors[name],
+            'rps': round(len(samples) / duration, 1),
+            **percentiles(samples or [0]),
+        }
+    every = [sample for samples in latencies.values() for sample in samples]
+    results['total'] = {
+        'requests': len(every),
+        'errors': sum(errors.values()),
+        'rps': round(len(every) / duration, 1),
+        **percentiles(every or [0]),
+    }
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline.get('commit') or 'unknown commit'})")
+    print(f"{'operation':<12}{'rps':>10}{'change':>9}{'p95 ms':>10}{'change':>9}{'p99 ms':>10}{'change':>9}")
+    for name, numbers in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        change = lambda key: f"{(numbers[key] - before[key]) / before[key] * 100:+.0f}%" if before[key] else 'n/a'
+        print(f"{name:<12}{numbers['rps']:>10}{change('rps'):>9}{numbers['p95_ms']:>10}{change('p95_ms'):>9}"
+              f"{numbers['p99_ms']:>10}{change('p99_ms'):>9}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=200, help='CV profiles to seed')
+    parser.add_argument('--events', type=int, default=500, help='analytics events per profile')
+    parser.add_argument('--feedback', type=int, default=20, help='feedback rows per profile')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operation=weight pairs')
+    parser.add_argument('--burst', type=int, default=10, help='events per analytics batch')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before that')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='gthread threads per worker')
+    parser.add_argument('--latency', type=float, default=0.2, help='stub completion latency in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='earlier --json output to compare against')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    scratch = tempfile.mkdtemp()
+    database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'load.db')}"
+    started = time.perf_counter()
+    slugs = seed(database_url, args.profiles, args.events, args.feedback, random.Random(args.seed))
+    print(f"Seeded {len(slugs)} profiles, {len(slugs) * args.events} events and "
+          f"{len(slugs) * args.feedback} feedback rows in {time.perf_counter() - started:.1f}s")
+
+    env = dict(os.environ, DATABASE_URL=database_url, PROFILE_STORE='sql', AUTO_MIGRATE='0',
+               OPENAI_STUB='1', OPENAI_STUB_LATENCY=str(args.latency), LOG_LEVEL='WARNING',
+               PDF_CACHE_DIR=os.path.join(scratch, 'pdf'))
+    port = free_port()
+    server = start_server(args.server, port, env, args.threads, workers=args.workers)
+    try:
+        latencies, errors = drive(port, slugs, mix, args)
+    finally:
+        server.terminate()
+        server.wait(10)
+    results = report(latencies, errors, args.duration)
+
+    print(f"{'operation':<12}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, numbers in results.items():
+        print(f"{name:<12}{numbers['requests']:>10}{numbers['errors']:>8}{numbers['rps']:>10}"
+              f"{numbers['p50_ms']:>10}{numbers['p95_ms']:>10}{numbers['p99_ms']:>10}")
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'database': database_url.split(':', 1)[0],
+                'settings': {key: getattr(args, key) for key in (
+                    'profiles', 'events', 'feedback', 'burst', 'clients', 'duration', 'warmup',
+                    'server', 'workers', 'threads', 'latency', 'seed')},
+                'mix': mix,
+                'results': results,
+            }, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
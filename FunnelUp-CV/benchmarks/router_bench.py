@@ -0,0 +1,129 @@
+"""Measure the model router against direct calls on a local fake completion server.
+
+Run from the FunnelUp-CV directory (needs the openai package):
+
+    python benchmarks/router_bench.py [--requests 300] [--clients 8] [--json benchmarks/results/router.json]
+
+Starts benchmarks/fake_openai.py in-process with gpt-5-nano answering in
+about --latency ms except for --slow-fraction of calls that take --slow ms,
+and gpt-4o-mini (its fallback) in about --fallback-latency ms. Two
+scenarios, each run with the plain metered client and with the router:
+
+* tail: the slow answers are what hedging at the p95 should cut;
+* outage: gpt-5-nano fails every call for the middle third of the run,
+  which the router should absorb with fallbacks and its circuit breaker.
+
+Reports latency percentiles, failed requests and upstream calls per
+request (the cost of hedging and retries).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_bench import percentiles  # noqa: E402
+from fake_openai import FakeCompletionServer, Profile  # noqa: E402
+
+MESSAGES = [
+    {"role": "system", "content": "Create a professional and tailored CV summary for an Engineer role at Acme."},
+    {"role": "user", "content": "Builds reliable web services and leads small teams."},
+]
+
+
+def run(client, server, args, outage):
+    healthy = Profile(args.latency, args.slow, args.slow_fraction)
+    server.set_profile('gpt-5-nano', healthy)
+    calls_before = sum(server.calls.values())
+    failures = [0]
+    lock = threading.Lock()
+    done = [0]
+
+    def one(index):
+        if outage and index == args.requests // 3:
+            server.set_profile('gpt-5-nano', Profile(args.latency / 2, error_rate=1.0))
+        if outage and index == 2 * args.requests // 3:
+            server.set_profile('gpt-5-nano', healthy)
+        started = time.perf_counter()
+        try:
+            client.chat.completions.create(model='gpt-5-nano', messages=MESSAGES)
+        except Exception:
+            with lock:
+                failures[0] += 1
+            return None
+        finally:
+            with lock:
+                done[0] += 1
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        latencies = [latency for latency in pool.map(one, range(args.requests)) if latency is not None]
+    elapsed = time.perf_counter() - started
+    # Let abandoned hedges finish so they are counted as upstream calls
+    time.sleep(args.slow / 1000)
+    return {
+        'requests': args.requests,
+        'failed': failures[0],
+        'elapsed_s': round(elapsed, 2),
+        'upstream_calls_per_request': round((sum(server.calls.values()) - calls_before) / args.requests, 2),
+        **percentiles(latencies or [0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=300, help='usual gpt-5-nano latency in ms')
+    parser.add_argument('--slow', type=float, default=3000, help='slow gpt-5-nano latency in ms')
+    parser.add_argument('--slow-fraction', type=float, default=0.04)
+    parser.add_argument('--fallback-latency', type=float, default=400, help='gpt-4o-mini latency in ms')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    server = FakeCompletionServer({'gpt-4o-mini': Profile(args.fallback_latency)}, seed=7).start()
+    os.environ.update(OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY='sk-router-bench', LOG_LEVEL='ERROR')
+    import llm
+    from model_router import ModelRouter, RoutedClient
+
+    results = {}
+    try:
+        for scenario in ('tail', 'outage'):
+            for mode in ('direct', 'routed'):
+                client = llm.MeteredClient(llm.LazyClient(llm._openai_client))
+                if mode == 'routed':
+                    router = ModelRouter(fallbacks={'gpt-5-nano': 'gpt-4o-mini'}, cooldown=2.0,
+                                         hedge_after_ms=2000, backoff_ms=50, backoff_max_ms=500)
+                    client = RoutedClient(client, router)
+                results[f'{scenario}/{mode}'] = result = run(client, server, args, outage=scenario == 'outage')
+                if mode == 'routed':
+                    result['router'] = router.stats()
+    finally:
+        server.stop()
+
+    print(f"{'scenario':<16}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/req':>11}")
+    for name, numbers in results.items():
+        print(f"{name:<16}{numbers['failed']:>8}{numbers['p50_ms']:>10}{numbers['p95_ms']:>10}"
+              f"{numbers['p99_ms']:>10}{numbers['upstream_calls_per_request']:>11}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'settings': {key: getattr(args, key) for key in (
+                    'requests', 'clients', 'latency', 'slow', 'slow_fraction', 'fallback_latency')},
+                'results': results,
+            }, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
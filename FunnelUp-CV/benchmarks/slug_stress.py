@@ -0,0 +1,124 @@
+"""Hammer ProfileStore.allocate with identical submissions from many threads.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/slug_stress.py [--store sqlite] [--threads 32] [--per-thread 10]
+
+Every thread saves the same name/job/company, so every allocation after the
+first collides on the base slug. The script checks that each save got a
+distinct slug and that no IntegrityError escaped.
+
+``--store sqlalchemy`` runs the Flask-SQLAlchemy store the app uses, with
+one app context per thread, against a temporary SQLite file or
+--database-url (a scratch database; its tables are dropped afterwards).
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import MemoryProfileStore, SQLAlchemyProfileStore, SQLiteProfileStore  # noqa: E402
+
+PROFILE = {
+    "name": "Jane Doe",
+    "job": "Designer",
+    "company": "Acme",
+    "summary": "Stress test profile",
+    "skills": "",
+    "video": "",
+    "created_by": "slug_stress",
+}
+
+
+def make_store(kind, database_url=None):
+    """(store, per-thread context factory, cleanup)"""
+    if kind == "memory":
+        return MemoryProfileStore(), contextlib.nullcontext, lambda: None
+    if kind == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(), "profiles.sqlite3")
+        return SQLiteProfileStore(path), contextlib.nullcontext, lambda: None
+
+    from flask import Flask
+    from models import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = (
+        database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'profiles.db')}"
+    )
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        # Writers queue on SQLite's database lock instead of failing
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    def cleanup():
+        with app.app_context():
+            db.drop_all()
+
+    return SQLAlchemyProfileStore(), app.app_context, cleanup
+
+
+def run(store, threads, per_thread, context=contextlib.nullcontext):
+    slugs = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        start.wait()
+        with context():
+            for _ in range(per_thread):
+                try:
+                    slug = store.allocate("jane-doe-designer-acme", PROFILE)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                with lock:
+                    slugs.append(slug)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    began = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return slugs, errors, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", choices=["sqlite", "memory", "sqlalchemy"], default="sqlite")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--per-thread", type=int, default=10)
+    parser.add_argument("--database-url", help="scratch database for --store sqlalchemy")
+    args = parser.parse_args()
+
+    store, context, cleanup = make_store(args.store, args.database_url)
+    try:
+        slugs, errors, elapsed = run(store, args.threads, args.per_thread, context)
+    finally:
+        cleanup()
+    expected = args.threads * args.per_thread
+
+    print(f"store:        {args.store}")
+    print(f"allocations:  {len(slugs)}/{expected} in {elapsed:.2f}s")
+    print(f"unique slugs: {len(set(slugs))}")
+    print(f"errors:       {len(errors)}")
+    for error in errors[:5]:
+        print(f"  {error}")
+
+    if errors or len(set(slugs)) != expected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,108 @@
+"""Measure cold start: importing the app and serving its first requests.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/startup_bench.py [--runs 5] [--database-url URL] [--json benchmarks/results/startup.json]
+
+Every run is a fresh interpreter that imports main (what a new gunicorn
+worker does), serves GET / and GET /cv/<slug> through the test client and
+then builds the OpenAI client the way the first generation would (no
+network call is made). Modes: AUTO_MIGRATE on (schema checked at import),
+off (schema managed by ``flask migrate``), and off with the offline stub
+instead of the OpenAI SDK. Reports the median of each phase in
+milliseconds; --json keeps the numbers for comparison across changes.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main
+imported = time.perf_counter()
+app = main.app
+client = app.test_client()
+index = client.get('/')
+first = time.perf_counter()
+cv = client.get('/cv/startup-bench')
+second = time.perf_counter()
+# Build the OpenAI client the way the first generation would, without a request
+if hasattr(main.client, 'warm'):
+    main.client.warm()
+openai_ready = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (first - imported) * 1000,
+    'cv_page_ms': (second - first) * 1000,
+    'openai_client_ms': (openai_ready - second) * 1000,
+    'time_to_first_response_ms': (first - started) * 1000,
+    'statuses': [index.status_code, cv.status_code],
+}))
+'''
+
+
+def run_once(env):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, HERE], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    base = dict(os.environ, DATABASE_URL=database_url, LOG_LEVEL='WARNING', OPENAI_API_KEY='sk-startup-bench')
+    base.pop('OPENAI_STUB', None)
+    base.pop('PREWARM', None)
+
+    # Create the schema once so every measured run sees an existing database
+    run_once(dict(base, AUTO_MIGRATE='1'))
+
+    modes = {
+        'auto_migrate': dict(base, AUTO_MIGRATE='1'),
+        'no_migrate': dict(base, AUTO_MIGRATE='0'),
+        'no_migrate_stub': dict(base, AUTO_MIGRATE='0', OPENAI_STUB='1'),
+    }
+    results = {}
+    for mode, env in modes.items():
+        runs = [run_once(env) for _ in range(args.runs)]
+        results[mode] = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in runs[0] if key.endswith('_ms')
+        }
+        results[mode]['statuses'] = runs[0]['statuses']
+
+    print(f"{'mode':<18}{'import':>10}{'1st req':>10}{'cv page':>10}{'openai':>10}{'to 1st':>10}  (median ms, {args.runs} runs)")
+    for mode, phases in results.items():
+        print(f"{mode:<18}{phases['import_ms']:>10}{phases['first_request_ms']:>10}{phases['cv_page_ms']:>10}"
+              f"{phases['openai_client_ms']:>10}{phases['time_to_first_response_ms']:>10}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'database': database_url.split(':', 1)[0],
+                'runs': args.runs,
+                'results': results,
+            }, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
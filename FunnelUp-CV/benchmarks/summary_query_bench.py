@@ -0,0 +1,203 @@
+"""Compare per-CV summary queries before and after the composite indexes.
+
+Run from the FunnelUp-CV directory:
+
+    python benchmarks/summary_query_bench.py [--cvs 50] [--events 2000] [--feedback 100]
+
+Seeds a throwaway SQLite database (or --database-url, which should point
+at an empty scratch database since all tables are dropped afterwards),
+then times:
+
+* before: the original /feedback-summary query pattern - load every row for
+  the CV, parse JSON and filter page views in Python - with only the old
+  single-column cv_slug indexes in place;
+* after: the same figures aggregated in SQL over the composite
+  (cv_slug, event_type, timestamp) and (cv_slug, feedback_type) indexes.
+
+Both variants must agree on every CV before timings are reported.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from models import db, CVFeedback, CVAnalytics  # noqa: E402
+from rollups import RATING_SECTIONS  # noqa: E402
+
+EVENT_TYPES = ['page_view', 'section_view', 'chat_opened', 'page_exit', 'video_play']
+FEEDBACK_TYPES = ['interested', 'maybe', 'not-match', 'improve']
+COMPOSITE_INDEXES = ['ix_cv_analytics_slug_type_ts', 'ix_cv_feedback_slug_type']
+
+
+def seed(cvs, events, feedback, rng):
+    start = datetime.utcnow() - timedelta(days=30)
+    slugs = [f"cv-{i}" for i in range(cvs)]
+    analytics_rows = []
+    feedback_rows = []
+    for slug in slugs:
+        for _ in range(events):
+            analytics_rows.append({
+                'cv_slug': slug,
+                'event_type': rng.choice(EVENT_TYPES),
+                'event_data': {'section': rng.choice(RATING_SECTIONS), 'ms': rng.randint(100, 9000)},
+                'timestamp': start + timedelta(seconds=rng.randint(0, 30 * 86400)),
+                'visitor_ip': f"10.0.{rng.randint(0, 3)}.{rng.randint(0, 40)}",
+                'user_agent': 'bench',
+            })
+        for _ in range(feedback):
+            feedback_rows.append({
+                'cv_slug': slug,
+                'feedback_type': rng.choice(FEEDBACK_TYPES),
+                'detailed_ratings': {section: rng.randint(1, 5) for section in RATING_SECTIONS},
+                'improvement_tips': [f"tip {rng.randint(0, 9)}"],
+                'time_spent': rng.randint(1000, 60000),
+                'timestamp': start + timedelta(seconds=rng.randint(0, 30 * 86400)),
+            })
+    # Shuffle so each CV's rows are scattered through the table like real traffic
+    rng.shuffle(analytics_rows)
+    rng.shuffle(feedback_rows)
+    db.session.execute(db.insert(CVAnalytics), analytics_rows)
+    db.session.execute(db.insert(CVFeedback), feedback_rows)
+    db.session.commit()
+    return slugs
+
+
+def use_old_indexes():
+    for name in COMPOSITE_INDEXES:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_cv_analytics_cv_slug ON cv_analytics (cv_slug)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_cv_feedback_cv_slug ON cv_feedback (cv_slug)"))
+    db.session.commit()
+
+
+def use_new_indexes():
+    db.session.execute(text("DROP INDEX IF EXISTS ix_cv_analytics_cv_slug"))
+    db.session.execute(text("DROP INDEX IF EXISTS ix_cv_feedback_cv_slug"))
+    db.session.commit()
+    for model in (CVAnalytics, CVFeedback):
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+
+
+def summary_before(slug):
+    """The original per-request summary: every row loaded and parsed in Python"""
+    feedbacks = db.session.execute(
+        text("SELECT feedback_type, time_spent, detailed_ratings FROM cv_feedback WHERE cv_slug = :slug"),
+        {'slug': slug}
+    ).all()
+    analytics = db.session.execute(
+        text("SELECT event_type, visitor_ip FROM cv_analytics WHERE cv_slug = :slug"),
+        {'slug': slug}
+    ).all()
+    breakdown = {}
+    total_time = 0
+    ratings = {section: [] for section in RATING_SECTIONS}
+    for feedback_type, time_spent, detailed_ratings in feedbacks:
+        breakdown[feedback_type] = breakdown.get(feedback_type, 0) + 1
+        total_time += time_spent or 0
+        if detailed_ratings:
+            for section, rating in json.loads(detailed_ratings).items():
+                ratings[section].append(rating)
+    return {
+        'total_views': len(set(ip for event_type, ip in analytics if event_type == 'page_view')),
+        'feedback_breakdown': breakdown,
+        'time_spent': total_time,
+        'rating_counts': {section: len(values) for section, values in ratings.items()},
+    }
+
+
+def summary_after(slug):
+    """The same figures aggregated in SQL over the composite indexes"""
+    total_views = db.session.execute(
+        db.select(db.func.count(db.distinct(CVAnalytics.visitor_ip)))
+        .where(CVAnalytics.cv_slug == slug, CVAnalytics.event_type == 'page_view')
+    ).scalar_one()
+    breakdown = {}
+    total_time = 0
+    rating_counts = {section: 0 for section in RATING_SECTIONS}
+    rating_columns = [db.func.count(CVFeedback.detailed_ratings[section].as_float()) for section in RATING_SECTIONS]
+    for feedback_type, count, time_spent, *counts in db.session.execute(
+        db.select(CVFeedback.feedback_type, db.func.count(), db.func.sum(CVFeedback.time_spent), *rating_columns)
+        .where(CVFeedback.cv_slug == slug)
+        .group_by(CVFeedback.feedback_type)
+    ):
+        breakdown[feedback_type] = count
+        total_time += time_spent or 0
+        for section, section_count in zip(RATING_SECTIONS, counts):
+            rating_counts[section] += section_count
+    return {
+        'total_views': total_views,
+        'feedback_breakdown': breakdown,
+        'time_spent': total_time,
+        'rating_counts': rating_counts,
+    }
+
+
+def time_queries(fn, slugs, repeat):
+    best = None
+    results = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for slug in slugs:
+            results[slug] = fn(slug)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cvs', type=int, default=50)
+    parser.add_argument('--events', type=int, default=2000, help='analytics events per CV')
+    parser.add_argument('--feedback', type=int, default=100, help='feedback rows per CV')
+    parser.add_argument('--sample', type=int, default=50, help='CVs queried per round')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--database-url', help='scratch database; defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        rng = random.Random(42)
+        start = time.perf_counter()
+        slugs = seed(args.cvs, args.events, args.feedback, rng)
+        print(f"seeded {args.cvs * args.events} events and {args.cvs * args.feedback} feedback rows "
+              f"in {time.perf_counter() - start:.2f}s ({db.engine.dialect.name})")
+        sample = rng.sample(slugs, min(args.sample, len(slugs)))
+
+        use_old_indexes()
+        before, before_results = time_queries(summary_before, sample, args.repeat)
+        use_new_indexes()
+        after, after_results = time_queries(summary_after, sample, args.repeat)
+
+        mismatches = [slug for slug in sample if before_results[slug] != after_results[slug]]
+        print(f"mismatches: {len(mismatches)}")
+        print(f"before: {before * 1000 / len(sample):.2f} ms per CV summary")
+        print(f"after:  {after * 1000 / len(sample):.2f} ms per CV summary")
+        print(f"speedup: {before / after:.2f}x")
+
+        db.drop_all()
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, calling loader() on a miss.
+
+        None results are not cached, so a lookup for a slug that does not
+        exist yet will not hide it once it is created.
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+# Profiles are write-once after /generate, so a long TTL is safe
+profile_cache = LRUCache(
+    max_size=int(os.environ.get("PROFILE_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("PROFILE_CACHE_TTL", 600))
+)
+
+# Rendered funnel pages, keyed by slug so a profile write drops every variant
+page_cache = LRUCache(
+    max_size=int(os.environ.get("PAGE_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("PAGE_CACHE_TTL", 600))
+)
+
+# Section-engagement analytics per CV or cohort of CVs
+engagement_cache = LRUCache(
+    max_size=int(os.environ.get("ENGAGEMENT_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("ENGAGEMENT_CACHE_TTL", 300))
+)
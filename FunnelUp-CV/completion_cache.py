@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from cache import LRUCache
+
+
+def completion_key(model, messages):
+    """Deterministic key for a completion request.
+
+    Whitespace runs are collapsed and outer whitespace stripped so trivially
+    different submissions of the same prompt share an entry.
+    """
+    normalized = [
+        [m['role'], re.sub(r'\s+', ' ', m['content']).strip()]
+        for m in messages
+    ]
+    payload = json.dumps([model.strip().lower(), normalized], separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    """Per-process LRU storage."""
+
+    def __init__(self, ttl, max_size=512):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, model, content):
+        self._cache.set(key, content)
+
+
+class SQLiteBackend:
+    """Single-file storage shared by every worker process on the host."""
+
+    def __init__(self, ttl, path):
+        self.ttl = ttl
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completion_cache ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = sqlite3.connect(self.path, timeout=5)
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT content FROM completion_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, model, content):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completion_cache (key, model, content, expires_at) VALUES (?, ?, ?, ?)",
+                (key, model, content, time.time() + self.ttl)
+            )
+
+
+class SQLBackend:
+    """Storage in the app's configured SQL database (needs an app context)."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def get(self, key):
+        from models import CompletionCacheEntry
+
+        entry = CompletionCacheEntry.query.filter(
+            CompletionCacheEntry.key == key,
+            CompletionCacheEntry.expires_at > datetime.utcnow()
+        ).first()
+        return entry.content if entry else None
+
+    def set(self, key, model, content):
+        from models import db, CompletionCacheEntry
+
+        now = datetime.utcnow()
+        try:
+            db.session.merge(CompletionCacheEntry(
+                key=key,
+                model=model,
+                content=content,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl)
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class CompletionCache:
+    """Read-through cache of raw AI completions with hit-rate counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    def get(self, model, messages):
+        if self.backend is None:
+            return None
+        try:
+            content = self.backend.get(completion_key(model, messages))
+        except Exception:
+            self.errors += 1
+            return None
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    def set(self, model, messages, content):
+        if self.backend is None or not content:
+            return
+        try:
+            self.backend.set(completion_key(model, messages), model, content)
+        except Exception:
+            self.errors += 1
+
+    def record_bypass(self):
+        self.bypassed += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            'bypassed': self.bypassed,
+            'errors': self.errors,
+        }
+
+
+def make_completion_cache(sql_available):
+    """Build the cache selected by COMPLETION_CACHE (memory, sqlite, sql or off)."""
+    kind = os.environ.get("COMPLETION_CACHE", "memory").lower()
+    ttl = int(os.environ.get("COMPLETION_CACHE_TTL", 86400))
+
+    if kind == "off":
+        backend = None
+    elif kind == "sqlite":
+        backend = SQLiteBackend(ttl, os.environ.get(
+            "COMPLETION_CACHE_PATH", os.path.join(tempfile.gettempdir(), "funnelcv-completion-cache.sqlite3")
+        ))
+    elif kind == "sql" and sql_available:
+        backend = SQLBackend(ttl)
+    else:
+        backend = MemoryBackend(ttl, int(os.environ.get("COMPLETION_CACHE_SIZE", 512)))
+    return CompletionCache(backend)
@@ -0,0 +1,65 @@
+from models import db, CVProfile, CVRollup
+from rollups import summarize
+
+# sort name -> SQL expression; CVs without any activity sort as zero
+DASHBOARD_SORTS = {
+    'events': db.func.coalesce(CVRollup.event_count, 0),
+    'feedback': db.func.coalesce(CVRollup.total_feedback, 0),
+    'time': db.case(
+        (CVRollup.total_feedback > 0, CVRollup.time_spent_total * 1.0 / CVRollup.total_feedback),
+        else_=0
+    ),
+    'created': CVProfile.created_at,
+}
+
+MAX_PER_PAGE = 100
+
+
+def dashboard_page(created_by=None, slugs=None, sort='events', descending=True, page=1, per_page=20):
+    """Summaries for a page of CVs, selected by owner and/or explicit slugs.
+
+    Always two queries whatever the page size: a count, and the profiles
+    outer-joined to their rollups, sorted and paginated in SQL.
+    """
+    filters = []
+    if created_by is not None:
+        filters.append(CVProfile.created_by == created_by)
+    if slugs is not None:
+        filters.append(CVProfile.slug.in_(list(slugs)))
+
+    total = db.session.execute(
+        db.select(db.func.count()).select_from(CVProfile).where(*filters)
+    ).scalar_one()
+
+    order = DASHBOARD_SORTS[sort]
+    query = (
+        db.select(CVProfile, CVRollup)
+        .outerjoin(CVRollup, CVRollup.cv_slug == CVProfile.slug)
+        .where(*filters)
+        .order_by(order.desc() if descending else order.asc(), CVProfile.id.desc() if descending else CVProfile.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    )
+
+    items = []
+    for profile, rollup in db.session.execute(query):
+        active = rollup is not None and (rollup.total_feedback or rollup.event_count)
+        items.append({
+            'slug': profile.slug,
+            'name': profile.name,
+            'job': profile.job,
+            'company': profile.company,
+            'created_at': profile.created_at.strftime("%Y-%m-%d %H:%M:%S") if profile.created_at else None,
+            'event_count': rollup.event_count if rollup else 0,
+            'summary': summarize(rollup) if active else None,
+        })
+
+    return {
+        'items': items,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+    }
@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from metrics import Histogram, histogram_lines, registry
+
+logger = logging.getLogger(__name__)
+
+# Queries slower than this are logged with the request/job they ran for
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 500))
+
+# Set to a [milliseconds, queries] list while a request is being timed
+query_time = ContextVar('query_time', default=None)
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS from the DB_* environment variables.
+
+    Defaults keep the previous behaviour (pre-ping on, 300s recycle) and
+    SQLAlchemy's pool defaults. DB_STATEMENT_TIMEOUT_MS only applies to
+    PostgreSQL, where it is set per connection.
+    """
+    options = {
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 300)),
+        "pool_pre_ping": _flag("DB_POOL_PRE_PING", "1"),
+    }
+    # In-memory SQLite gets a single-connection pool that takes no sizing
+    if not (database_url.startswith("sqlite") and ":memory:" in database_url or database_url in ("sqlite://", "sqlite:///")):
+        options.update({
+            "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+            "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        })
+    statement_timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+    if statement_timeout and database_url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout)}}
+    elif statement_timeout and database_url.startswith("postgres"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+class DBMetrics:
+    """Pool and query instrumentation hung off SQLAlchemy engine events.
+
+    Counts are per process, so with several gunicorn workers each reports
+    its own pool; when the ASGI app runs its async engine alongside Flask's,
+    both pools are instrumented and their gauges summed. Checkout wait covers queueing for a free connection plus
+    the pre-ping round trip, which is what a request actually pays.
+    """
+
+    def __init__(self):
+        self.engines = []
+        self.checkout_wait = Histogram()
+        self.query_latency = {}
+        self.counters = {
+            'checkouts': 0,
+            'checkins': 0,
+            'connections_opened': 0,
+            'invalidated': 0,
+            'pool_timeouts': 0,
+            'overflow_checkouts': 0,
+            'query_errors': 0,
+        }
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def instrument(self, engine):
+        """Attach to an engine's pool and cursor events. Safe to call once per engine.
+
+        Pass ``AsyncEngine.sync_engine`` for an async engine.
+        """
+        if engine in self.engines:
+            return
+        self.engines.append(engine)
+        pool = engine.pool
+
+        @event.listens_for(pool, 'connect')
+        def on_connect(dbapi_connection, record):
+            self._count('connections_opened')
+
+        @event.listens_for(pool, 'checkout')
+        def on_checkout(dbapi_connection, record, proxy):
+            status = self._pool_status()
+            with self._lock:
+                self.counters['checkouts'] += 1
+                if status.get('overflow', 0) > 0:
+                    self.counters['overflow_checkouts'] += 1
+                self.peak_checked_out = max(self.peak_checked_out, status.get('checked_out', 0))
+
+        @event.listens_for(pool, 'checkin')
+        def on_checkin(dbapi_connection, record):
+            self._count('checkins')
+
+        @event.listens_for(pool, 'invalidate')
+        def on_invalidate(dbapi_connection, record, exception):
+            self._count('invalidated')
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+            self._histogram(statement).observe(elapsed)
+            if elapsed >= SLOW_QUERY_MS:
+                logger.warning("Slow query (%.0f ms): %s", elapsed, statement[:200])
+            spent = query_time.get()
+            if spent is not None:
+                spent[0] += elapsed
+                spent[1] += 1
+
+        @event.listens_for(engine, 'handle_error')
+        def on_error(context):
+            stack = context.connection.info.get('query_started') if context.connection is not None else None
+            if stack:
+                stack.pop()
+            self._count('query_errors')
+
+        # No pool event fires before a checkout starts waiting, so time the
+        # pool's connect() itself
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            except Exception as e:
+                if type(e).__name__ == 'TimeoutError':
+                    self._count('pool_timeouts')
+                raise
+            finally:
+                self.checkout_wait.observe((time.perf_counter() - started) * 1000)
+
+        pool.connect = timed_connect
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _histogram(self, statement):
+        kind = statement.lstrip()[:6].upper()
+        if kind not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE'):
+            kind = 'OTHER'
+        histogram = self.query_latency.get(kind)
+        if histogram is None:
+            with self._lock:
+                histogram = self.query_latency.setdefault(kind, Histogram())
+        return histogram
+
+    def _pool_status(self):
+        status = {}
+        for engine in self.engines:
+            for name, attribute in (('size', 'size'), ('checked_out', 'checkedout'),
+                                    ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+                method = getattr(engine.pool, attribute, None)
+                if callable(method):
+                    status[name] = status.get(name, 0) + method()
+        return status
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            peak = self.peak_checked_out
+        return {
+            'pid': os.getpid(),
+            'pool_class': ', '.join(type(engine.pool).__name__ for engine in self.engines) or None,
+            'pool': self._pool_status(),
+            'peak_checked_out': peak,
+            'counters': counters,
+            'checkout_wait_ms': self.checkout_wait.snapshot(),
+            'query_latency_ms': {kind: histogram.snapshot() for kind, histogram in sorted(self.query_latency.items())},
+        }
+
+    def prometheus_lines(self):
+        """Pool gauges, counters and latency histograms in exposition format."""
+        if not self.engines:
+            return []
+        lines = ['# TYPE funnelcv_db_pool_connections gauge']
+        for state, value in self._pool_status().items():
+            lines.append(f'funnelcv_db_pool_connections{{state="{state}"}} {value}')
+        with self._lock:
+            counters = dict(self.counters)
+        for name, value in counters.items():
+            lines.append(f'# TYPE funnelcv_db_{name}_total counter')
+            lines.append(f'funnelcv_db_{name}_total {value}')
+        lines.append('# TYPE funnelcv_db_checkout_wait_seconds histogram')
+        lines.extend(histogram_lines('funnelcv_db_checkout_wait_seconds', self.checkout_wait))
+        lines.append('# TYPE funnelcv_db_query_duration_seconds histogram')
+        for kind, histogram in sorted(self.query_latency.items()):
+            lines.extend(histogram_lines('funnelcv_db_query_duration_seconds', histogram, [('statement', kind)]))
+        return lines
+
+
+db_metrics = DBMetrics()
+registry.collector(db_metrics.prometheus_lines)
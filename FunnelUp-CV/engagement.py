@@ -0,0 +1,245 @@
+import warnings
+
+from models import db, CVFeedback
+from rollups import RATING_SECTIONS
+
+PERCENTILES = (25, 50, 75, 90, 95)
+# Histogram edges for per-section dwell time, in milliseconds
+DWELL_BINS_MS = (0, 1000, 2000, 5000, 10000, 30000, 60000, 120000, 300000)
+# Upper bound on distinct section keys read from section_times
+MAX_SECTIONS = 50
+
+
+NUMBER_TYPES = (int, float)
+
+
+def _section_order(section):
+    # The funnel page keys sections by index ("0", "1", ...); keep that order
+    return (0, int(section), '') if section.isdigit() else (1, 0, section)
+
+
+class EngagementData:
+    """Feedback section timings and ratings as dense NumPy arrays.
+
+    ``times`` is (feedback rows x sections) in milliseconds with 0 meaning
+    not viewed; ``time_spent`` and ``ratings`` use NaN for missing values.
+    """
+
+    def __init__(self, sections, times, time_spent, ratings):
+        self.sections = sections
+        self.times = times
+        self.time_spent = time_spent
+        self.ratings = ratings
+
+    @classmethod
+    def from_documents(cls, rows):
+        """Build from (time_spent, section_times dict, detailed_ratings dict) rows."""
+        import numpy as np
+
+        columns = {}
+        cells_row, cells_col, cells_value = [], [], []
+        time_spent = []
+        ratings = []
+        # This loop is the slow part for large cohorts, hence the local names
+        add_row, add_col, add_value = cells_row.append, cells_col.append, cells_value.append
+        column_for = columns.setdefault
+        for index, (spent, section_times, detailed_ratings) in enumerate(rows):
+            # type() rather than isinstance() keeps booleans out
+            time_spent.append(spent if type(spent) in NUMBER_TYPES else None)
+            if type(section_times) is dict:
+                for section, value in section_times.items():
+                    if type(value) in NUMBER_TYPES and value > 0:
+                        add_row(index)
+                        add_col(column_for(section, len(columns)))
+                        add_value(value)
+            if type(detailed_ratings) is dict:
+                ratings.append([
+                    value if type(value) in NUMBER_TYPES else None
+                    for value in map(detailed_ratings.get, RATING_SECTIONS)
+                ])
+            else:
+                ratings.append(EMPTY_RATINGS)
+
+        # Reorder columns into page order
+        sections = sorted(columns, key=_section_order)
+        position = np.empty(len(columns), dtype=np.intp)
+        for new, section in enumerate(sections):
+            position[columns[section]] = new
+
+        times = np.zeros((len(time_spent), len(sections)))
+        if cells_value:
+            times[np.asarray(cells_row), position[np.asarray(cells_col)]] = cells_value
+        return cls(
+            sections,
+            times,
+            np.asarray(time_spent, dtype=float),
+            np.asarray(ratings, dtype=float).reshape(len(time_spent), len(RATING_SECTIONS))
+        )
+
+    @classmethod
+    def from_matrix(cls, sections, rows):
+        """Build from flat rows of [time_spent, *ratings, *section times] (None for missing)."""
+        import numpy as np
+
+        matrix = np.array(rows, dtype=float).reshape(len(rows), 1 + len(RATING_SECTIONS) + len(sections))
+        times = matrix[:, 1 + len(RATING_SECTIONS):]
+        times = np.where(times > 0, times, 0.0)
+        return cls(sections, times, matrix[:, 0], matrix[:, 1:1 + len(RATING_SECTIONS)])
+
+    def __len__(self):
+        return len(self.time_spent)
+
+
+EMPTY_RATINGS = [None] * len(RATING_SECTIONS)
+
+
+def _json_number(column, key):
+    """SQL expression for column[key] as a float, or NULL when it is not a JSON number."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        path = '$."' + key.replace('"', '""') + '"'
+        return db.case(
+            (db.func.json_type(column, path).in_(('integer', 'real')), db.func.json_extract(column, path))
+        )
+    return db.case((db.func.jsonb_typeof(column[key]) == 'number', column[key].as_float()))
+
+
+def _section_keys(slugs):
+    """Distinct section_times keys holding numbers for the given CVs, in page order."""
+    column = CVFeedback.section_times
+    if db.engine.dialect.name == 'sqlite':
+        items = db.func.json_each(column).table_valued('key', 'type')
+        numeric = items.c.type.in_(('integer', 'real'))
+        is_object = db.func.json_type(column) == 'object'
+    else:
+        # jsonb_each rejects non-objects, so hand it NULL for those instead
+        items = db.func.jsonb_each(
+            db.case((db.func.jsonb_typeof(column) == 'object', column))
+        ).table_valued('key', 'value')
+        numeric = db.func.jsonb_typeof(items.c.value) == 'number'
+        is_object = db.true()
+    query = (
+        db.select(items.c.key).select_from(CVFeedback).join(items, db.true())
+        .where(CVFeedback.cv_slug.in_(slugs), is_object, numeric)
+        .distinct()
+    )
+    return sorted((str(key) for key in db.session.execute(query).scalars()), key=_section_order)[:MAX_SECTIONS]
+
+
+def load_engagement(slugs, batch_size=5000):
+    """Read the feedback timings for one or more CVs into an EngagementData.
+
+    On SQLite and PostgreSQL the numbers are pulled out of the JSON columns
+    in SQL, so rows arrive as flat floats and skip JSON decoding in Python.
+    """
+    slugs = list(slugs)
+    if db.engine.dialect.name not in ('sqlite', 'postgresql'):
+        query = (
+            db.select(CVFeedback.time_spent, CVFeedback.section_times, CVFeedback.detailed_ratings)
+            .where(CVFeedback.cv_slug.in_(slugs))
+            .execution_options(yield_per=batch_size)
+        )
+        return EngagementData.from_documents(db.session.execute(query))
+
+    sections = _section_keys(slugs)
+    query = db.select(
+        CVFeedback.time_spent,
+        *[_json_number(CVFeedback.detailed_ratings, section) for section in RATING_SECTIONS],
+        *[_json_number(CVFeedback.section_times, section) for section in sections]
+    ).where(CVFeedback.cv_slug.in_(slugs))
+    rows = [tuple(row) for row in db.session.execute(query.execution_options(yield_per=batch_size))]
+    return EngagementData.from_matrix(sections, rows)
+
+
+def _number(value):
+    import numpy as np
+
+    return None if value is None or not np.isfinite(value) else round(float(value), 3)
+
+
+def _stats(mean, percentiles):
+    stats = {'mean': _number(mean)}
+    stats.update((f'p{p}', _number(value)) for p, value in zip(PERCENTILES, percentiles))
+    return stats
+
+
+def _percentiles(values, axis=None):
+    import numpy as np
+
+    with warnings.catch_warnings():
+        # All-NaN columns are expected for sections nobody opened
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(values, PERCENTILES, axis=axis), np.nanmean(values, axis=axis)
+
+
+def compute_engagement(data):
+    """Percentiles, dwell histograms, drop-off funnel and rating correlations."""
+    import numpy as np
+
+    n, section_count = data.times.shape
+    viewed = data.times > 0
+    viewers = viewed.sum(axis=0)
+
+    # Dwell statistics over the sessions that opened each section
+    dwell_percentiles, dwell_mean = _percentiles(np.where(viewed, data.times, np.nan), axis=0)
+    total_dwell = data.times.sum(axis=0)
+    all_dwell = total_dwell.sum()
+
+    # Histogram of every (session, section) cell in one bincount
+    edges = np.asarray(DWELL_BINS_MS, dtype=float)
+    bin_count = len(edges)
+    bins = np.searchsorted(edges, data.times, side='right') - 1
+    flat = (np.arange(section_count) * bin_count + bins)[viewed]
+    histograms = np.bincount(flat, minlength=section_count * bin_count).reshape(section_count, bin_count)
+
+    # Drop-off funnel: how many sessions got at least as far as each section
+    funnel = np.zeros(section_count, dtype=int)
+    if section_count:
+        reached_any = viewed.any(axis=1)
+        furthest = section_count - 1 - np.argmax(viewed[:, ::-1], axis=1)
+        funnel = np.bincount(furthest[reached_any], minlength=section_count)[::-1].cumsum()[::-1]
+
+    # Pearson correlation between section dwell and each rating, pairwise
+    # over sessions that have both, as a handful of matrix products
+    rated = np.isfinite(data.ratings)
+    x = np.where(viewed, data.times, 0.0)
+    y = np.where(rated, data.ratings, 0.0)
+    viewed_f = viewed.astype(float)
+    rated_f = rated.astype(float)
+    pairs = viewed_f.T @ rated_f
+    sum_x = x.T @ rated_f
+    sum_y = viewed_f.T @ y
+    sum_xy = x.T @ y
+    sum_xx = (x * x).T @ rated_f
+    sum_yy = viewed_f.T @ (y * y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = pairs * sum_xy - sum_x * sum_y
+        spread = np.sqrt((pairs * sum_xx - sum_x ** 2) * (pairs * sum_yy - sum_y ** 2))
+        correlations = np.where((pairs >= 3) & (spread > 0), covariance / spread, np.nan)
+
+    time_percentiles, time_mean = _percentiles(data.time_spent)
+
+    sections = []
+    for i, section in enumerate(data.sections):
+        sections.append({
+            'section': section,
+            'viewers': int(viewers[i]),
+            'reach_rate': _number(viewers[i] / n) if n else 0,
+            'dwell_ms': _stats(dwell_mean[i], dwell_percentiles[:, i]),
+            'share_of_dwell': _number(total_dwell[i] / all_dwell) if all_dwell else 0,
+            'histogram': histograms[i].tolist(),
+            'rating_correlation': {
+                rating: _number(correlations[i, j]) for j, rating in enumerate(RATING_SECTIONS)
+            },
+        })
+
+    return {
+        'feedback_count': int(n),
+        'time_spent_ms': _stats(time_mean, time_percentiles),
+        'histogram_bins_ms': list(DWELL_BINS_MS),
+        'sections': sections,
+        'funnel': [
+            {'section': section, 'reached': int(funnel[i]), 'rate': _number(funnel[i] / n) if n else 0}
+            for i, section in enumerate(data.sections)
+        ],
+    }
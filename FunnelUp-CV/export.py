@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+from datetime import datetime
+
+from models import db, CVAnalytics, CVFeedback
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 5000))
+
+# table name -> (model, plain columns, JSON columns flattened into <column>.<key>)
+EXPORT_TABLES = {
+    'analytics': (
+        CVAnalytics,
+        ('id', 'cv_slug', 'event_type', 'timestamp', 'visitor_ip', 'user_agent'),
+        ('event_data',),
+    ),
+    'feedback': (
+        CVFeedback,
+        ('id', 'cv_slug', 'feedback_type', 'message', 'time_spent', 'improvement_tips', 'timestamp', 'hr_ip'),
+        ('detailed_ratings', 'section_times'),
+    ),
+}
+
+EXPORT_FORMATS = ('csv', 'arrow', 'parquet')
+
+
+def parse_watermark(value):
+    """A watermark is the last exported row id; ISO timestamps from older exports still work once."""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return datetime.fromisoformat(value)
+
+
+def _cell(value, kind=None):
+    # Nested values stay as JSON text so every flattened cell is a scalar
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    # A key seen with mixed types is a string column, so its numbers and
+    # booleans are written as their JSON text too
+    if kind == 'string' and value is not None and not isinstance(value, str):
+        return json.dumps(value)
+    return value
+
+
+class TableExport:
+    """One table's rows after a watermark, flattened and read in constant memory.
+
+    The watermark is a row id rather than a timestamp: event timestamps are
+    stamped on receipt, but the ingest queue may insert them much later, so
+    only ids say what is already in the table. ``until`` is the highest id
+    when the export starts and becomes the next ``since``.
+
+    Rows are streamed with ``yield_per`` (a server-side cursor on
+    PostgreSQL). JSON columns become one column per top-level key; the keys
+    and their types come from a first streaming pass over just those columns,
+    so the header is fixed before any data is written.
+    """
+
+    def __init__(self, table, since=None, batch_size=None):
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
+        self.table = table
+        self.model, self.plain_columns, self.json_columns = EXPORT_TABLES[table]
+        self.since = since
+        self.until = db.session.execute(db.select(db.func.max(self.model.id))).scalar() or 0
+        if isinstance(since, int) and since > self.until:
+            self.until = since
+        self.batch_size = batch_size or EXPORT_BATCH_SIZE
+        self.rows = 0
+        self._flattened = None
+
+    def _window(self, query):
+        query = query.where(self.model.id <= self.until)
+        if isinstance(self.since, datetime):
+            query = query.where(self.model.timestamp >= self.since)
+        elif self.since is not None:
+            query = query.where(self.model.id > self.since)
+        return query.execution_options(yield_per=self.batch_size)
+
+    @property
+    def flattened(self):
+        """[(json column, key, kind)] where kind is 'number', 'bool' or 'string'."""
+        if self._flattened is None:
+            kinds = {}
+            columns = [getattr(self.model, name) for name in self.json_columns]
+            for values in db.session.execute(self._window(db.select(*columns))):
+                for column, value in zip(self.json_columns, values):
+                    if not isinstance(value, dict):
+                        continue
+                    for key, item in value.items():
+                        if item is None:
+                            kinds.setdefault((column, key), None)
+                            continue
+                        if isinstance(item, bool):
+                            kind = 'bool'
+                        elif isinstance(item, (int, float)):
+                            kind = 'number'
+                        else:
+                            kind = 'string'
+                        seen = kinds.get((column, key))
+                        kinds[(column, key)] = kind if seen in (None, kind) else 'string'
+            self._flattened = [(column, key, kind or 'string') for (column, key), kind in sorted(kinds.items())]
+        return self._flattened
+
+    @property
+    def header(self):
+        return list(self.plain_columns) + [f"{column}.{key}" for column, key, _ in self.flattened]
+
+    def batches(self):
+        """Yield lists of flattened row tuples, at most batch_size long."""
+        flattened = self.flattened
+        columns = [getattr(self.model, name) for name in self.plain_columns + self.json_columns]
+        split = len(self.plain_columns)
+        result = db.session.execute(self._window(db.select(*columns)))
+        for partition in result.partitions():
+            batch = []
+            for row in partition:
+                documents = dict(zip(self.json_columns, row[split:]))
+                batch.append(tuple(_cell(value) for value in row[:split]) + tuple(
+                    _cell(documents[column].get(key), kind) if isinstance(documents[column], dict) else None
+                    for column, key, kind in flattened
+                ))
+            self.rows += len(batch)
+            yield batch
+
+    def arrow_schema(self):
+        import pyarrow as pa
+
+        types = {
+            'id': pa.int64(), 'time_spent': pa.int64(), 'timestamp': pa.timestamp('us'),
+        }
+        kinds = {'number': pa.float64(), 'bool': pa.bool_(), 'string': pa.string()}
+        fields = [pa.field(name, types.get(name, pa.string())) for name in self.plain_columns]
+        fields += [pa.field(f"{column}.{key}", kinds[kind]) for column, key, kind in self.flattened]
+        return pa.schema(fields)
+
+    def arrow_batches(self):
+        import pyarrow as pa
+
+        schema = self.arrow_schema()
+        for batch in self.batches():
+            columns = zip(*batch)
+            yield pa.record_batch([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                  schema=schema)
+
+
+def csv_gzip_chunks(export):
+    """Stream the export as gzip-compressed CSV bytes, one chunk per batch."""
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.header)
+    for batch in export.batches():
+        writer.writerows(
+            tuple(value.isoformat() if isinstance(value, datetime) else value for value in row)
+            for row in batch
+        )
+        chunk = compressor.compress(buffer.getvalue().encode('utf-8'))
+        buffer.seek(0)
+        buffer.truncate()
+        if chunk:
+            yield chunk
+    yield compressor.compress(buffer.getvalue().encode('utf-8')) + compressor.flush()
+
+
+def arrow_stream_chunks(export):
+    """Stream the export in the Arrow IPC streaming format (needs pyarrow)."""
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, export.arrow_schema()) as writer:
+        for record_batch in export.arrow_batches():
+            writer.write_batch(record_batch)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def write_export(export, fmt, path):
+    """Write an export to path as csv (gzip), arrow (IPC file) or parquet. Returns rows written."""
+    if fmt == 'csv':
+        with open(path, 'wb') as f:
+            for chunk in csv_gzip_chunks(export):
+                f.write(chunk)
+    elif fmt == 'arrow':
+        import pyarrow as pa
+
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, export.arrow_schema()) as writer:
+            for record_batch in export.arrow_batches():
+                writer.write_batch(record_batch)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        with pq.ParquetWriter(path, export.arrow_schema(), compression='zstd') as writer:
+            for record_batch in export.arrow_batches():
+                writer.write_batch(record_batch)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    logger.info("Exported %s %s rows to %s", export.rows, export.table, path)
+    return export.rows
@@ -0,0 +1,188 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from models import db, CVAnalytics
+from rollups import apply_analytics
+
+logger = logging.getLogger(__name__)
+
+
+def analytics_row(cv_slug, event_type, event_data=None, visitor_ip=None, user_agent=None):
+    """Build a CVAnalytics insert mapping stamped with the server receive time."""
+    return {
+        'cv_slug': cv_slug,
+        'event_type': event_type,
+        'event_data': event_data,
+        'timestamp': datetime.utcnow(),
+        'visitor_ip': visitor_ip,
+        'user_agent': user_agent,
+    }
+
+
+class AnalyticsIngest:
+    """In-process queue that batches analytics events into bulk inserts.
+
+    Events are accepted immediately and written by a background thread
+    once ``batch_size`` rows are waiting or ``flush_interval`` seconds
+    have passed, whichever comes first.
+    """
+
+    def __init__(self, app=None, batch_size=None, flush_interval=None, max_backlog=None):
+        self.batch_size = batch_size or int(os.environ.get("ANALYTICS_BATCH_SIZE", 200))
+        self.flush_interval = flush_interval or float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 2.0))
+        self.max_backlog = max_backlog or int(os.environ.get("ANALYTICS_MAX_BACKLOG", 10000))
+
+        self.app = None
+        self._queue = queue.Queue(maxsize=self.max_backlog)
+        self._lock = threading.Lock()
+        self._put_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self.counters = {
+            'accepted': 0,
+            'dropped': 0,
+            'flushed': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'failed_rows': 0,
+        }
+        self.last_flush_ms = 0.0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the ingest queue to a Flask app and flush on interpreter exit."""
+        self.app = app
+        app.extensions['analytics_ingest'] = self
+        atexit.register(self.shutdown)
+
+    def submit(self, cv_slug, event_type, event_data=None, visitor_ip=None, user_agent=None):
+        """Queue a single event. Returns False if the backlog is full."""
+        return self.submit_many([analytics_row(cv_slug, event_type, event_data, visitor_ip, user_agent)])
+
+    def submit_many(self, rows):
+        """Queue analytics_row mappings all-or-nothing. Returns False if they do not all fit."""
+        if self.app is None:
+            return False
+
+        self._ensure_worker()
+
+        # Only producers take this lock and the flusher only drains the
+        # queue, so the free space checked here cannot shrink before the puts
+        with self._put_lock:
+            if self.max_backlog - self._queue.qsize() < len(rows):
+                with self._lock:
+                    self.counters['dropped'] += len(rows)
+                return False
+            for row in rows:
+                self._queue.put_nowait(row)
+
+        with self._lock:
+            self.counters['accepted'] += len(rows)
+        return True
+
+    def flush(self):
+        """Write everything currently queued to the database."""
+        with self._flush_lock:
+            while True:
+                rows = self._drain(self.batch_size)
+                if not rows:
+                    return
+                self._write(rows)
+
+    def shutdown(self):
+        """Stop the background thread and flush whatever is left."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout=self.flush_interval + 5)
+        if self.app is not None:
+            self.flush()
+
+    def stats(self):
+        """Return queue depth and throughput counters for monitoring."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({
+            'backlog': self._queue.qsize(),
+            'max_backlog': self.max_backlog,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+        })
+        return stats
+
+    def _ensure_worker(self):
+        # Gunicorn forks workers after import, so the flusher thread is
+        # started lazily in the process that actually receives traffic.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='analytics-ingest', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            # Sleep until the batch fills up or the interval expires
+            while self._queue.qsize() < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._stop.wait(min(remaining, 0.05))
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Analytics ingest flush failed: %s", e)
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        try:
+            self._insert(rows)
+        except Exception as e:
+            logger.error("Error writing %s analytics events: %s", len(rows), e)
+            with self._lock:
+                self.counters['failed_batches'] += 1
+                self.counters['failed_rows'] += len(rows)
+
+    def _insert(self, rows):
+        # Runs on the flusher thread (or at shutdown), never in a request,
+        # so locking rollup rows here does not hold up page views
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                db.session.execute(db.insert(CVAnalytics), rows)
+                apply_analytics(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.counters['flushed'] += len(rows)
+            self.counters['batches'] += 1
+
+
+analytics_ingest = AnalyticsIngest()
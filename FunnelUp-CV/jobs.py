@@ -0,0 +1,386 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function to stop work after cancel() was called."""
+
+
+class Job:
+    """State of one background job, safe to read from request threads.
+
+    Besides status polling, a job keeps an append-only list of
+    ``(event, data)`` pairs that streaming endpoints can follow with
+    ``events_since``.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'  # queued, running, succeeded, failed, cancelled
+        self.stage = 'queued'
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self.task = None  # asyncio task for jobs started with submit_async
+        self.on_change = None  # called after status or stage changes
+        self._changed = threading.Condition()
+        self._done = threading.Event()
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self.publish('stage', {'stage': stage})
+        self._changed_state()
+
+    def _changed_state(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def publish(self, event, data):
+        with self._changed:
+            self.events.append((event, data))
+            self._changed.notify_all()
+
+    def events_since(self, index, timeout=None):
+        """Return (new_events, next_index), waiting up to timeout for new ones."""
+        with self._changed:
+            if index >= len(self.events) and not self.finished:
+                self._changed.wait(timeout)
+            return self.events[index:], len(self.events)
+
+    def _finish(self):
+        # Publish the final event and mark done atomically so followers
+        # never see a finished job without its closing event
+        with self._changed:
+            self.events.append((self.status, {'result': self.result, 'error': self.error}))
+            self._done.set()
+            self._changed.notify_all()
+
+    def cancel(self):
+        """Ask the job to stop; the job function checks ``cancelled`` and raises JobCancelled."""
+        self.cancelled = True
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobRunner:
+    """Bounded thread pool that runs jobs off the request path.
+
+    ``max_workers`` caps concurrent jobs per process and ``max_pending``
+    caps queued plus running jobs; beyond that ``submit`` refuses work so
+    callers can shed load instead of piling up threads. Job state lives in
+    this process and finished jobs are forgotten after ``ttl`` seconds.
+
+    With ``init_app`` the status and stage of every job are also written to
+    the database, off the job's thread, so another worker process can
+    answer status and event requests for it (``load``) and pass on a cancel
+    (``request_cancel``). Only the process running a job streams its text.
+    """
+
+    def __init__(self, name, max_workers=4, max_pending=32, ttl=600, poll_interval=1.0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.store = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._store_executor = None
+        self._watcher = None
+        self._pid = None
+        self.counters = {'submitted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0}
+
+    def init_app(self, app):
+        """Share job state with other workers through the app's database."""
+        self.store = SQLAlchemyJobStore(app)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(job, *args, **kwargs). Returns the Job, or None when full."""
+        job = self._admit()
+        if job is None:
+            return None
+
+        # Run in a copy of the caller's context so log fields such as the
+        # request id follow the job onto the worker thread
+        with self._lock:
+            executor = self._pool()
+        executor.submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    def submit_async(self, fn, *args, **kwargs):
+        """Schedule coroutine fn(job, *args, **kwargs) on the running event loop.
+
+        The job shares the registry and limits with thread jobs, so the
+        status, events and cancel endpoints work the same, but it holds no
+        worker thread while it awaits I/O.
+        """
+        job = self._admit()
+        if job is None:
+            return None
+
+        # Keep a reference so the task is not garbage collected mid-flight
+        job.task = asyncio.get_running_loop().create_task(self._run_async(job, fn, args, kwargs))
+        return job
+
+    def _admit(self):
+        with self._lock:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                self.counters['rejected'] += 1
+                return None
+            job = Job()
+            self._jobs[job.id] = job
+            self.counters['submitted'] += 1
+            if self.store is not None:
+                job.on_change = self._save
+                self._ensure_watcher()
+        job._changed_state()
+        return job
+
+    def get(self, job_id):
+        """The Job object, for jobs running in this process."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def load(self, job_id):
+        """Job.to_dict() for a job run by any worker, or None if unknown or expired."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is None:
+            return None
+        return self.store.load(job_id)
+
+    def request_cancel(self, job_id):
+        """Cancel a job wherever it runs. Returns False if it is unknown or expired."""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+            return True
+        if self.store is None:
+            return False
+        return self.store.request_cancel(job_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['running'] = sum(1 for job in self._jobs.values() if job.status == 'running')
+            stats['queued'] = sum(1 for job in self._jobs.values() if job.status == 'queued')
+        stats['max_workers'] = self.max_workers
+        stats['max_pending'] = self.max_pending
+        return stats
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        job._changed_state()
+        try:
+            job.check_cancelled()
+            job.result = fn(job, *args, **kwargs)
+            job.status = 'succeeded'
+            job.stage = 'done'
+        except JobCancelled:
+            logger.info("%s job %s cancelled", self.name, job.id)
+            job.status = 'cancelled'
+        except Exception as e:
+            logger.error("%s job %s failed: %s", self.name, job.id, e)
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self.counters[job.status] += 1
+            job._finish()
+            job._changed_state()
+
+    async def _run_async(self, job, fn, args, kwargs):
+        job.status = 'running'
+        job._changed_state()
+        try:
+            job.check_cancelled()
+            job.result = await fn(job, *args, **kwargs)
+            job.status = 'succeeded'
+            job.stage = 'done'
+        except JobCancelled:
+            logger.info("%s job %s cancelled", self.name, job.id)
+            job.status = 'cancelled'
+        except Exception as e:
+            logger.error("%s job %s failed: %s", self.name, job.id, e)
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self.counters[job.status] += 1
+            job._finish()
+            job._changed_state()
+
+    def _pool(self):
+        # Created lazily so each forked gunicorn worker gets its own threads
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            self._store_executor = None
+            self._watcher = None
+            self._pid = os.getpid()
+        return self._executor
+
+    def _save(self, job):
+        # One writer thread keeps each job's writes in order and keeps
+        # database round trips off job threads and the event loop
+        snapshot = job.to_dict()
+        with self._lock:
+            self._pool()
+            if self._store_executor is None:
+                self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.name}-store")
+            executor = self._store_executor
+        executor.submit(self._persist, snapshot)
+
+    def _persist(self, snapshot):
+        try:
+            self.store.save(snapshot)
+        except Exception as e:
+            logger.error("Could not record %s job %s: %s", self.name, snapshot['id'], e)
+
+    def _ensure_watcher(self):
+        # Called with self._lock held
+        self._pool()
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name=f"{self.name}-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        """Apply cancels requested through other workers and drop expired job records."""
+        last_expiry = 0.0
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                running = [job for job in self._jobs.values() if not job.finished and not job.cancelled]
+            try:
+                if running:
+                    cancelled = self.store.cancel_requested([job.id for job in running])
+                    for job in running:
+                        if job.id in cancelled:
+                            job.cancel()
+                if time.monotonic() - last_expiry >= 60:
+                    last_expiry = time.monotonic()
+                    self.store.expire(time.time() - self.ttl)
+            except Exception as e:
+                logger.error("%s job watcher failed: %s", self.name, e)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SQLAlchemyJobStore:
+    """GenerationJobRecord rows in the app's database, shared by every worker."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def save(self, snapshot):
+        from models import db, GenerationJobRecord
+
+        with self.app.app_context():
+            try:
+                record = db.session.get(GenerationJobRecord, snapshot['id'])
+                if record is None:
+                    record = GenerationJobRecord(id=snapshot['id'])
+                    db.session.add(record)
+                record.status = snapshot['status']
+                record.stage = snapshot['stage']
+                record.result = snapshot['result']
+                record.error = snapshot['error']
+                record.updated_at = datetime.utcnow()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def load(self, job_id):
+        from models import db, GenerationJobRecord
+
+        with self.app.app_context():
+            record = db.session.get(GenerationJobRecord, job_id)
+            if record is None:
+                return None
+            return {
+                'id': record.id,
+                'status': record.status,
+                'stage': record.stage,
+                'result': record.result,
+                'error': record.error,
+            }
+
+    def request_cancel(self, job_id):
+        from models import db, GenerationJobRecord
+
+        with self.app.app_context():
+            updated = db.session.execute(
+                db.update(GenerationJobRecord).where(GenerationJobRecord.id == job_id).values(cancel_requested=True)
+            ).rowcount
+            db.session.commit()
+            return updated > 0
+
+    def cancel_requested(self, job_ids):
+        """The subset of job_ids whose cancel was requested."""
+        from models import db, GenerationJobRecord
+
+        with self.app.app_context():
+            return set(db.session.execute(
+                db.select(GenerationJobRecord.id)
+                .where(GenerationJobRecord.id.in_(job_ids), GenerationJobRecord.cancel_requested.is_(True))
+            ).scalars())
+
+    def expire(self, cutoff):
+        """Delete records not updated since the cutoff (a Unix timestamp)."""
+        from models import db, GenerationJobRecord
+
+        with self.app.app_context():
+            db.session.execute(
+                db.delete(GenerationJobRecord).where(GenerationJobRecord.updated_at < datetime.utcfromtimestamp(cutoff))
+            )
+            db.session.commit()
+
+
+generation_jobs = JobRunner(
+    'generation',
+    max_workers=int(os.environ.get("GENERATION_WORKERS", 4)),
+    max_pending=int(os.environ.get("GENERATION_MAX_PENDING", 32)),
+    ttl=int(os.environ.get("GENERATION_JOB_TTL", 600))
+)
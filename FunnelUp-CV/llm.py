@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from metrics import openai_duration, openai_requests, openai_tokens
+from model_router import AsyncRoutedCompletions, RoutedClient, RoutedCompletions, model_router
+
+logger = logging.getLogger(__name__)
+
+
+class StubCompletions:
+    """Offline stand-in for ``client.chat.completions`` used in tests and benchmarks.
+
+    Echoes the user message back as a short multi-paragraph summary after an
+    optional delay (``OPENAI_STUB_LATENCY`` seconds) to mimic network time.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(model, messages, **kwargs)
+
+    def _respond(self, model, messages, **kwargs):
+        system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+        user = next((m['content'] for m in messages if m['role'] == 'user'), '')
+        content = (
+            f"{user.strip()[:600]}\n\n"
+            f"Furthermore, the candidate demonstrates a strong fit for this position. "
+            f"({model}: {system[:60]})"
+        )
+        if kwargs.get('stream'):
+            return self._stream(content)
+        message = SimpleNamespace(role='assistant', content=content)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')],
+            usage=SimpleNamespace(prompt_tokens=len(system + user) // 4, completion_tokens=len(content) // 4)
+        )
+
+    def _stream(self, content):
+        # Emit word-sized deltas the way the streaming API does
+        for piece in content.split(' '):
+            delta = SimpleNamespace(content=piece + ' ')
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+
+
+class AsyncStubCompletions(StubCompletions):
+    """``StubCompletions`` for the async client: awaits the latency instead of sleeping."""
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = self._respond(model, messages, **kwargs)
+        return self._astream(response) if kwargs.get('stream') else response
+
+    async def _astream(self, chunks):
+        for chunk in chunks:
+            yield chunk
+
+
+class StubClient:
+    """Mirrors the small slice of the OpenAI client the app uses."""
+
+    def __init__(self, latency=0.0, completions=StubCompletions):
+        self.chat = SimpleNamespace(completions=completions(latency))
+
+
+def _record_usage(model, usage):
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        count = getattr(usage, kind, None)
+        if count:
+            openai_tokens.inc(model, kind[:-len('_tokens')], amount=count)
+
+
+class MeteredStream:
+    """Wraps a streaming response to time it until the last chunk or close()."""
+
+    def __init__(self, stream, model, started):
+        self._stream = stream
+        self._model = model
+        self._started = started
+        self._outcome = None
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                # Only sent when the request asked for stream_options.include_usage
+                _record_usage(self._model, getattr(chunk, 'usage', None))
+                yield chunk
+        except Exception:
+            self._finish('error')
+            raise
+        self._finish('success')
+
+    def close(self):
+        if hasattr(self._stream, 'close'):
+            self._stream.close()
+        self._finish('cancelled')
+
+    def _finish(self, outcome):
+        if self._outcome is not None:
+            return
+        self._outcome = outcome
+        elapsed = (time.perf_counter() - self._started) * 1000
+        openai_requests.inc(self._model, outcome)
+        openai_duration.observe(elapsed, self._model, 'true')
+        logger.info("OpenAI %s stream %s in %.0f ms", self._model, outcome, elapsed)
+
+
+class AsyncMeteredStream(MeteredStream):
+    """``MeteredStream`` for async iteration over an AsyncOpenAI stream."""
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            async for chunk in self._stream:
+                _record_usage(self._model, getattr(chunk, 'usage', None))
+                yield chunk
+        except Exception:
+            self._finish('error')
+            raise
+        self._finish('success')
+
+    async def aclose(self):
+        close = getattr(self._stream, 'close', None) or getattr(self._stream, 'aclose', None)
+        if close is not None:
+            await close()
+        self._finish('cancelled')
+
+
+class MeteredCompletions:
+    """``chat.completions`` that counts calls, tokens and latency for /metrics."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, messages, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self._client.chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            self._failed(model, started, kwargs, e)
+            raise
+        if kwargs.get('stream'):
+            return MeteredStream(response, model, started)
+        self._succeeded(model, started, response)
+        return response
+
+    def _failed(self, model, started, kwargs, error):
+        elapsed = (time.perf_counter() - started) * 1000
+        openai_requests.inc(model, 'error')
+        openai_duration.observe(elapsed, model, str(bool(kwargs.get('stream'))).lower())
+        logger.warning("OpenAI %s call failed after %.0f ms: %s", model, elapsed, error)
+
+    def _succeeded(self, model, started, response):
+        elapsed = (time.perf_counter() - started) * 1000
+        usage = getattr(response, 'usage', None)
+        openai_requests.inc(model, 'success')
+        openai_duration.observe(elapsed, model, 'false')
+        _record_usage(model, usage)
+        logger.info("OpenAI %s call took %.0f ms", model, elapsed,
+                    extra={'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+                           'completion_tokens': getattr(usage, 'completion_tokens', None)})
+
+
+class AsyncMeteredCompletions(MeteredCompletions):
+    """``MeteredCompletions`` for AsyncOpenAI: same metrics, awaited call."""
+
+    async def create(self, model, messages, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self._client.chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            self._failed(model, started, kwargs, e)
+            raise
+        if kwargs.get('stream'):
+            return AsyncMeteredStream(response, model, started)
+        self._succeeded(model, started, response)
+        return response
+
+
+class LazyClient:
+    """Builds the wrapped client on first use.
+
+    Importing and constructing the OpenAI SDK takes most of a second, so a
+    fresh worker only pays for it when it first generates (or in the
+    background when PREWARM includes openai).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def chat(self):
+        return self.warm().chat
+
+    def warm(self):
+        """Construct the client now if that has not happened yet, and return it."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                    logger.info("Created %s client", type(self._client).__name__)
+        return self._client
+
+
+class MeteredClient:
+    """Client facade exposing metered ``chat.completions``."""
+
+    def __init__(self, client, completions=MeteredCompletions):
+        self.client = client
+        self.chat = SimpleNamespace(completions=completions(client))
+
+    def warm(self):
+        if hasattr(self.client, 'warm'):
+            self.client.warm()
+
+
+def _router_enabled():
+    # MODEL_ROUTER=0 sends every call straight to the requested model
+    return os.environ.get("MODEL_ROUTER", "1").lower() not in ('0', 'false', 'no', 'off')
+
+
+def _max_retries():
+    # The router retries with backoff and circuit breaking, so the SDK should not retry underneath it
+    return int(os.environ.get("OPENAI_MAX_RETRIES", 0 if _router_enabled() else 2))
+
+
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=_max_retries())
+
+
+def _async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=_max_retries())
+
+
+def _routed(client, completions):
+    if not _router_enabled():
+        return client
+    return RoutedClient(client, model_router, completions=completions)
+
+
+def make_client():
+    """Build the OpenAI client, or the local stub when OPENAI_STUB is set.
+
+    The real client is created lazily on the first completion request.
+    Calls go through the model router (timeouts, hedging, retries, circuit
+    breaking) unless MODEL_ROUTER=0.
+    """
+    if os.environ.get("OPENAI_STUB"):
+        client = MeteredClient(StubClient(latency=float(os.environ.get("OPENAI_STUB_LATENCY", 0))))
+    else:
+        client = MeteredClient(LazyClient(_openai_client))
+    return _routed(client, RoutedCompletions)
+
+
+def make_async_client():
+    """``make_client`` for the ASGI entry point, backed by AsyncOpenAI."""
+    if os.environ.get("OPENAI_STUB"):
+        stub = StubClient(float(os.environ.get("OPENAI_STUB_LATENCY", 0)), completions=AsyncStubCompletions)
+        client = MeteredClient(stub, completions=AsyncMeteredCompletions)
+    else:
+        client = MeteredClient(LazyClient(_async_openai_client), completions=AsyncMeteredCompletions)
+    return _routed(client, AsyncRoutedCompletions)
@@ -0,0 +1,148 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+# Fields attached to every record logged in the current context, e.g.
+# request_id for a request and the generation job it started
+log_context = ContextVar('log_context', default={})
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+_listener = None
+
+
+def bind(**fields):
+    """Add fields to the log context of the current request, job or thread."""
+    log_context.set({**log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current log context onto records before they leave the thread."""
+
+    def filter(self, record):
+        for name, value in log_context.get().items():
+            if not hasattr(record, name):
+                setattr(record, name, value)
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler renders ``msg % args`` and the traceback in the
+    logging thread; records here are only consumed in-process, so they go
+    on the queue as they are.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with the message, context fields and extras."""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text for local development, with the context fields appended."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        context = ' '.join(f'{name}={value}' for name, value in vars(record).items()
+                           if name not in _RECORD_ATTRIBUTES and not name.startswith('_'))
+        return f'{line} [{context}]' if context else line
+
+
+def _parse_levels(spec):
+    """'sqlalchemy.engine=INFO,main=DEBUG' -> {'sqlalchemy.engine': 'INFO', 'main': 'DEBUG'}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        if level.strip().upper() not in logging.getLevelNamesMapping():
+            raise ValueError(f"Unknown log level in LOG_LEVELS: {item}")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Route all logging through a queue drained by one background thread.
+
+    LOG_LEVEL sets the root level (default INFO), LOG_LEVELS overrides
+    individual loggers ("rollups=DEBUG,sqlalchemy.engine=INFO") and
+    LOG_FORMAT picks json (default) or text output on stderr.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    output.setFormatter(TextFormatter() if os.environ.get('LOG_FORMAT') == 'text' else JSONFormatter())
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    for name, level in _parse_levels(os.environ.get('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _start_request():
+    from flask import g, request
+
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+    log_context.set({'request_id': g.request_id})
+
+
+def _tag_response(response):
+    from flask import g
+
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    return response
+
+
+def _end_request(exc):
+    log_context.set({})
+
+
+def init_app(app):
+    """Give each request an id (from X-Request-ID or generated) for its log records."""
+    app.before_request(_start_request)
+    app.after_request(_tag_response)
+    app.teardown_request(_end_request)
@@ -1,353 +1,545 @@
-from flask import Flask, render_template, request, redirect, url_for, make_response, send_file, jsonify
-from openai import OpenAI
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, make_response, send_file, jsonify, Response, stream_with_context
 import os
 import logging
+import click
 import re
-import random
-import io
 import json
-from datetime import datetime
-from models import db, CVProfile, CVFeedback, CVAnalytics
+import hashlib
+import hmac
+import threading
+import time
+from models import db, CVFeedback, CVProfile, CVRollup
+from ingest import analytics_ingest, analytics_row
+from rollups import apply_feedback, rebuild_rollups, summarize, unique_visitors
+from migrations import upgrade_schema
+from dbmetrics import db_metrics, engine_options
+from metrics import registry
+import profiling
+from dashboard import DASHBOARD_SORTS, MAX_PER_PAGE, dashboard_page
+from engagement import load_engagement, compute_engagement
+from export import EXPORT_FORMATS, EXPORT_TABLES, TableExport, arrow_stream_chunks, csv_gzip_chunks, parse_watermark, write_export
+from retention import compact_analytics, ensure_partitions, partition_analytics, retention_cutoff
+from cache import profile_cache, page_cache, engagement_cache
+from pdf import pdf_cache, warm as warm_pdf, zip_chunks
+from storage import make_profile_store
+from humanizer import humanize_text
+from jobs import generation_jobs, JobCancelled
+from llm import make_client
+from model_router import ModelTimeout, ModelUnavailable, answered_by, model_router
+from completion_cache import make_completion_cache
+import logsetup
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# JSON logs written by a background thread (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
+logsetup.configure_logging()
+logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-
-# Set up configuration
-app.secret_key = os.environ.get("SESSION_SECRET", "funnelcv-secret-key")
+# Routes and CLI commands are registered on this blueprint; create_app() builds the app
+views = Blueprint('main', __name__, cli_group=None)
 
 # Load database URL, with a fallback for testing
 database_url = os.environ.get("DATABASE_URL")
-if database_url:
-    logging.info(f"Using database: {database_url[:10]}...(redacted)")
-    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
-    # Initialize database
-    db.init_app(app)
-    
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        logging.info("Database tables created successfully")
-else:
-    logging.warning("DATABASE_URL not found. Database features disabled.")
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI client, constructed on first use (set OPENAI_STUB=1 to use the offline stub)
+client = make_client()
+
+# All CV profile reads and writes go through one store, cached in-process
+profile_store = make_profile_store(database_url, cache=profile_cache)
 
-@app.route('/')
+# Cache completions for identical prompts (COMPLETION_CACHE=memory|sqlite|sql|off)
+completion_cache = make_completion_cache(sql_available=bool(database_url))
+
+@views.route('/')
 def index():
     """Render the main form page"""
     return render_template('index.html')
 
-@app.route('/generate', methods=['POST'])
+GENERATION_SYNC_TIMEOUT = float(os.environ.get("GENERATION_SYNC_TIMEOUT", 120))
+
+def wants_json():
+    """True when the client asked for a JSON response instead of HTML"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def export_authorized():
+    """True when the request carries ``Authorization: Bearer <EXPORT_TOKEN>``"""
+    token = os.environ.get("EXPORT_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}")
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+def metrics_authorized():
+    """True unless METRICS_TOKEN is set and the request lacks its bearer token"""
+    if not METRICS_TOKEN:
+        return True
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}")
+
+METRICS_FORBIDDEN = {'status': 'error', 'message': 'Not authorized'}
+
+GENERATION_FIELDS_MISSING = "All fields except skills and video link are required"
+GENERATION_BUSY = "We're generating a lot of CVs right now. Please try again in a moment."
+GENERATION_UNKNOWN_MODEL = "Unknown model"
+DEFAULT_MODEL = 'gpt-5-nano'
+
+def allowed_models():
+    """Models a generation may ask for: the default plus those MODEL_FALLBACKS/MODEL_TIMEOUTS name.
+
+    The router and /metrics keep per-model state, so free-form model names
+    from the form would grow them without bound.
+    """
+    return {DEFAULT_MODEL} | model_router.models()
+
+def generation_form(values):
+    """Job input from the submitted form fields; None when required fields are missing"""
+    form = {
+        'name': values.get('name', ''),
+        'job': values.get('job', ''),
+        'company': values.get('company', ''),
+        'summary': values.get('summary', ''),
+        'skills': values.get('skills', ''),
+        'video': values.get('video', ''),
+        'model': values.get('model') or DEFAULT_MODEL,
+        'funnel_style': values.get('funnel_style', 'modern'),
+        'stream': values.get('stream') == '1',
+        'bypass_cache': values.get('bypass_cache') == '1'
+    }
+    if not all([form['name'], form['job'], form['company'], form['summary']]):
+        return None
+    return form
+
+@views.route('/generate', methods=['POST'])
 def generate():
-    """Process form data and generate a tailored CV summary"""
-    # Get form data
-    name = request.form.get('name', '')
-    job = request.form.get('job', '')
-    company = request.form.get('company', '')
-    summary = request.form.get('summary', '')
-    skills = request.form.get('skills', '')
-    video = request.form.get('video', '')
-    funnel_style = request.form.get('funnel_style', 'modern')
+    """Queue a tailored CV summary generation job"""
+    form = generation_form(request.form)
     
     # Validate required fields
-    if not all([name, job, company, summary]):
-        logging.error("Missing required fields")
-        return render_template('index.html', error="All fields except skills and video link are required")
+    if form is None:
+        logger.error("Missing required fields")
+        error_message = GENERATION_FIELDS_MISSING
+        if wants_json():
+            return jsonify({'status': 'error', 'message': error_message}), 400
+        return render_template('index.html', error=error_message)
+    
+    if form['model'] not in allowed_models():
+        if wants_json():
+            return jsonify({'status': 'error', 'message': GENERATION_UNKNOWN_MODEL}), 400
+        return render_template('index.html', error=GENERATION_UNKNOWN_MODEL), 400
+    
+    job = generation_jobs.submit(run_generation, current_app._get_current_object(), form)
+    if job is None:
+        error_message = GENERATION_BUSY
+        if wants_json():
+            response = jsonify({'status': 'error', 'message': error_message})
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        return render_template('index.html', error=error_message, **form), 503
+    
+    if wants_json():
+        return jsonify({
+            'status': 'accepted',
+            'job_id': job.id,
+            'status_url': url_for('main.generation_status', job_id=job.id),
+            'events_url': url_for('main.generation_events', job_id=job.id),
+            'cancel_url': url_for('main.cancel_generation', job_id=job.id)
+        }), 202
+    
+    # Plain form posts (no JavaScript) wait for the job as before
+    job.wait(GENERATION_SYNC_TIMEOUT)
+    if job.status == 'succeeded':
+        return redirect(generation_redirect_url(job.result))
+    return render_template('index.html',
+                         error=job.error or "Generation is taking longer than expected. Please try again.",
+                         **form)
+
+@views.route('/generate/status/<job_id>')
+def generation_status(job_id):
+    """Report progress of a generation job, whichever worker is running it"""
+    data = generation_jobs.load(job_id)
+    if data is None:
+        return jsonify({'status': 'error', 'message': 'Unknown or expired job'}), 404
+    
+    if data['status'] == 'succeeded':
+        data['redirect_url'] = generation_redirect_url(data['result'])
+    return jsonify(data)
+
+@views.route('/generate/events/<job_id>')
+def generation_events(job_id):
+    """Stream generation progress and partial summary text as Server-Sent Events"""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        # Running on another worker: follow its stored stage and outcome
+        if generation_jobs.load(job_id) is None:
+            return jsonify({'status': 'error', 'message': 'Unknown or expired job'}), 404
+        return event_stream(recorded_job_events(job_id))
+    
+    def stream():
+        index = 0
+        while True:
+            events, index = job.events_since(index, timeout=15)
+            if not events:
+                if job.finished:
+                    return
+                yield ": keepalive\n\n"
+                continue
+            for event, data in events:
+                if event == 'succeeded':
+                    data = dict(data, redirect_url=generation_redirect_url(data['result']))
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event in ('succeeded', 'failed', 'cancelled'):
+                    return
+    
+    return event_stream(stream())
+
+def event_stream(chunks):
+    """Server-Sent Events response that proxies don't buffer"""
+    return Response(
+        stream_with_context(chunks),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def recorded_job_events(job_id, poll_interval=1.0, keepalive=15.0):
+    """Stage and final events for a job run by another worker, polled from its record"""
+    stage = None
+    last_sent = time.monotonic()
+    while True:
+        data = generation_jobs.load(job_id)
+        if data is None:
+            yield f"event: failed\ndata: {json.dumps({'result': None, 'error': 'Unknown or expired job'})}\n\n"
+            return
+        if data['status'] in ('succeeded', 'failed', 'cancelled'):
+            final = {'result': data['result'], 'error': data['error']}
+            if data['status'] == 'succeeded':
+                final['redirect_url'] = generation_redirect_url(data['result'])
+            yield f"event: {data['status']}\ndata: {json.dumps(final)}\n\n"
+            return
+        if data['stage'] != stage:
+            stage = data['stage']
+            last_sent = time.monotonic()
+            yield f"event: stage\ndata: {json.dumps({'stage': stage})}\n\n"
+        elif time.monotonic() - last_sent >= keepalive:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+        time.sleep(poll_interval)
+
+@views.route('/generate/cancel/<job_id>', methods=['POST'])
+def cancel_generation(job_id):
+    """Stop a running generation; nothing is saved for cancelled jobs"""
+    if not generation_jobs.request_cancel(job_id):
+        return jsonify({'status': 'error', 'message': 'Unknown or expired job'}), 404
+    return jsonify({'status': 'success'})
+
+def generation_redirect_url(result):
+    """Where to send the user once their CV has been generated"""
+    if result['funnel_style'] == 'chat':
+        return url_for('main.chat_funnel', slug=result['slug'])
+    return url_for('main.funnel', slug=result['slug'])
+
+def run_generation(job, app, form):
+    """Generate, humanize and store a CV profile (runs on a generation worker)"""
+    name = form['name']
+    job_title = form['job']
+    company = form['company']
     
     try:
-        logging.info(f"Starting CV generation for {name} - {job} at {company}")
-        logging.info(f"Skills provided: {skills}")
-        
-        # Prompt AI to rewrite summary using GPT-3.5-Turbo
-        logging.info("Calling OpenAI API...")
-        response = client.chat.completions.create(
-            model=request.form.get('model', 'gpt-5-nano'),
-            messages=[
-                {"role": "system", "content": f"Create a professional and tailored CV summary for a {job} role at {company}. The summary should be concise, well-formatted with paragraphs, and highlight the most relevant qualifications and experiences for this specific position. Focus on what would make the candidate stand out to HR professionals."},
-                {"role": "user", "content": summary}
-            ]
-        )
-        
-        ai_content = response.choices[0].message.content.strip()
-        
-        # Apply humanizer to make content sound more natural if it seems AI-generated
-        rewritten = humanize_text(ai_content)
-        
-        # Create a unique URL slug from input data
-        slug = create_slug(name, job, company)
-        
-        # Get the processed video URL
-        processed_video = process_video_url(video)
-        
-        # Check if we're using database or Replit DB
-        if database_url:
-            # Store in PostgreSQL database
-            with app.app_context():
-                # Check if slug already exists
-                existing_profile = CVProfile.query.filter_by(slug=slug).first()
-                if existing_profile:
-                    # Generate a unique slug by adding a timestamp
-                    import time
-                    slug = f"{slug}-{int(time.time())}"
-                
-                # Create new CV profile
-                new_profile = CVProfile(
-                    slug=slug,
-                    name=name,
-                    job=job,
-                    company=company,
-                    summary=rewritten,
-                    skills=skills,
-                    video=processed_video,
-                    created_by=os.environ.get("REPL_OWNER", "unknown")
-                )
+        with app.app_context():
+            logsetup.bind(job_id=job.id)
+            logger.info("Starting CV generation for %s at %s", job_title, company)
+            logger.debug("Generation input: %s chars of summary, %s chars of skills",
+                         len(form['summary']), len(form['skills']))
+            
+            messages = generation_messages(job_title, company, form['summary'])
+            
+            # Identical requests reuse the cached completion unless the user asked for a fresh one
+            if form.get('bypass_cache'):
+                completion_cache.record_bypass()
+                cached = None
+            else:
+                cached = completion_cache.get(form['model'], messages)
+            
+            job.set_stage('generating')
+            if form.get('stream'):
+                rewritten = stream_summary(job, form['model'], messages, cached)
+            else:
+                if cached is not None:
+                    logger.debug("Using cached completion")
+                    ai_content = cached
+                else:
+                    logger.debug("Calling OpenAI API")
+                    response = client.chat.completions.create(
+                        model=form['model'],
+                        messages=messages
+                    )
+                    
+                    ai_content = response.choices[0].message.content.strip()
+                    # A fallback or hedge answer is cached under the model that wrote it
+                    completion_cache.set(answered_by(response, form['model']), messages, ai_content)
                 
-                # Add to database and commit
-                db.session.add(new_profile)
-                db.session.commit()
-                logging.info(f"Created CV profile in database with slug: {slug}")
-        else:
-            # Fallback to Replit DB if database URL not configured
-            from replit import db as replit_db
-            replit_db[slug] = {
-                "name": name,
-                "job": job,
-                "company": company,
-                "summary": rewritten,
-                "skills": skills,
-                "video": processed_video,
-                "created_at": os.environ.get("REPL_OWNER", "unknown")  # Store creator info
-            }
-            logging.info(f"Created CV profile in Replit DB with slug: {slug}")
-        
-        # Redirect to the appropriate funnel based on style selection
-        if funnel_style == 'chat':
-            return redirect(url_for('chat_funnel', slug=slug))
-        else:
-            return redirect(url_for('funnel', slug=slug))
+                # Apply humanizer to make content sound more natural if it seems AI-generated
+                job.set_stage('humanizing')
+                rewritten = humanize_text(ai_content)
+            
+            job.check_cancelled()
+            job.set_stage('saving')
+            slug = save_profile(name, job_title, company, rewritten, form['skills'], form['video'])
+            
+            return {'slug': slug, 'funnel_style': form['funnel_style']}
     
+    except JobCancelled:
+        raise
     except Exception as e:
-        logging.error(f"Error generating CV: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        import traceback
-        logging.error(f"Traceback: {traceback.format_exc()}")
-        
-        error_message = "There was an error processing your request. Please try again."
-        if "OpenAI" in str(e):
-            error_message = "Error connecting to AI service. Please try again in a moment."
-        
-        return render_template('index.html', 
-                             error=error_message,
-                             name=name,
-                             job=job,
-                             company=company,
-                             summary=summary,
-                             skills=skills,
-                             video=video)
-
-@app.route('/chat-funnel/<slug>')
+        raise generation_failure(e) from e
+
+def generation_messages(job_title, company, summary):
+    """Chat messages asking the model for a CV summary tailored to the role"""
+    return [
+        {"role": "system", "content": f"Create a professional and tailored CV summary for a {job_title} role at {company}. The summary should be concise, well-formatted with paragraphs, and highlight the most relevant qualifications and experiences for this specific position. Focus on what would make the candidate stand out to HR professionals."},
+        {"role": "user", "content": summary}
+    ]
+
+def generation_failure(e):
+    """Log a failed generation and return the user-facing error to raise"""
+    logger.exception("Error generating CV: %s: %s", type(e).__name__, e)
+    error_message = "There was an error processing your request. Please try again."
+    if "OpenAI" in str(e) or "openai" in type(e).__module__ or isinstance(e, (ModelTimeout, ModelUnavailable)):
+        error_message = "Error connecting to AI service. Please try again in a moment."
+    return RuntimeError(error_message)
+
+class SummaryStream:
+    """Publishes completion deltas and humanized paragraphs for a job as they arrive"""
+
+    def __init__(self, job):
+        self.job = job
+        self.raw = []
+        self.paragraphs = []
+        self.buffer = ''
+
+    def feed(self, delta):
+        self.job.check_cancelled()
+        if not delta:
+            return
+        self.job.publish('delta', {'text': delta})
+        self.raw.append(delta)
+        self.buffer += delta
+        while '\n\n' in self.buffer:
+            paragraph, self.buffer = self.buffer.split('\n\n', 1)
+            self._finish_paragraph(paragraph)
+
+    def finish(self):
+        """Flush the last paragraph and return the humanized summary"""
+        self._finish_paragraph(self.buffer)
+        self.buffer = ''
+        return '\n\n'.join(self.paragraphs)
+
+    @property
+    def text(self):
+        return ''.join(self.raw).strip()
+
+    def _finish_paragraph(self, text):
+        # humanize_text works paragraph by paragraph, so applying it to each
+        # completed paragraph matches running it over the whole summary
+        humanized = humanize_text(text.strip())
+        if humanized:
+            self.paragraphs.append(humanized)
+            self.job.publish('paragraph', {'text': humanized})
+
+def stream_summary(job, model, messages, cached=None):
+    """Stream a completion, publishing raw deltas and humanized paragraphs as they arrive"""
+    if cached is not None:
+        logger.debug("Using cached completion")
+        stream = None
+        deltas = [cached]
+    else:
+        logger.debug("Calling OpenAI API")
+        stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+        deltas = (chunk.choices[0].delta.content for chunk in stream if chunk.choices)
+    
+    summary = SummaryStream(job)
+    try:
+        for delta in deltas:
+            summary.feed(delta)
+    finally:
+        # Stop the upstream request early when the job is cancelled
+        if hasattr(stream, 'close'):
+            stream.close()
+    
+    rewritten = summary.finish()
+    if stream is not None:
+        completion_cache.set(answered_by(stream, model), messages, summary.text)
+    return rewritten
+
+def save_profile(name, job, company, rewritten, skills, video):
+    """Persist a generated CV profile and return its slug"""
+    # Create a unique URL slug from input data
+    slug = create_slug(name, job, company)
+    
+    # Get the processed video URL
+    processed_video = process_video_url(video)
+    
+    # Insert directly and let the store's unique check pick a free slug
+    slug = profile_store.allocate(slug, {
+        "name": name,
+        "job": job,
+        "company": company,
+        "summary": rewritten,
+        "skills": skills,
+        "video": processed_video,
+        "created_by": os.environ.get("REPL_OWNER", "unknown")
+    })
+    page_cache.invalidate(slug)
+    logger.info("Created CV profile with slug: %s", slug)
+    
+    # Warm the PDF cache so the first download is a file read
+    pdf_cache.prerender({
+        "name": name,
+        "job": job,
+        "company": company,
+        "summary": rewritten,
+        "skills": skills,
+        "video": processed_video
+    })
+    
+    return slug
+
+@views.route('/generate/stats')
+def generation_stats():
+    """Report generation worker pool usage, completion cache hit rate and per-model routing stats"""
+    if not metrics_authorized():
+        return jsonify(METRICS_FORBIDDEN), 403
+    data = generation_jobs.stats()
+    data['completion_cache'] = completion_cache.stats()
+    if hasattr(client, 'stats'):
+        data['models'] = client.stats()
+    return jsonify({'status': 'success', 'data': data})
+
+@views.route('/chat-funnel/<slug>')
 def chat_funnel(slug):
     """Display the chat-style CV funnel"""
     try:
-        if database_url:
-            # Get profile from PostgreSQL database
-            with app.app_context():
-                cv_profile = CVProfile.get_by_slug(slug)
-                if not cv_profile:
-                    logging.error(f"CV not found for slug: {slug}")
-                    return "CV not found", 404
-                
-                data = {
-                    'name': cv_profile.name,
-                    'job': cv_profile.job,
-                    'company': cv_profile.company,
-                    'summary': cv_profile.summary,
-                    'skills': cv_profile.skills,
-                    'video': cv_profile.video
-                }
-        else:
-            # Fallback to Replit DB
-            from replit import db as replit_db
-            data = replit_db.get(slug, None)
-            if not data:
-                logging.error(f"CV not found for slug: {slug}")
-                return "CV not found", 404
+        data = profile_store.get(slug)
+        if not data:
+            logger.error("CV not found for slug: %s", slug)
+            return "CV not found", 404
         
-        return render_template('chat-funnel.html', data=data, slug=slug)
+        return render_cv_page('chat-funnel.html', slug, data)
         
     except Exception as e:
-        logging.error(f"Error displaying chat funnel: {str(e)}")
+        logger.error("Error displaying chat funnel: %s", e)
         return "Error loading CV", 500
 
-@app.route('/cv/<slug>')
+@views.route('/cv/<slug>')
 def funnel(slug):
     """Display the generated CV page"""
-    if database_url:
-        # Get profile from PostgreSQL database
-        with app.app_context():
-            cv_profile = CVProfile.query.filter_by(slug=slug).first()
-            if not cv_profile:
-                logging.error(f"CV not found for slug: {slug}")
-                return render_template('index.html', error="CV not found. Please create a new one."), 404
-            
-            # Convert to dictionary for template compatibility
-            data = {
-                "name": cv_profile.name,
-                "job": cv_profile.job,
-                "company": cv_profile.company,
-                "summary": cv_profile.summary,
-                "skills": cv_profile.skills if cv_profile.skills else "",
-                "video": cv_profile.video,
-                "created_at": cv_profile.created_at.strftime("%Y-%m-%d %H:%M:%S") if cv_profile.created_at else "Unknown"
-            }
-    else:
-        # Fallback to Replit DB
-        from replit import db as replit_db
-        data = replit_db.get(slug, None)
-        if not data:
-            logging.error(f"CV not found for slug: {slug}")
-            return render_template('index.html', error="CV not found. Please create a new one."), 404
+    data = profile_store.get(slug)
+    if not data:
+        logger.error("CV not found for slug: %s", slug)
+        return render_template('index.html', error="CV not found. Please create a new one."), 404
     
-    return render_template('funnel.html', data=data, slug=slug)
+    return render_cv_page('funnel.html', slug, data)
 
-@app.route('/cv/<slug>/download')
+@views.route('/cv/<slug>/download')
 def download_cv(slug):
     """Download the CV as a PDF file"""
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.units import inch
-        
-        if database_url:
-            with app.app_context():
-                cv_profile = CVProfile.query.filter_by(slug=slug).first()
-                if not cv_profile:
-                    logging.error(f"CV not found for slug: {slug}")
-                    return "CV not found", 404
-                
-                name = cv_profile.name
-                job = cv_profile.job
-                company = cv_profile.company
-                summary = cv_profile.summary
-                skills = cv_profile.skills
-                video = cv_profile.video
-        else:
-            from replit import db as replit_db
-            data = replit_db.get(slug, None)
-            if not data:
-                logging.error(f"CV not found for slug: {slug}")
-                return "CV not found", 404
-            
-            name = data["name"]
-            job = data["job"]
-            company = data["company"]
-            summary = data["summary"]
-            skills = data["skills"]
-            video = data.get("video", "")
-
-        # Create PDF buffer
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Title'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=16
-        )
-
-        # Add content
-        story.append(Paragraph(name, title_style))
-        story.append(Paragraph(f"{job} at {company}", styles['Heading2']))
-        story.append(Spacer(1, 20))
-        
-        story.append(Paragraph("Professional Summary", heading_style))
-        story.append(Paragraph(summary, styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        story.append(Paragraph("Skills & Expertise", heading_style))
-        story.append(Paragraph(skills, styles['Normal']))
-        
-        if video:
-            story.append(Spacer(1, 20))
-            story.append(Paragraph("Video Introduction", heading_style))
-            story.append(Paragraph(f"View my introduction: {video}", styles['Normal']))
-
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        # Create the response
-        filename = f"{name.replace(' ', '_')}_CV.pdf"
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/pdf'
-        )
-
-        # SECTION 2: PROFESSIONAL SUMMARY (50% approx)
-        summary_section = f"""
-----------------------------------------------
-PROFESSIONAL SUMMARY (KEY HIGHLIGHTS)
-----------------------------------------------
-{summary}
-"""
-        
-        # SECTION 3: SKILLS & ADDITIONAL INFO (30% approx)
-        skills_section = f"""
-----------------------------------------------
-KEY SKILLS & EXPERTISE
-----------------------------------------------
-{skills}
-"""
-
-        # Combine all sections
-        cv_content = header_section + summary_section + skills_section
+        data = profile_store.get(slug)
+        if not data:
+            logger.error("CV not found for slug: %s", slug)
+            return "CV not found", 404
         
-        # Add video link if available (as part of the 30% section)
-        if video:
-            cv_content += f"""
-----------------------------------------------
-VIDEO INTRODUCTION
-----------------------------------------------
-View my introduction video: {video}
-"""
-        # Create an in-memory file-like object
-        buffer = io.BytesIO()
-        buffer.write(cv_content.encode('utf-8'))
-        buffer.seek(0)
+        # Rendered PDFs are cached on disk by content hash
+        path = pdf_cache.get_or_render(data)
         
-        # Create the response
-        filename = f"{name.replace(' ', '_')}_CV.txt"
+        filename = f"{data['name'].replace(' ', '_')}_CV.pdf"
         return send_file(
-            buffer,
+            path,
             as_attachment=True,
             download_name=filename,
-            mimetype='text/plain'
+            mimetype='application/pdf',
+            conditional=True,
+            etag=os.path.splitext(os.path.basename(path))[0]
         )
     except Exception as e:
-        logging.error(f"Error generating CV download: {str(e)}")
+        logger.error("Error generating CV download: %s", e)
         return "Error generating CV download", 500
 
+BULK_EXPORT_MAX_CVS = int(os.environ.get("BULK_EXPORT_MAX_CVS", 200))
+
+@views.route('/cv-export')
+def bulk_cv_export():
+    """Download several CVs as one ZIP of PDFs.
+
+    Select CVs with ``?slugs=a,b,c`` and/or ``?created_by=`` (needs the
+    database and, like /dashboard, ``Authorization: Bearer <EXPORT_TOKEN>``).
+    PDFs not already cached are rendered on PDF_RENDER_PROCESSES processes
+    and streamed into the archive as each one finishes.
+    """
+    created_by = request.args.get('created_by') or None
+    slugs = list(dict.fromkeys(s for s in request.args.get('slugs', '').split(',') if s))
+    if created_by is None and not slugs:
+        return jsonify({'status': 'error', 'message': 'Pass created_by or slugs'}), 400
+    if created_by is not None and not export_authorized():
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+    if len(slugs) > BULK_EXPORT_MAX_CVS:
+        return jsonify({'status': 'error', 'message': f'At most {BULK_EXPORT_MAX_CVS} CVs per export'}), 400
+
+    try:
+        if created_by is not None:
+            if not database_url:
+                return jsonify({'status': 'error', 'message': 'Exporting by owner needs the database'}), 503
+            query = db.select(CVProfile.slug).filter_by(created_by=created_by)
+            if slugs:
+                query = query.where(CVProfile.slug.in_(slugs))
+            slugs = db.session.execute(query.order_by(CVProfile.created_at).limit(BULK_EXPORT_MAX_CVS + 1)).scalars().all()
+            if len(slugs) > BULK_EXPORT_MAX_CVS:
+                return jsonify({'status': 'error', 'message': f'At most {BULK_EXPORT_MAX_CVS} CVs per export; pass slugs to pick some'}), 400
+        profiles = profile_store.get_many(slugs)
+    except Exception as e:
+        logger.error("Error loading CVs for export: %s", e)
+        return jsonify({'status': 'error', 'message': 'Failed to load CVs'}), 500
+    if not profiles:
+        return jsonify({'status': 'error', 'message': 'No CVs found'}), 404
+
+    def entries():
+        failed = []
+        for slug, content in pdf_cache.render_many(profiles):
+            if content is None:
+                failed.append(slug)
+            else:
+                yield f"{slug}.pdf", content
+        if failed:
+            yield 'errors.txt', ("Could not render:\n" + "\n".join(failed) + "\n").encode('utf-8')
+
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', created_by) if created_by else 'funnelcv'
+    response = Response(stream_with_context(zip_chunks(entries())), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}-cvs.zip"'
+    return response
+
+PAGE_MAX_AGE = int(os.environ.get("PAGE_MAX_AGE", 300))
+PAGE_SHARED_MAX_AGE = int(os.environ.get("PAGE_SHARED_MAX_AGE", 3600))
+
+def render_cv_page(template, slug, data):
+    """Render a funnel page once per slug/template and answer conditional GETs"""
+    variants = page_cache.get(slug)
+    if variants is None:
+        variants = {}
+        page_cache.set(slug, variants)
+    
+    # Pages carry no host-specific URLs (the share link is filled in
+    # client-side), so a spoofed Host header cannot add variants
+    cached = variants.get(template)
+    if cached is None:
+        html = render_template(template, data=data, slug=slug)
+        etag = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        cached = variants[template] = (html, etag)
+    html, etag = cached
+    
+    response = make_response(html)
+    response.set_etag(etag)
+    if data.get("last_modified"):
+        response.last_modified = data["last_modified"]
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_MAX_AGE
+    response.cache_control.s_maxage = PAGE_SHARED_MAX_AGE
+    return response.make_conditional(request)
+
 def create_slug(name, job, company):
     """Create a URL-friendly slug from user inputs"""
     # Convert to lowercase and replace spaces with hyphens
@@ -358,58 +550,6 @@ def create_slug(name, job, company):
     slug = re.sub(r'-+', '-', slug)
     return slug
 
-def humanize_text(text):
-    """Make AI-generated text sound more natural and human-written"""
-    if not text:
-        return text
-    
-    try:
-        # Split into paragraphs
-        paragraphs = text.split('\n\n')
-        humanized_paragraphs = []
-        
-        for paragraph in paragraphs:
-            if not paragraph.strip():
-                continue
-                
-            # Vary sentence structure in paragraphs
-            sentences = re.split(r'(?<=[.!?])\s+', paragraph)
-            for i in range(len(sentences)):
-                # Skip short sentences and bullet points
-                if len(sentences[i]) < 15 or sentences[i].strip().startswith('•'):
-                    continue
-                    
-                # Randomly convert some sentences to active voice
-                if random.random() < 0.3:
-                    # Replace passive constructions with active ones
-                    sentences[i] = re.sub(r'is being ([a-z]+ed)', r'actively \1s', sentences[i])
-                    sentences[i] = re.sub(r'are being ([a-z]+ed)', r'actively \1', sentences[i])
-                
-                # Occasionally vary sentence structures
-                if random.random() < 0.2 and ',' in sentences[i]:
-                    parts = sentences[i].split(',', 1)
-                    sentences[i] = f"{parts[1].strip()}, {parts[0].strip()[0].lower()}{parts[0].strip()[1:]}"
-            
-            # Replace overly formal or AI-like phrases
-            modified_para = ' '.join(sentences)
-            modified_para = modified_para.replace("utilize", "use")
-            modified_para = modified_para.replace("furthermore", "also")
-            modified_para = modified_para.replace("in addition", "plus")
-            modified_para = modified_para.replace("subsequently", "then")
-            modified_para = modified_para.replace("demonstrates", "shows")
-            
-            # Strengthen verbs instead of using adverbs
-            modified_para = re.sub(r'effectively ([a-z]+)', r'excel at \1ing', modified_para)
-            modified_para = re.sub(r'efficiently ([a-z]+)', r'streamline \1ing', modified_para)
-            
-            humanized_paragraphs.append(modified_para)
-        
-        # Join paragraphs back together
-        return '\n\n'.join(humanized_paragraphs)
-    except Exception as e:
-        logging.error(f"Error in humanizing text: {str(e)}")
-        return text  # Return original text if humanizing fails
-
 def process_video_url(url):
     """Process video URLs to ensure proper embedding"""
     if not url:
@@ -437,7 +577,7 @@ def process_video_url(url):
     # Return the original URL if it doesn't match known patterns
     return url
 
-@app.route('/feedback/<slug>', methods=['POST'])
+@views.route('/feedback/<slug>', methods=['POST'])
 def submit_feedback(slug):
     """Handle HR feedback submission for a CV"""
     try:
@@ -448,131 +588,433 @@ def submit_feedback(slug):
             cv_slug=slug,
             feedback_type=data.get('feedback_type'),
             message=data.get('message'),
-            detailed_ratings=json.dumps(data.get('detailed_ratings')) if data.get('detailed_ratings') else None,
-            improvement_tips=json.dumps(data.get('improvement_tips')) if data.get('improvement_tips') else None,
+            detailed_ratings=data.get('detailed_ratings') or None,
+            improvement_tips=data.get('improvement_tips') or None,
             time_spent=data.get('time_spent'),
-            section_times=json.dumps(data.get('section_times')) if data.get('section_times') else None,
+            section_times=data.get('section_times') or None,
             hr_ip=request.remote_addr
         )
         
         db.session.add(feedback)
+        apply_feedback(
+            slug,
+            feedback.feedback_type,
+            time_spent=feedback.time_spent,
+            ratings=data.get('detailed_ratings'),
+            tips=data.get('improvement_tips')
+        )
         db.session.commit()
+        engagement_cache.invalidate((slug,))
         
-        logging.info(f"Feedback submitted for CV {slug}: {data.get('feedback_type')}")
+        logger.info("Feedback submitted for CV %s: %s", slug, data.get('feedback_type'))
         
         return jsonify({'status': 'success', 'message': 'Feedback submitted successfully'})
         
     except Exception as e:
-        logging.error(f"Error submitting feedback: {str(e)}")
+        db.session.rollback()
+        logger.error("Error submitting feedback: %s", e)
         return jsonify({'status': 'error', 'message': 'Failed to submit feedback'}), 500
 
-@app.route('/analytics/<slug>', methods=['POST'])
+@views.route('/analytics/<slug>', methods=['POST'])
 def track_analytics(slug):
     """Track analytics events for a CV"""
+    if not database_url:
+        return jsonify({'status': 'error', 'message': 'Database not configured'}), 503
     try:
         data = request.get_json()
-        
-        # Create analytics record
-        analytics = CVAnalytics(
+        if not data or not data.get('event'):
+            return jsonify({'status': 'error', 'message': 'Missing event type'}), 400
+
+        # Queue the event; the ingest worker writes it in the next batch
+        accepted = analytics_ingest.submit(
             cv_slug=slug,
             event_type=data.get('event'),
-            event_data=json.dumps(data.get('data')) if data.get('data') else None,
+            event_data=data.get('data') or None,
             visitor_ip=request.remote_addr,
             user_agent=request.headers.get('User-Agent', '')[:500]  # Limit length
         )
         
-        db.session.add(analytics)
-        db.session.commit()
+        if not accepted:
+            response = jsonify({'status': 'error', 'message': 'Analytics backlog full'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
         
-        return jsonify({'status': 'success'})
+        return jsonify({'status': 'accepted'}), 202
         
     except Exception as e:
-        logging.error(f"Error tracking analytics: {str(e)}")
+        logger.error("Error tracking analytics: %s", e)
         return jsonify({'status': 'error'}), 500
 
-@app.route('/feedback-summary/<slug>')
+@views.route('/profile-cache/stats')
+def profile_cache_stats():
+    """Report CV profile cache size and hit/miss counters"""
+    if not metrics_authorized():
+        return jsonify(METRICS_FORBIDDEN), 403
+    return jsonify({'status': 'success', 'data': profile_cache.stats()})
+
+@views.route('/pdf-cache/stats')
+def pdf_cache_stats():
+    """Report on-disk PDF cache size and render counters"""
+    if not metrics_authorized():
+        return jsonify(METRICS_FORBIDDEN), 403
+    return jsonify({'status': 'success', 'data': pdf_cache.stats()})
+
+@views.route('/db/stats')
+def db_stats():
+    """Report connection pool usage, checkout wait and query latency for this worker"""
+    if not metrics_authorized():
+        return jsonify(METRICS_FORBIDDEN), 403
+    if not database_url:
+        return jsonify({'status': 'error', 'message': 'Database not configured'}), 503
+    return jsonify({'status': 'success', 'data': db_metrics.stats()})
+
+@views.route('/metrics')
+def metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    if not metrics_authorized():
+        return jsonify(METRICS_FORBIDDEN), 403
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+MAX_BATCH_EVENTS = 100
+
+@views.route('/analytics/<slug>/batch', methods=['POST'])
+def track_analytics_batch(slug):
+    """Track several analytics events for a CV in one request.
+
+    Accepts either a JSON array of events or ``{"events": [...]}``. The body
+    is parsed regardless of Content-Type so ``navigator.sendBeacon`` payloads
+    (sent as text/plain) work too. Valid events are queued together for the
+    ingest worker, or not at all when the backlog has no room for them.
+    """
+    if not database_url:
+        return jsonify({'status': 'error', 'message': 'Database not configured'}), 503
+    try:
+        payload = json.loads(request.get_data(as_text=True) or 'null')
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid JSON'}), 400
+
+    events = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(events, list) or not events:
+        return jsonify({'status': 'error', 'message': 'Expected a list of events'}), 400
+    if len(events) > MAX_BATCH_EVENTS:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_BATCH_EVENTS} events per batch'}), 413
+
+    visitor_ip = request.remote_addr
+    user_agent = request.headers.get('User-Agent', '')[:500]
+    rows = []
+    rejected = 0
+    for event in events:
+        event_type = event.get('event') if isinstance(event, dict) else None
+        if not isinstance(event_type, str) or not event_type or len(event_type) > 50:
+            rejected += 1
+            continue
+        event_data = event.get('data')
+        rows.append(analytics_row(
+            cv_slug=slug,
+            event_type=event_type,
+            event_data=event_data or None,
+            visitor_ip=visitor_ip,
+            user_agent=user_agent
+        ))
+
+    if rows and not analytics_ingest.submit_many(rows):
+        response = jsonify({'status': 'error', 'message': 'Analytics backlog full'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    return jsonify({'status': 'accepted', 'accepted': len(rows), 'rejected': rejected}), 202
+
+@views.route('/analytics-ingest/stats')
+def analytics_ingest_stats():
+    """Report analytics ingest queue depth and backpressure counters"""
+    if not metrics_authorized():
+        return jsonify(METRICS_FORBIDDEN), 403
+    return jsonify({'status': 'success', 'data': analytics_ingest.stats()})
+
+@views.route('/feedback-summary/<slug>')
 def feedback_summary(slug):
-    """Get feedback summary for a CV (for applicant to view)"""
+    """Get feedback summary for a CV (for applicant to view).
+
+    ``?exact=1`` replaces the estimated visitor count with an exact one
+    counted in SQL over the raw events still inside the retention window.
+    """
     try:
-        # Get all feedback for this CV
-        feedbacks = CVFeedback.query.filter_by(cv_slug=slug).all()
-        analytics = CVAnalytics.query.filter_by(cv_slug=slug).all()
+        # Aggregates are maintained on ingest, so this is a single-row lookup
+        rollup = CVRollup.query.filter_by(cv_slug=slug).first()
         
-        if not feedbacks and not analytics:
+        if not rollup or not (rollup.total_feedback or rollup.event_count):
             return jsonify({
                 'status': 'no_data',
                 'message': 'No feedback or analytics data available yet'
             })
         
-        # Aggregate feedback data
-        feedback_summary = {
-            'total_views': len(set([a.visitor_ip for a in analytics if a.event_type == 'page_view'])),
-            'total_feedback': len(feedbacks),
-            'feedback_breakdown': {},
-            'average_time_spent': 0,
-            'improvement_suggestions': [],
-            'ratings': {
-                'skills': [],
-                'experience': [],
-                'presentation': [],
-                'fit': []
-            }
-        }
-        
-        # Process feedback
-        total_time = 0
-        for feedback in feedbacks:
-            # Count feedback types
-            if feedback.feedback_type in feedback_summary['feedback_breakdown']:
-                feedback_summary['feedback_breakdown'][feedback.feedback_type] += 1
-            else:
-                feedback_summary['feedback_breakdown'][feedback.feedback_type] = 1
-            
-            # Add time spent
-            if feedback.time_spent:
-                total_time += feedback.time_spent
-            
-            # Add improvement tips
-            if feedback.improvement_tips:
-                try:
-                    tips = json.loads(feedback.improvement_tips)
-                    feedback_summary['improvement_suggestions'].extend(tips)
-                except:
-                    pass
-            
-            # Add detailed ratings
-            if feedback.detailed_ratings:
-                try:
-                    ratings = json.loads(feedback.detailed_ratings)
-                    for section, rating in ratings.items():
-                        if section in feedback_summary['ratings']:
-                            feedback_summary['ratings'][section].append(rating)
-                except:
-                    pass
-        
-        # Calculate averages
-        if feedbacks:
-            feedback_summary['average_time_spent'] = total_time / len(feedbacks)
-        
-        # Calculate average ratings
-        for section in feedback_summary['ratings']:
-            ratings = feedback_summary['ratings'][section]
-            if ratings:
-                feedback_summary['ratings'][section] = {
-                    'average': sum(ratings) / len(ratings),
-                    'count': len(ratings)
-                }
-            else:
-                feedback_summary['ratings'][section] = {'average': 0, 'count': 0}
+        summary = summarize(rollup)
+        if request.args.get('exact') == '1':
+            summary['total_views'] = unique_visitors(slug, since=retention_cutoff())
         
         return jsonify({
             'status': 'success',
-            'data': feedback_summary
+            'data': summary
         })
         
     except Exception as e:
-        logging.error(f"Error getting feedback summary: {str(e)}")
+        logger.error("Error getting feedback summary: %s", e)
         return jsonify({'status': 'error', 'message': 'Failed to get feedback summary'}), 500
 
+@views.route('/dashboard')
+def cv_dashboard():
+    """Feedback summaries for many CVs at once.
+
+    Select CVs with ``?slugs=a,b,c`` and/or ``?created_by=``; page with
+    ``page``/``per_page`` and order with ``sort`` (events, feedback, time or
+    created) and ``order`` (asc or desc). Owners are not secret (often the
+    deployer's REPL_OWNER), so ``created_by`` needs ``Authorization: Bearer
+    <EXPORT_TOKEN>``; a slug alone is as private as the CV link itself.
+    """
+    created_by = request.args.get('created_by') or None
+    slugs = [s for s in request.args.get('slugs', '').split(',') if s] or None
+    if created_by is None and slugs is None:
+        return jsonify({'status': 'error', 'message': 'Pass created_by or slugs'}), 400
+    if created_by is not None and not export_authorized():
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+
+    sort = request.args.get('sort', 'events')
+    order = request.args.get('order', 'desc')
+    if sort not in DASHBOARD_SORTS or order not in ('asc', 'desc'):
+        return jsonify({'status': 'error', 'message': f"sort must be one of {', '.join(DASHBOARD_SORTS)} and order asc or desc"}), 400
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), MAX_PER_PAGE)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'page and per_page must be integers'}), 400
+
+    try:
+        data = dashboard_page(created_by=created_by, slugs=slugs, sort=sort,
+                              descending=order == 'desc', page=page, per_page=per_page)
+    except Exception as e:
+        logger.error("Error building dashboard: %s", e)
+        return jsonify({'status': 'error', 'message': 'Failed to build dashboard'}), 500
+
+    return jsonify({'status': 'success', 'data': data})
+
+MAX_ENGAGEMENT_SLUGS = 100
+
+@views.route('/engagement/<slug>')
+@views.route('/engagement', defaults={'slug': None})
+def section_engagement(slug):
+    """Section dwell percentiles, histograms, drop-off funnel and rating correlations.
+
+    Covers one CV, or a cohort given as ``?slugs=a,b,c``. Results are cached
+    per slug set for ENGAGEMENT_CACHE_TTL seconds.
+    """
+    slugs = [slug] if slug else [s for s in request.args.get('slugs', '').split(',') if s]
+    if not slugs:
+        return jsonify({'status': 'error', 'message': 'Pass a slug or ?slugs='}), 400
+    if len(slugs) > MAX_ENGAGEMENT_SLUGS:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_ENGAGEMENT_SLUGS} slugs'}), 400
+
+    key = tuple(sorted(set(slugs)))
+    try:
+        cached = engagement_cache.get(key)
+        if cached is None:
+            data = load_engagement(key)
+            cached = compute_engagement(data) if len(data) else {}
+            engagement_cache.set(key, cached)
+    except ImportError:
+        return jsonify({'status': 'error', 'message': 'Engagement analytics need numpy installed'}), 501
+    except Exception as e:
+        logger.error("Error computing engagement: %s", e)
+        return jsonify({'status': 'error', 'message': 'Failed to compute engagement'}), 500
+
+    if not cached:
+        return jsonify({'status': 'no_data', 'message': 'No feedback data available yet'})
+    return jsonify({'status': 'success', 'data': cached})
+
+EXPORT_EXTENSIONS = {'csv': 'csv.gz', 'arrow': 'arrow', 'parquet': 'parquet'}
+
+@views.route('/export/<table>')
+def export_table(table):
+    """Stream analytics or feedback rows for offline analysis.
+
+    Needs ``Authorization: Bearer <EXPORT_TOKEN>``. ``?since=`` (the last
+    exported row id) exports incrementally; the ``X-Export-Watermark``
+    header is the ``since`` to use next time. ``?format=`` is csv (gzip, default) or
+    arrow (IPC stream, needs pyarrow).
+    """
+    if not export_authorized():
+        return jsonify({'status': 'error', 'message': 'Not authorized'}), 403
+    if table not in EXPORT_TABLES:
+        return jsonify({'status': 'error', 'message': f'Unknown table: {table}'}), 404
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'arrow'):
+        return jsonify({'status': 'error', 'message': 'format must be csv or arrow'}), 400
+    try:
+        since = parse_watermark(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'since must be a row id from X-Export-Watermark'}), 400
+
+    export = TableExport(table, since=since)
+    if fmt == 'arrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({'status': 'error', 'message': 'Arrow export needs pyarrow installed'}), 501
+        chunks = arrow_stream_chunks(export)
+        mimetype = 'application/vnd.apache.arrow.stream'
+    else:
+        chunks = csv_gzip_chunks(export)
+        mimetype = 'application/gzip'
+
+    filename = f"{table}-{export.until}.{EXPORT_EXTENSIONS[fmt]}"
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Export-Watermark'] = str(export.until)
+    return response
+
+@views.cli.command('backfill-rollups')
+def backfill_rollups_command():
+    """Rebuild feedback summary rollups from the raw feedback and analytics tables."""
+    count = rebuild_rollups()
+    click.echo(f"Rebuilt rollups for {count} CVs")
+
+@views.cli.command('compact-analytics')
+@click.option('--retention-days', type=int, default=None, help='Keep this many days of raw events (default ANALYTICS_RETENTION_DAYS).')
+@click.option('--dry-run', is_flag=True, help='Report what would be compacted without changing anything.')
+def compact_analytics_command(retention_days, dry_run):
+    """Roll raw analytics events past the retention window into daily aggregates."""
+    result = compact_analytics(retention_days=retention_days, dry_run=dry_run)
+    click.echo(f"{'Would compact' if dry_run else 'Compacted'} {result['compacted_rows']} events "
+               f"older than {result['cutoff']} into {result['aggregates']} daily rows")
+    for name in result['dropped_partitions']:
+        click.echo(f"  dropped partition {name}")
+
+@views.cli.command('export-data')
+@click.argument('table', type=click.Choice(sorted(EXPORT_TABLES)))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv', help='csv (gzip), arrow or parquet; the last two need pyarrow.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Output file (default <table>-<watermark>.<ext>).')
+@click.option('--since', default=None, help='Only rows after this watermark (the last exported row id).')
+@click.option('--watermark-file', type=click.Path(dir_okay=False), default=None, help='Read --since from this file and store the new watermark in it.')
+def export_data_command(table, fmt, output, since, watermark_file):
+    """Export analytics or feedback rows to a columnar or compressed CSV file."""
+    if since is None and watermark_file and os.path.exists(watermark_file):
+        with open(watermark_file) as f:
+            since = f.read().strip() or None
+    try:
+        since = parse_watermark(since) if since else None
+    except ValueError:
+        raise click.BadParameter('must be a row id watermark', param_hint='--since')
+
+    export = TableExport(table, since=since)
+    output = output or f"{table}-{export.until}.{EXPORT_EXTENSIONS[fmt]}"
+    try:
+        rows = write_export(export, fmt, output)
+    except ImportError:
+        raise click.ClickException(f"{fmt} export needs pyarrow installed")
+
+    if watermark_file:
+        with open(watermark_file, 'w') as f:
+            f.write(str(export.until))
+    click.echo(f"Exported {rows} {table} rows to {output} (watermark {export.until})")
+
+@views.cli.command('partition-analytics')
+def partition_analytics_command():
+    """Convert cv_analytics to monthly partitions (PostgreSQL only)."""
+    try:
+        copied = partition_analytics()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"cv_analytics is partitioned by month ({copied} rows copied)")
+
+@views.cli.command('migrate')
+def migrate_command():
+    """Create missing tables, upgrade the schema in place and add analytics partitions."""
+    if not database_url:
+        raise click.ClickException("DATABASE_URL is not set")
+    # Importing main for the CLI already built the app; don't migrate twice
+    if not current_app.extensions.get('schema_migrated'):
+        migrate_schema()
+    click.echo("Schema is up to date")
+
+def migrate_schema():
+    """Create tables, apply in-place upgrades and make sure analytics partitions exist"""
+    db.create_all()
+    upgrade_schema()
+    ensure_partitions()
+    logger.info("Database tables created successfully")
+
+# Schema management at startup; .replit sets AUTO_MIGRATE=0 and runs
+# `flask --app main migrate` as the deploy build step instead, so new
+# workers go straight to serving
+AUTO_MIGRATE = os.environ.get("AUTO_MIGRATE", "1").lower() not in ("0", "false", "no", "off")
+
+# Heavy modules to import on a background thread once the app is up
+PREWARM = [name.strip() for name in os.environ.get("PREWARM", "").split(",") if name.strip()]
+
+def prewarm(names):
+    """Load the named dependencies ahead of their first request"""
+    warmers = {
+        'openai': client.warm,
+        'reportlab': warm_pdf,
+        'numpy': lambda: __import__('numpy'),
+        'pyarrow': lambda: __import__('pyarrow'),
+    }
+    for name in names:
+        started = time.perf_counter()
+        try:
+            warmers[name]()
+        except KeyError:
+            logger.warning("Unknown PREWARM entry: %s", name)
+            continue
+        except ImportError as e:
+            logger.warning("Could not prewarm %s: %s", name, e)
+            continue
+        logger.info("Prewarmed %s in %.0f ms", name, (time.perf_counter() - started) * 1000)
+
+def create_app(auto_migrate=None):
+    """Build the Flask app.
+
+    Only touches the database when auto_migrate (default AUTO_MIGRATE) is
+    set; the OpenAI client and other heavy dependencies load on first use
+    or in the background when listed in PREWARM.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "funnelcv-secret-key")
+
+    # Tag every log record with the request id, including the jobs a request starts
+    logsetup.init_app(app)
+
+    # Per-route latency and DB time for /metrics, plus opt-in request profiling
+    profiling.init_app(app)
+
+    if database_url:
+        logger.info("Using database: %s...(redacted)", database_url[:10])
+        app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+        # Pool sizing, pre-ping and statement timeout come from DB_* env vars
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
+        db.init_app(app)
+
+        with app.app_context():
+            db_metrics.instrument(db.engine)
+            if AUTO_MIGRATE if auto_migrate is None else auto_migrate:
+                migrate_schema()
+                app.extensions['schema_migrated'] = True
+
+        # Batch analytics events into bulk inserts off the request path
+        analytics_ingest.init_app(app)
+
+        # Record generation jobs so every worker can report on them
+        generation_jobs.init_app(app)
+    else:
+        logger.warning("DATABASE_URL not found. Database features disabled.")
+
+    app.register_blueprint(views)
+
+    if PREWARM:
+        threading.Thread(target=prewarm, args=(PREWARM,), name='prewarm', daemon=True).start()
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
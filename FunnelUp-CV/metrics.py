@@ -0,0 +1,193 @@
+import bisect
+import threading
+
+# Upper bounds in milliseconds; anything slower lands in the +Inf bucket
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram of latencies in milliseconds."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def _quantile(self, counts, total, q):
+        # Upper bound of the bucket holding the q-th observation
+        target = q * total
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def state(self):
+        """(per-bucket counts including +Inf, sum) read under the lock."""
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def snapshot(self):
+        """Counts per bucket (cumulative, Prometheus style) plus rough percentiles."""
+        counts, total_ms = self.state()
+        total = sum(counts)
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        snapshot = {
+            'count': total,
+            'sum_ms': round(total_ms, 3),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], cumulative)),
+        }
+        if total:
+            for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                bound = self._quantile(counts, total, q)
+                snapshot[f'{name}_ms_le'] = None if bound == float('inf') else bound
+        return snapshot
+
+
+class Counter:
+    """Thread-safe monotonically increasing number."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Family:
+    """A named metric with one child Counter or Histogram per label set."""
+
+    def __init__(self, kind, name, documentation, labelnames=(), factory=None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def inc(self, *values, amount=1):
+        self.labels(*values).inc(amount)
+
+    def observe(self, value, *values):
+        self.labels(*values).observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            labels = _labels(zip(self.labelnames, values))
+            if self.kind == 'counter':
+                lines.append(f'{self.name}{_format_labels(labels)} {_number(child.value)}')
+            else:
+                lines.extend(histogram_lines(self.name, child, labels))
+        return lines
+
+
+def _labels(pairs):
+    return [(name, str(value)) for name, value in pairs]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def histogram_lines(name, histogram, labels=()):
+    """Prometheus exposition lines for a millisecond Histogram, in seconds."""
+    labels = list(labels)
+    counts, total_ms = histogram.state()
+    lines = []
+    running = 0
+    for bound, count in zip(histogram.buckets + (None,), counts):
+        running += count
+        le = '+Inf' if bound is None else _number(bound / 1000)
+        lines.append(f'{name}_bucket{_format_labels(labels + [("le", le)])} {running}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {_number(total_ms / 1000)}')
+    lines.append(f'{name}_count{_format_labels(labels)} {running}')
+    return lines
+
+
+class Registry:
+    """Metric families plus collector callbacks, rendered in Prometheus text format.
+
+    Histograms are recorded in milliseconds and exposed in seconds, so names
+    registered through ``histogram`` should end in ``_seconds``.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Family('counter', name, documentation, labelnames, Counter))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS_MS):
+        return self._add(Family('histogram', name, documentation, labelnames, lambda: Histogram(buckets)))
+
+    def collector(self, fn):
+        """Register a callable returning extra exposition lines at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def _add(self, family):
+        if family.name in self._families:
+            raise ValueError(f"Metric {family.name} already registered")
+        self._families[family.name] = family
+        return family
+
+    def render(self):
+        lines = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'funnelcv_http_request_duration_seconds', 'Request latency by route.', ('route', 'method', 'status'))
+http_request_db_duration = registry.histogram(
+    'funnelcv_http_request_db_seconds', 'Time spent in database queries per request, by route.', ('route',))
+openai_requests = registry.counter(
+    'funnelcv_openai_requests_total', 'OpenAI chat completion calls.', ('model', 'outcome'))
+openai_tokens = registry.counter(
+    'funnelcv_openai_tokens_total', 'OpenAI tokens used, as reported by the API.', ('model', 'kind'))
+openai_duration = registry.histogram(
+    'funnelcv_openai_request_duration_seconds', 'OpenAI call latency until the last token.', ('model', 'stream'))
+pdf_render_duration = registry.histogram(
+    'funnelcv_pdf_render_duration_seconds', 'PDF render time on cache misses.')
+model_router_events = registry.counter(
+    'funnelcv_model_router_events_total', 'Model router retries, hedges, fallbacks, timeouts and circuit trips.',
+    ('model', 'event'))
@@ -0,0 +1,65 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from models import db, CVFeedback, CVAnalytics
+
+logger = logging.getLogger(__name__)
+
+# Columns that used to hold JSON strings in TEXT
+JSON_COLUMNS = {
+    'cv_analytics': ('event_data',),
+    'cv_feedback': ('detailed_ratings', 'improvement_tips', 'section_times'),
+    'cv_rollups': ('feedback_breakdown', 'rating_totals', 'improvement_tips'),
+}
+
+# Single-column indexes made redundant by the composite (cv_slug, ...) ones
+REDUNDANT_INDEXES = {
+    'cv_analytics': 'ix_cv_analytics_cv_slug',
+    'cv_feedback': 'ix_cv_feedback_cv_slug',
+}
+
+
+def upgrade_schema(engine=None):
+    """Bring tables created by older releases up to the current models.
+
+    ``db.create_all`` only creates missing tables, so existing databases need
+    this to convert JSON-in-TEXT columns to JSONB (PostgreSQL only; SQLite
+    keeps TEXT, which the JSON type reads as before) and to swap the
+    single-column slug indexes for the composite ones. Safe to run repeatedly.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    changes = []
+
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            for table, columns in JSON_COLUMNS.items():
+                if table not in tables:
+                    continue
+                types = {col['name']: col['type'].__class__.__name__ for col in inspector.get_columns(table)}
+                for column in columns:
+                    if types.get(column) in ('TEXT', 'Text', 'VARCHAR', 'String'):
+                        conn.execute(text(
+                            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB "
+                            f"USING NULLIF({column}, '')::jsonb"
+                        ))
+                        changes.append(f"{table}.{column} -> JSONB")
+
+        for model in (CVAnalytics, CVFeedback):
+            table = model.__tablename__
+            if table not in tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table)}
+            for index in model.__table__.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    changes.append(f"created {index.name}")
+            if REDUNDANT_INDEXES[table] in existing:
+                conn.execute(text(f"DROP INDEX {REDUNDANT_INDEXES[table]}"))
+                changes.append(f"dropped {REDUNDANT_INDEXES[table]}")
+
+    for change in changes:
+        logger.info("Schema upgrade: %s", change)
+    return changes
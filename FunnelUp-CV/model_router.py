@@ -0,0 +1,557 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from metrics import model_router_events, registry
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth another attempt; other 4xx errors fail the same way every time
+RETRYABLE_STATUSES = (408, 409, 429)
+
+
+class ModelUnavailable(RuntimeError):
+    """Every model that could serve the request has an open circuit breaker."""
+
+
+class ModelTimeout(TimeoutError):
+    """A model did not answer within its timeout."""
+
+
+def _pairs(spec):
+    """'gpt-5-nano=gpt-4o-mini,gpt-4o-mini=30' -> {'gpt-5-nano': 'gpt-4o-mini', 'gpt-4o-mini': '30'}"""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        if not value:
+            raise ValueError(f"Expected model=value, got: {item}")
+        pairs[name.strip()] = value.strip()
+    return pairs
+
+
+def answered_by(response, model):
+    """The model a routed response came from; ``model`` when it was not routed."""
+    return getattr(response, 'routed_model', model)
+
+
+def _tag(response, name):
+    # Callers cache completions per model, so record which one answered
+    try:
+        response.routed_model = name
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return response
+
+
+def _retryable(error):
+    status = getattr(error, 'status_code', None)
+    return status is None or status in RETRYABLE_STATUSES or status >= 500
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures and fails fast for ``cooldown`` seconds.
+
+    After the cooldown it is half-open: one trial call goes through, and its
+    outcome closes the breaker or opens it for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self._opened_at >= self.cooldown else 'open'
+
+    def available(self):
+        """Whether a call could be made now, without claiming the half-open trial."""
+        state = self.state
+        return state == 'closed' or (state == 'half_open' and not self._trial)
+
+    def acquire(self):
+        """Claim permission for one call; claims the trial when half-open."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        """Record a failed call; returns True when this opened the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self._opened_at is None and self.failures >= self.threshold):
+                self._opened_at = time.monotonic()
+                self._trial = False
+                self.trips += 1
+                return True
+            return False
+
+
+class ModelStats:
+    """Call counts and a rolling window of successful call latencies for one model."""
+
+    EVENTS = ('calls', 'successes', 'failures', 'timeouts', 'retries', 'hedges', 'hedge_wins', 'fallbacks', 'rejected')
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.counts = dict.fromkeys(self.EVENTS, 0)
+
+    def percentile(self, q):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))]
+
+    def snapshot(self):
+        snapshot = dict(self.counts)
+        snapshot['samples'] = len(self.latencies)
+        for q in (50, 95, 99):
+            value = self.percentile(q)
+            snapshot[f'p{q}_ms'] = round(value, 1) if value is not None else None
+        return snapshot
+
+
+class ModelRouter:
+    """Per-model routing policy: timeouts, fallbacks, hedging, retries and circuit breakers.
+
+    ``fallbacks`` maps a model to the alternate tried when it fails, times
+    out or is slower than its hedge threshold (its p95 once ``hedge_min_samples``
+    calls have succeeded; before that ``hedge_after_ms``, or no hedge when it
+    is None). The executors
+    below apply the policy to sync and async clients.
+    """
+
+    def __init__(self, fallbacks=None, timeouts=None, default_timeout=60.0, retries=2, backoff_ms=200,
+                 backoff_max_ms=2000, hedge=True, hedge_percentile=95, hedge_after_ms=None, hedge_min_samples=20,
+                 failure_threshold=5, cooldown=30.0, window=500):
+        self.fallbacks = dict(fallbacks or {})
+        self.timeouts = {model: float(seconds) for model, seconds in (timeouts or {}).items()}
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff_ms = backoff_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_after_ms = hedge_after_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Router configured by the MODEL_* environment variables."""
+        return cls(
+            fallbacks=_pairs(os.environ.get("MODEL_FALLBACKS", "gpt-5-nano=gpt-4o-mini,gpt-4o-mini=gpt-5-nano")),
+            timeouts=_pairs(os.environ.get("MODEL_TIMEOUTS", "")),
+            default_timeout=float(os.environ.get("MODEL_TIMEOUT", 60)),
+            retries=int(os.environ.get("MODEL_RETRIES", 2)),
+            backoff_ms=float(os.environ.get("MODEL_RETRY_BACKOFF_MS", 200)),
+            backoff_max_ms=float(os.environ.get("MODEL_RETRY_BACKOFF_MAX_MS", 2000)),
+            # Hedging pays for a second completion, so it is opt-in
+            hedge=os.environ.get("MODEL_HEDGE", "0").lower() in ('1', 'true', 'yes', 'on'),
+            hedge_percentile=float(os.environ.get("MODEL_HEDGE_PERCENTILE", 95)),
+            hedge_after_ms=float(os.environ["MODEL_HEDGE_AFTER_MS"]) if os.environ.get("MODEL_HEDGE_AFTER_MS") else None,
+            hedge_min_samples=int(os.environ.get("MODEL_HEDGE_MIN_SAMPLES", 20)),
+            failure_threshold=int(os.environ.get("MODEL_CIRCUIT_FAILURES", 5)),
+            cooldown=float(os.environ.get("MODEL_CIRCUIT_COOLDOWN", 30)),
+        )
+
+    def models(self):
+        """Every model named in the fallback and timeout settings."""
+        return set(self.fallbacks) | set(self.fallbacks.values()) | set(self.timeouts)
+
+    def _breaker(self, model):
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(model, CircuitBreaker(self.failure_threshold, self.cooldown))
+        return breaker
+
+    def _model_stats(self, model):
+        stats = self._stats.get(model)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(model, ModelStats(self.window))
+        return stats
+
+    def candidates(self, model):
+        """The model and its fallback chain, minus models whose breaker is open."""
+        chain = [model]
+        while self.fallbacks.get(chain[-1]) and self.fallbacks[chain[-1]] not in chain:
+            chain.append(self.fallbacks[chain[-1]])
+        available = [name for name in chain if self._breaker(name).available()]
+        if not available:
+            self.count(model, 'rejected')
+        return available
+
+    def timeout(self, model):
+        return self.timeouts.get(model, self.default_timeout)
+
+    def hedge_delay(self, model):
+        """Seconds to wait for a model before hedging, or None when hedging is off."""
+        if not self.hedge:
+            return None
+        stats = self._model_stats(model)
+        with self._lock:
+            if len(stats.latencies) < self.hedge_min_samples:
+                # Without enough samples for a p95, only hedge on an explicit threshold
+                return self.hedge_after_ms / 1000 if self.hedge_after_ms is not None else None
+            return stats.percentile(self.hedge_percentile) / 1000
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number ``attempt`` (1-based), in seconds."""
+        ceiling = min(self.backoff_max_ms, self.backoff_ms * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling) / 1000
+
+    def acquire(self, model):
+        if self._breaker(model).acquire():
+            self.count(model, 'calls')
+            return True
+        return False
+
+    def count(self, model, event):
+        stats = self._model_stats(model)
+        with self._lock:
+            stats.counts[event] += 1
+        model_router_events.inc(model, event)
+
+    def succeeded(self, model, elapsed_ms, sample=True):
+        """Record a successful call; ``sample=False`` keeps it out of the latency window (streams)."""
+        self._breaker(model).success()
+        stats = self._model_stats(model)
+        with self._lock:
+            stats.counts['successes'] += 1
+            if sample:
+                stats.latencies.append(elapsed_ms)
+
+    def failed(self, model, error, timed_out=False):
+        if timed_out:
+            self.count(model, 'timeouts')
+        self.count(model, 'failures')
+        if not _retryable(error):
+            # The request itself is bad; the model is not unhealthy
+            return
+        if self._breaker(model).failure():
+            model_router_events.inc(model, 'circuit_trip')
+            logger.warning("Circuit opened for %s for %.0fs after %s", model, self.cooldown, error)
+
+    def stats(self):
+        with self._lock:
+            models = sorted(set(self._stats) | set(self._breakers))
+        data = {}
+        for model in models:
+            breaker = self._breaker(model)
+            stats = self._model_stats(model)
+            with self._lock:
+                snapshot = stats.snapshot()
+            snapshot.update({
+                'circuit': breaker.state,
+                'circuit_trips': breaker.trips,
+                'timeout_s': self.timeout(model),
+                'fallback': self.fallbacks.get(model),
+            })
+            delay = self.hedge_delay(model)
+            snapshot['hedge_after_ms'] = round(delay * 1000, 1) if delay is not None else None
+            data[model] = snapshot
+        return data
+
+    def prometheus_lines(self):
+        """Circuit breaker state per model (0 closed, 1 half-open, 2 open)."""
+        lines = ['# TYPE funnelcv_model_circuit_state gauge']
+        with self._lock:
+            breakers = sorted(self._breakers.items())
+        for model, breaker in breakers:
+            value = {'closed': 0, 'half_open': 1, 'open': 2}[breaker.state]
+            lines.append(f'funnelcv_model_circuit_state{{model="{model}"}} {value}')
+        return lines if len(lines) > 1 else []
+
+
+class RoutedCompletions:
+    """``chat.completions`` that applies a ModelRouter to a sync client.
+
+    Attempts run on a small thread pool so a hedge can start while the
+    first call is still waiting; a losing call is left to finish in the
+    background (its response is discarded) since threads cannot be
+    cancelled. Streams are not hedged: the first model to open a stream
+    serves it, with fallback and retries on failure to open.
+    """
+
+    def __init__(self, router, completions, max_workers=16):
+        self.router = router
+        self._completions = completions
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, **kwargs):
+        error = None
+        for attempt in range(self.router.retries + 1):
+            if attempt:
+                self.router.count(model, 'retries')
+                time.sleep(self.router.backoff(attempt))
+            candidates = self.router.candidates(model)
+            if not candidates:
+                raise ModelUnavailable(f"No model available for {model}: circuit open") from error
+            try:
+                if kwargs.get('stream'):
+                    return self._open_stream(model, candidates, messages, kwargs)
+                return self._hedged(model, candidates, messages, kwargs)
+            except Exception as e:
+                if not _retryable(e):
+                    raise
+                error = e
+        raise error
+
+    def _call(self, name, messages, kwargs):
+        started = time.perf_counter()
+        try:
+            response = self._completions.create(model=name, messages=messages, timeout=self.router.timeout(name), **kwargs)
+        except Exception as e:
+            self.router.failed(name, e)
+            raise
+        self.router.succeeded(name, (time.perf_counter() - started) * 1000, sample=not kwargs.get('stream'))
+        return _tag(response, name)
+
+    def _open_stream(self, model, candidates, messages, kwargs):
+        error = None
+        for name in candidates:
+            if not self.router.acquire(name):
+                continue
+            if name != model:
+                self.router.count(model, 'fallbacks')
+            try:
+                return self._call(name, messages, kwargs)
+            except Exception as e:
+                if not _retryable(e):
+                    raise
+                error = e
+        raise error or ModelUnavailable(f"No model available for {model}: circuit open")
+
+    def _hedged(self, model, candidates, messages, kwargs):
+        pool = self._pool()
+        queue = list(candidates)
+        running = {}  # future -> (model, deadline)
+        error = None
+
+        def launch():
+            while queue:
+                name = queue.pop(0)
+                if self.router.acquire(name):
+                    future = pool.submit(self._call, name, messages, kwargs)
+                    running[future] = (name, time.monotonic() + self.router.timeout(name))
+                    return True
+            return False
+
+        launch()
+        delay = self.router.hedge_delay(model)
+        hedge_at = time.monotonic() + delay if delay is not None and queue else None
+        hedged = False
+
+        while running:
+            wake = min([deadline for _, deadline in running.values()] + ([hedge_at] if hedge_at else []))
+            done, _ = wait(running, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = running.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    if not _retryable(e):
+                        raise
+                    error = e
+                    # Fall back right away instead of waiting for the hedge
+                    if not running and launch():
+                        self.router.count(model, 'fallbacks')
+                        hedge_at = None
+                    continue
+                if hedged and name != model:
+                    self.router.count(model, 'hedge_wins')
+                return response
+
+            now = time.monotonic()
+            for future, (name, deadline) in list(running.items()):
+                if now >= deadline:
+                    # The client got the same timeout, so the abandoned call
+                    # records its own failure when it gives up
+                    del running[future]
+                    error = ModelTimeout(f"{name} did not answer within {self.router.timeout(name):.0f}s")
+                    self.router.count(name, 'timeouts')
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if launch():
+                    hedged = True
+                    self.router.count(model, 'hedges')
+            elif not running and launch():
+                hedge_at = None
+                self.router.count(model, 'fallbacks')
+
+        raise error or ModelUnavailable(f"No model available for {model}: circuit open")
+
+    def _pool(self):
+        # Created lazily so each forked gunicorn worker gets its own threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='model-router')
+                self._pid = os.getpid()
+            return self._executor
+
+
+class AsyncRoutedCompletions(RoutedCompletions):
+    """``RoutedCompletions`` for AsyncOpenAI: attempts are tasks, and losing hedges are cancelled."""
+
+    async def create(self, model, messages, **kwargs):
+        error = None
+        for attempt in range(self.router.retries + 1):
+            if attempt:
+                self.router.count(model, 'retries')
+                await asyncio.sleep(self.router.backoff(attempt))
+            candidates = self.router.candidates(model)
+            if not candidates:
+                raise ModelUnavailable(f"No model available for {model}: circuit open") from error
+            try:
+                if kwargs.get('stream'):
+                    return await self._open_stream(model, candidates, messages, kwargs)
+                return await self._hedged(model, candidates, messages, kwargs)
+            except Exception as e:
+                if not _retryable(e):
+                    raise
+                error = e
+        raise error
+
+    async def _call(self, name, messages, kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self._completions.create(model=name, messages=messages,
+                                                      timeout=self.router.timeout(name), **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.router.failed(name, e)
+            raise
+        self.router.succeeded(name, (time.perf_counter() - started) * 1000, sample=not kwargs.get('stream'))
+        return _tag(response, name)
+
+    async def _open_stream(self, model, candidates, messages, kwargs):
+        error = None
+        for name in candidates:
+            if not self.router.acquire(name):
+                continue
+            if name != model:
+                self.router.count(model, 'fallbacks')
+            try:
+                return await self._call(name, messages, kwargs)
+            except Exception as e:
+                if not _retryable(e):
+                    raise
+                error = e
+        raise error or ModelUnavailable(f"No model available for {model}: circuit open")
+
+    async def _hedged(self, model, candidates, messages, kwargs):
+        queue = list(candidates)
+        running = {}  # task -> (model, deadline)
+        error = None
+
+        def launch():
+            while queue:
+                name = queue.pop(0)
+                if self.router.acquire(name):
+                    task = asyncio.ensure_future(self._call(name, messages, kwargs))
+                    running[task] = (name, time.monotonic() + self.router.timeout(name))
+                    return True
+            return False
+
+        launch()
+        delay = self.router.hedge_delay(model)
+        hedge_at = time.monotonic() + delay if delay is not None and queue else None
+        hedged = False
+
+        try:
+            while running:
+                wake = min([deadline for _, deadline in running.values()] + ([hedge_at] if hedge_at else []))
+                done, _ = await asyncio.wait(running, timeout=max(0.0, wake - time.monotonic()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name, _ = running.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        if not _retryable(e):
+                            raise
+                        error = e
+                        if not running and launch():
+                            self.router.count(model, 'fallbacks')
+                            hedge_at = None
+                        continue
+                    if hedged and name != model:
+                        self.router.count(model, 'hedge_wins')
+                    return response
+
+                now = time.monotonic()
+                for task, (name, deadline) in list(running.items()):
+                    if now >= deadline:
+                        del running[task]
+                        task.cancel()
+                        error = ModelTimeout(f"{name} did not answer within {self.router.timeout(name):.0f}s")
+                        self.router.failed(name, error, timed_out=True)
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if launch():
+                        hedged = True
+                        self.router.count(model, 'hedges')
+                elif not running and launch():
+                    hedge_at = None
+                    self.router.count(model, 'fallbacks')
+        finally:
+            # The first answer wins; stop paying for the others
+            for task in running:
+                task.cancel()
+
+        raise error or ModelUnavailable(f"No model available for {model}: circuit open")
+
+
+class RoutedClient:
+    """Client facade whose ``chat.completions`` goes through a ModelRouter."""
+
+    def __init__(self, client, router, completions=RoutedCompletions):
+        self.client = client
+        self.router = router
+        self.chat = SimpleNamespace(completions=completions(router, client.chat.completions))
+
+    def warm(self):
+        if hasattr(self.client, 'warm'):
+            self.client.warm()
+
+    def stats(self):
+        return self.router.stats()
+
+
+# Shared by the sync and async clients of a process, so both feed one set of stats
+model_router = ModelRouter.from_env()
+registry.collector(model_router.prometheus_lines)
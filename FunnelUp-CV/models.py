@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase
 from datetime import datetime
 
@@ -8,6 +9,10 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+# Native JSONB on PostgreSQL, JSON-encoded TEXT elsewhere (e.g. SQLite).
+# none_as_null keeps Python None as SQL NULL rather than the JSON 'null'.
+JSONDocument = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
 class CVProfile(db.Model):
     """Model representing a CV profile for a specific job application."""
     __tablename__ = 'cv_profiles'
@@ -35,15 +40,18 @@ class CVProfile(db.Model):
 class CVFeedback(db.Model):
     """Model for storing HR feedback on CV profiles."""
     __tablename__ = 'cv_feedback'
+    __table_args__ = (
+        db.Index('ix_cv_feedback_slug_type', 'cv_slug', 'feedback_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    cv_slug = db.Column(db.String(255), nullable=False, index=True)
+    cv_slug = db.Column(db.String(255), nullable=False)
     feedback_type = db.Column(db.String(50), nullable=False)  # interested, maybe, not-match, improve
     message = db.Column(db.Text, nullable=True)
-    detailed_ratings = db.Column(db.Text, nullable=True)  # JSON string for section ratings
-    improvement_tips = db.Column(db.Text, nullable=True)  # JSON string for tips
+    detailed_ratings = db.Column(JSONDocument, nullable=True)  # section -> rating
+    improvement_tips = db.Column(JSONDocument, nullable=True)  # list of tips
     time_spent = db.Column(db.Integer, nullable=True)  # milliseconds
-    section_times = db.Column(db.Text, nullable=True)  # JSON string for section viewing times
+    section_times = db.Column(JSONDocument, nullable=True)  # section -> viewing time
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     hr_ip = db.Column(db.String(45), nullable=True)  # For tracking unique viewers
     
@@ -54,14 +62,83 @@ class CVFeedback(db.Model):
 class CVAnalytics(db.Model):
     """Model for storing CV viewing analytics."""
     __tablename__ = 'cv_analytics'
+    __table_args__ = (
+        db.Index('ix_cv_analytics_slug_type_ts', 'cv_slug', 'event_type', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    cv_slug = db.Column(db.String(255), nullable=False, index=True)
+    cv_slug = db.Column(db.String(255), nullable=False)
     event_type = db.Column(db.String(50), nullable=False)  # page_view, section_view, chat_opened, etc.
-    event_data = db.Column(db.Text, nullable=True)  # JSON string for event details
+    event_data = db.Column(JSONDocument, nullable=True)  # event details
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     visitor_ip = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.String(500), nullable=True)
     
     def __repr__(self):
-        return f'<CVAnalytics {self.cv_slug}: {self.event_type}>'
\ No newline at end of file
+        return f'<CVAnalytics {self.cv_slug}: {self.event_type}>'
+
+class CVAnalyticsDaily(db.Model):
+    """Daily per-CV, per-event-type counts kept after raw analytics are compacted."""
+    __tablename__ = 'cv_analytics_daily'
+    __table_args__ = (
+        db.UniqueConstraint('cv_slug', 'event_type', 'day', name='uq_cv_analytics_daily'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cv_slug = db.Column(db.String(255), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    unique_visitors = db.Column(db.Integer, nullable=False, default=0)  # distinct IPs that day
+    
+    def __repr__(self):
+        return f'<CVAnalyticsDaily {self.cv_slug} {self.event_type} {self.day}: {self.event_count}>'
+
+class CVRollup(db.Model):
+    """Incrementally maintained per-CV aggregates behind the feedback summary."""
+    __tablename__ = 'cv_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cv_slug = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    total_feedback = db.Column(db.Integer, nullable=False, default=0)
+    time_spent_total = db.Column(db.BigInteger, nullable=False, default=0)  # milliseconds
+    feedback_breakdown = db.Column(JSONDocument, nullable=True)  # feedback_type -> count
+    rating_totals = db.Column(JSONDocument, nullable=True)  # section -> [sum, count]
+    improvement_tips = db.Column(JSONDocument, nullable=True)  # most recent tips
+    visitor_sketch = db.Column(db.LargeBinary, nullable=True)  # HyperLogLog of page_view IPs
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CVRollup {self.cv_slug}: {self.total_feedback} feedback>'
+
+
+class CompletionCacheEntry(db.Model):
+    """Cached AI completion keyed by a hash of the model and prompt."""
+    __tablename__ = 'completion_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of model + normalized messages
+    model = db.Column(db.String(100), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<CompletionCacheEntry {self.key[:12]} ({self.model})>'
+
+
+class GenerationJobRecord(db.Model):
+    """Shared state of a generation job so any worker can report on or cancel it."""
+    __tablename__ = 'generation_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # Job.id (uuid4 hex)
+    status = db.Column(db.String(20), nullable=False)
+    stage = db.Column(db.String(20), nullable=False)
+    result = db.Column(JSONDocument, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<GenerationJobRecord {self.id}: {self.status}>'
@@ -0,0 +1,342 @@
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from metrics import pdf_render_duration
+
+logger = logging.getLogger(__name__)
+
+# Bump when the PDF layout changes so cached files are not reused
+PDF_LAYOUT_VERSION = 1
+
+# Processes rendering bulk exports; reportlab layout is CPU-bound Python
+PDF_RENDER_PROCESSES = int(os.environ.get("PDF_RENDER_PROCESSES", os.cpu_count() or 1))
+
+
+def pdf_key(data):
+    """Content hash of everything that ends up in the rendered PDF."""
+    fields = [PDF_LAYOUT_VERSION] + [
+        data.get(field) or "" for field in ("name", "job", "company", "summary", "skills", "video")
+    ]
+    return hashlib.sha256(json.dumps(fields).encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        spaceAfter=30
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=16
+    )
+    return styles, title_style, heading_style
+
+
+def warm():
+    """Import reportlab and build the paragraph styles ahead of the first render."""
+    import reportlab.platypus  # noqa: F401
+    _styles()
+
+
+def build_pdf(data):
+    """Lay out a CV profile as a PDF and return the bytes."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+    styles, title_style, heading_style = _styles()
+    story = []
+
+    # Add content
+    story.append(Paragraph(data["name"], title_style))
+    story.append(Paragraph(f"{data['job']} at {data['company']}", styles['Heading2']))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("Professional Summary", heading_style))
+    story.append(Paragraph(data["summary"], styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("Skills & Expertise", heading_style))
+    story.append(Paragraph(data.get("skills") or "", styles['Normal']))
+
+    video = data.get("video")
+    if video:
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Video Introduction", heading_style))
+        story.append(Paragraph(f"View my introduction: {video}", styles['Normal']))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _timed_build(data):
+    # Runs in a render process, whose metrics never reach /metrics
+    started = time.perf_counter()
+    content = build_pdf(data)
+    return content, (time.perf_counter() - started) * 1000
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable sink that collects what zipfile writes until it is taken."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_chunks(entries):
+    """Stream (filename, bytes) entries as a ZIP archive, one chunk per entry.
+
+    Written to an unseekable buffer, so zipfile puts sizes in data
+    descriptors and only the current entry is ever held in memory.
+    """
+    sink = _ChunkBuffer()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, content in entries:
+            info = zipfile.ZipInfo(filename, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+            yield sink.take()
+    yield sink.take()
+
+
+class PDFCache:
+    """On-disk, content-addressed PDF store with a size cap and LRU eviction.
+
+    Files are named by ``pdf_key`` so identical profiles share one file and
+    edits never serve stale output. Reads bump the file mtime, which is
+    what eviction orders by. A running byte total, seeded by one directory
+    scan, keeps puts cheap; the directory is only rescanned when the total
+    passes the cap, which also picks up files written by other workers.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._processes = None
+        self._processes_pid = None
+        self._bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.evictions = 0
+        self.last_render_ms = 0.0
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        """Return the cached file path, or None if it has not been rendered."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key, content):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        # Write then rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._files())
+            else:
+                self._bytes += len(content) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+        return path
+
+    def get_or_render(self, data):
+        """Return a path to the PDF for this profile, rendering it on a miss."""
+        key = pdf_key(data)
+        path = self.get(key)
+        if path is not None:
+            return path
+
+        started = time.perf_counter()
+        content = build_pdf(data)
+        self.last_render_ms = (time.perf_counter() - started) * 1000
+        pdf_render_duration.observe(self.last_render_ms)
+        self.renders += 1
+        return self.put(key, content)
+
+    def render_many(self, profiles):
+        """Yield (slug, PDF bytes or None on failure) for {slug: profile}, cached files first.
+
+        Misses are rendered on a process pool and yielded as each one
+        finishes, so callers can stream results without waiting for the
+        slowest. Closing the generator cancels renders that have not started.
+        """
+        pending = {}
+        for slug, data in profiles.items():
+            key = pdf_key(data)
+            path = self.get(key)
+            if path is not None:
+                try:
+                    with open(path, 'rb') as f:
+                        content = f.read()
+                except FileNotFoundError:
+                    pass  # evicted since the lookup
+                else:
+                    yield slug, content
+                    continue
+            pending.setdefault(key, (data, []))[1].append(slug)
+        if not pending:
+            return
+
+        futures = {}
+        try:
+            pool = self._process_pool()
+            for key, (data, slugs) in pending.items():
+                futures[pool.submit(_timed_build, dict(data))] = (key, slugs)
+            for future in as_completed(futures):
+                key, slugs = futures[future]
+                try:
+                    content, render_ms = future.result()
+                except Exception as e:
+                    logger.error("Error rendering PDF for %s: %s", ', '.join(slugs), e)
+                    if isinstance(e, BrokenProcessPool):
+                        self._reset_process_pool()
+                    content = None
+                else:
+                    self.last_render_ms = render_ms
+                    pdf_render_duration.observe(render_ms)
+                    self.renders += 1
+                    self.put(key, content)
+                for slug in slugs:
+                    yield slug, content
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def prerender(self, data):
+        """Render the PDF on a background thread so the first download is a file read."""
+        try:
+            self._pool().submit(self._prerender, dict(data))
+        except RuntimeError as e:
+            logger.warning("Could not schedule PDF pre-render: %s", e)
+
+    def stats(self):
+        files = self._files()
+        return {
+            'files': len(files),
+            'bytes': sum(size for _, size, _ in files),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'renders': self.renders,
+            'evictions': self.evictions,
+            'last_render_ms': round(self.last_render_ms, 2),
+        }
+
+    def _prerender(self, data):
+        try:
+            self.get_or_render(data)
+        except Exception as e:
+            logger.error("Error pre-rendering PDF: %s", e)
+
+    def _pool(self):
+        # Created lazily so each forked gunicorn worker gets its own thread
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-prerender')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _process_pool(self):
+        # Spawned rather than forked: the parent is a threaded server process
+        with self._lock:
+            if self._processes is None or self._processes_pid != os.getpid():
+                self._processes = ProcessPoolExecutor(
+                    max_workers=PDF_RENDER_PROCESSES, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._processes_pid = os.getpid()
+            return self._processes
+
+    def _reset_process_pool(self):
+        with self._lock:
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = None
+
+    def _files(self):
+        files = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return files
+        for entry in entries:
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict(self):
+        # Caller holds the lock; rescan so the total is exact before evicting
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in sorted(files, key=lambda f: f[2]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+
+pdf_cache = PDFCache(
+    directory=os.environ.get("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "funnelcv-pdf-cache")),
+    max_bytes=int(os.environ.get("PDF_CACHE_MAX_MB", 256)) * 1024 * 1024
+)
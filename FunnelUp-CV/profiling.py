@@ -0,0 +1,149 @@
+import hmac
+import itertools
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+from dbmetrics import query_time
+from metrics import http_request_db_duration, http_request_duration
+
+logger = logging.getLogger(__name__)
+
+# Profile every Nth request (0 = never), and/or requests sending
+# "X-Profile: <PROFILE_TOKEN>"
+PROFILE_EVERY_N = int(os.environ.get("PROFILE_EVERY_N", 0))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+# sample: wall-clock stack samples in collapsed format (flamegraph.pl, speedscope)
+# cprofile: deterministic cProfile stats (.prof for snakeviz, flameprof, pstats)
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sample")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "funnelcv-profiles"))
+
+_request_numbers = itertools.count(1)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer into collapsed-stack counts.
+
+    Each line of the output is ``root;...;leaf count``, the input format of
+    flamegraph.pl, inferno and speedscope.
+    """
+
+    def __init__(self, thread_id, interval_ms=PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """One profiled request, written to PROFILE_DIR when it finishes."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        if mode == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident()).start()
+
+    def finish(self, endpoint):
+        """Stop profiling and return the output path."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint or 'unmatched')
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            path = os.path.join(PROFILE_DIR, f"{stamp}-{name}-{os.getpid()}-{id(self):x}.prof")
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.stop()
+            path = os.path.join(PROFILE_DIR, f"{stamp}-{name}-{os.getpid()}-{id(self):x}.collapsed")
+            self._profiler.write(path)
+        return path
+
+
+def _wants_profile():
+    if PROFILE_TOKEN:
+        header = request.headers.get('X-Profile')
+        if header and hmac.compare_digest(header, PROFILE_TOKEN):
+            return True
+    return bool(PROFILE_EVERY_N) and next(_request_numbers) % PROFILE_EVERY_N == 0
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.query_time = [0.0, 0]
+    query_time.set(g.query_time)
+    if (PROFILE_EVERY_N or PROFILE_TOKEN) and _wants_profile():
+        g.request_profile = RequestProfile(PROFILE_MODE)
+
+
+def _record_request(response):
+    # Streamed bodies (SSE, exports) are timed up to the first byte
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_request_duration.observe((time.perf_counter() - started) * 1000, route, request.method, response.status_code)
+    http_request_db_duration.observe(g.query_time[0], route)
+
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        path = profile.finish(request.endpoint)
+        logger.info("Wrote %s profile for %s to %s", profile.mode, route, path)
+        response.headers['X-Profile-Output'] = os.path.basename(path)
+    return response
+
+
+def _end_request(exc):
+    # Worker threads are reused, so stop charging queries to this request
+    query_time.set(None)
+    # Requests that raised never reached after_request
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profile.finish(request.endpoint)
+
+
+def init_app(app):
+    """Time every request by route and profile the ones selected by PROFILE_*."""
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.teardown_request(_end_request)
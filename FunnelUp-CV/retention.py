@@ -0,0 +1,240 @@
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from models import db, CVAnalytics, CVAnalyticsDaily
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.environ.get("ANALYTICS_RETENTION_DAYS", 90))
+PARTITION_MONTHS_AHEAD = int(os.environ.get("ANALYTICS_PARTITION_MONTHS_AHEAD", 2))
+
+PARTITION_NAME = re.compile(r'^cv_analytics_y(\d{4})m(\d{2})$')
+
+
+def retention_cutoff(retention_days=None, now=None):
+    """Start of the oldest day whose raw events are kept."""
+    days = RETENTION_DAYS if retention_days is None else retention_days
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=days)
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"cv_analytics_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned():
+    """True when cv_analytics is a partitioned PostgreSQL table."""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'cv_analytics'::regclass"
+    )).first() is not None
+
+
+def _partitions():
+    """Monthly partitions as (name, start, end), oldest first."""
+    names = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'cv_analytics'::regclass"
+    )).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append((name, month, _next_month(month)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _create_partition(month):
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF cv_analytics "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    ))
+
+
+def ensure_partitions(months_ahead=None, commit=True):
+    """Create monthly partitions from this month through months_ahead months out.
+
+    A no-op unless cv_analytics is partitioned. Rows outside every monthly
+    range land in the default partition, so a missed run never loses events.
+    """
+    if not is_partitioned():
+        return []
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    existing = {name for name, _, _ in _partitions()}
+    month = _month_start(datetime.utcnow())
+    created = []
+    for _ in range(months_ahead + 1):
+        if partition_name(month) not in existing:
+            _create_partition(month)
+            created.append(partition_name(month))
+        month = _next_month(month)
+    if commit:
+        db.session.commit()
+    for name in created:
+        logger.info("Created analytics partition %s", name)
+    return created
+
+
+def partition_analytics(months_ahead=None):
+    """Convert cv_analytics into a table range-partitioned by month (PostgreSQL only).
+
+    Copies every row into the new layout in one transaction, so run it in a
+    quiet period. The primary key becomes (id, timestamp), as PostgreSQL
+    requires the partition key in unique constraints; ids keep their sequence.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError("Analytics partitioning needs PostgreSQL")
+    if is_partitioned():
+        logger.info("cv_analytics is already partitioned")
+        return 0
+
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    try:
+        oldest = db.session.execute(text('SELECT min("timestamp") FROM cv_analytics')).scalar()
+        sequence = db.session.execute(text("SELECT pg_get_serial_sequence('cv_analytics', 'id')")).scalar()
+
+        db.session.execute(text("ALTER TABLE cv_analytics RENAME TO cv_analytics_unpartitioned"))
+        for index in CVAnalytics.__table__.indexes:
+            db.session.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_unpartitioned"))
+        db.session.execute(text(
+            "CREATE TABLE cv_analytics (LIKE cv_analytics_unpartitioned INCLUDING DEFAULTS) "
+            'PARTITION BY RANGE ("timestamp")'
+        ))
+        db.session.execute(text('ALTER TABLE cv_analytics ALTER COLUMN "timestamp" SET NOT NULL'))
+        db.session.execute(text('ALTER TABLE cv_analytics ADD PRIMARY KEY (id, "timestamp")'))
+        if sequence:
+            # Keep the id sequence alive when the old table is dropped
+            db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY cv_analytics.id"))
+
+        month = _month_start(oldest or datetime.utcnow())
+        last = _month_start(datetime.utcnow())
+        for _ in range(months_ahead):
+            last = _next_month(last)
+        while month <= last:
+            _create_partition(month)
+            month = _next_month(month)
+        db.session.execute(text("CREATE TABLE cv_analytics_default PARTITION OF cv_analytics DEFAULT"))
+        for index in CVAnalytics.__table__.indexes:
+            index.create(db.session.connection())
+
+        copied = db.session.execute(text(
+            'INSERT INTO cv_analytics (id, cv_slug, event_type, event_data, "timestamp", visitor_ip, user_agent) '
+            'SELECT id, cv_slug, event_type, event_data, '
+            'COALESCE("timestamp", now() AT TIME ZONE \'utc\'), visitor_ip, user_agent '
+            'FROM cv_analytics_unpartitioned'
+        )).rowcount
+        db.session.execute(text("DROP TABLE cv_analytics_unpartitioned"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info("Partitioned cv_analytics by month (%s rows copied)", copied)
+    return copied
+
+
+def _upsert_daily(rows):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        db.session.execute(db.insert(CVAnalyticsDaily), rows)
+        return
+
+    # A day is normally compacted once; if it is seen again the counts add up
+    # (unique_visitors then becomes an upper bound)
+    stmt = insert(CVAnalyticsDaily)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['cv_slug', 'event_type', 'day'],
+        set_={
+            'event_count': CVAnalyticsDaily.event_count + stmt.excluded.event_count,
+            'unique_visitors': CVAnalyticsDaily.unique_visitors + stmt.excluded.unique_visitors,
+        }
+    )
+    db.session.execute(stmt, rows)
+
+
+def _compact_range(start, end):
+    """Fold raw events in [start, end) into daily aggregates. Returns (rows, aggregates)."""
+    day = db.func.date(CVAnalytics.timestamp, type_=db.Date)
+    query = (
+        db.select(CVAnalytics.cv_slug, CVAnalytics.event_type, day,
+                  db.func.count(), db.func.count(db.distinct(CVAnalytics.visitor_ip)))
+        .where(CVAnalytics.timestamp < end)
+        .group_by(CVAnalytics.cv_slug, CVAnalytics.event_type, day)
+    )
+    if start is not None:
+        query = query.where(CVAnalytics.timestamp >= start)
+
+    aggregates = [
+        {'cv_slug': cv_slug, 'event_type': event_type, 'day': event_day,
+         'event_count': count, 'unique_visitors': visitors}
+        for cv_slug, event_type, event_day, count, visitors in db.session.execute(query)
+    ]
+    if aggregates:
+        _upsert_daily(aggregates)
+    return sum(row['event_count'] for row in aggregates), len(aggregates)
+
+
+def compact_analytics(retention_days=None, dry_run=False):
+    """Roll raw events older than the retention window into cv_analytics_daily.
+
+    On a partitioned PostgreSQL table, months entirely before the cutoff are
+    aggregated and their partitions dropped; any older rows left over (the
+    cutoff month or the default partition) are aggregated and deleted. Other
+    databases aggregate and delete in one pass. ``dry_run`` does the work in
+    a transaction that is rolled back. Feedback rollups are unaffected.
+    """
+    cutoff = retention_cutoff(retention_days)
+    result = {'cutoff': cutoff.isoformat(), 'compacted_rows': 0, 'aggregates': 0, 'dropped_partitions': []}
+
+    def finish_chunk():
+        if not dry_run:
+            db.session.commit()
+
+    try:
+        if is_partitioned():
+            ensure_partitions(commit=not dry_run)
+            for name, start, end in _partitions():
+                if datetime.combine(end, datetime.min.time()) > cutoff:
+                    break
+                rows, aggregates = _compact_range(start, end)
+                db.session.execute(text(f"DROP TABLE {name}"))
+                result['compacted_rows'] += rows
+                result['aggregates'] += aggregates
+                result['dropped_partitions'].append(name)
+                finish_chunk()
+
+        rows, aggregates = _compact_range(None, cutoff)
+        if rows:
+            db.session.execute(db.delete(CVAnalytics).where(CVAnalytics.timestamp < cutoff))
+        result['compacted_rows'] += rows
+        result['aggregates'] += aggregates
+        finish_chunk()
+
+        if dry_run:
+            db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info("Compacted %s analytics events older than %s%s",
+                result['compacted_rows'], result['cutoff'], ' (dry run)' if dry_run else '')
+    return result
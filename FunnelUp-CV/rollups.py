@@ -0,0 +1,258 @@
+import hashlib
+import logging
+import math
+from collections import defaultdict
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, CVFeedback, CVAnalytics, CVAnalyticsDaily, CVRollup
+
+logger = logging.getLogger(__name__)
+
+RATING_SECTIONS = ('skills', 'experience', 'presentation', 'fit')
+MAX_STORED_TIPS = 200
+
+
+class HyperLogLog:
+    """Fixed-size unique-count sketch stored as one register byte per bucket."""
+
+    def __init__(self, registers=None, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers:
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    def add(self, value):
+        digest = hashlib.sha1(str(value).encode('utf-8')).digest()
+        x = int.from_bytes(digest[:8], 'big')
+        index = x >> (64 - self.precision)
+        remainder = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is far more accurate for small cardinalities
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+
+def _new_rollup(cv_slug):
+    return CVRollup(
+        cv_slug=cv_slug,
+        event_count=0,
+        total_feedback=0,
+        time_spent_total=0
+    )
+
+
+def _locked_rollup(cv_slug, session):
+    """Fetch the rollup row for update, creating it if this is the first event."""
+    query = db.select(CVRollup).filter_by(cv_slug=cv_slug).with_for_update()
+    rollup = session.execute(query).scalar_one_or_none()
+    if rollup is not None:
+        return rollup
+
+    try:
+        with session.begin_nested():
+            rollup = _new_rollup(cv_slug)
+            session.add(rollup)
+        return rollup
+    except IntegrityError:
+        # Another worker created it first
+        return session.execute(query).scalar_one()
+
+
+def _add_feedback(rollup, feedback_type, time_spent, ratings, tips):
+    _add_counts(rollup, {feedback_type: 1}, 1, time_spent)
+    _add_ratings(rollup, ratings)
+    _add_tips(rollup, tips)
+
+
+def _add_counts(rollup, breakdown_delta, feedback_count, time_spent):
+    rollup.total_feedback = (rollup.total_feedback or 0) + feedback_count
+    if time_spent:
+        rollup.time_spent_total = (rollup.time_spent_total or 0) + int(time_spent)
+
+    # JSON columns are not mutation-tracked, so assign fresh copies
+    breakdown = dict(rollup.feedback_breakdown or {})
+    for feedback_type, count in breakdown_delta.items():
+        breakdown[feedback_type] = breakdown.get(feedback_type, 0) + count
+    rollup.feedback_breakdown = breakdown
+
+
+def _add_ratings(rollup, ratings):
+    if isinstance(ratings, dict):
+        totals = dict(rollup.rating_totals or {})
+        for section, rating in ratings.items():
+            if section not in RATING_SECTIONS:
+                continue
+            if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+                continue
+            total, count = totals.get(section, [0, 0])
+            totals[section] = [total + rating, count + 1]
+        rollup.rating_totals = totals
+
+
+def _add_tips(rollup, tips):
+    if isinstance(tips, list) and tips:
+        stored = list(rollup.improvement_tips or [])
+        stored.extend(tips)
+        rollup.improvement_tips = stored[-MAX_STORED_TIPS:]
+
+
+def _add_events(rollup, rows):
+    rollup.event_count = (rollup.event_count or 0) + len(rows)
+    page_views = [row for row in rows if row['event_type'] == 'page_view']
+    if page_views:
+        sketch = HyperLogLog(rollup.visitor_sketch)
+        for row in page_views:
+            sketch.add(row.get('visitor_ip') or '')
+        rollup.visitor_sketch = sketch.to_bytes()
+
+
+def apply_feedback(cv_slug, feedback_type, time_spent=None, ratings=None, tips=None, session=None):
+    """Fold one feedback submission into its CV rollup (caller commits).
+
+    ``session`` defaults to the Flask-SQLAlchemy session; the ASGI entry
+    point passes the sync session of its AsyncSession via ``run_sync``.
+    """
+    _add_feedback(_locked_rollup(cv_slug, session or db.session), feedback_type, time_spent, ratings, tips)
+
+
+def apply_analytics(rows):
+    """Fold a batch of CVAnalytics insert mappings into rollups (caller commits).
+
+    Only the analytics ingest flusher calls this, so the row locks below are
+    taken off the request path and at most once per CV per batch.
+    """
+    by_slug = defaultdict(list)
+    for row in rows:
+        by_slug[row['cv_slug']].append(row)
+
+    # Lock rows in a stable order so concurrent batches cannot deadlock
+    for cv_slug in sorted(by_slug):
+        _add_events(_locked_rollup(cv_slug, db.session), by_slug[cv_slug])
+
+
+def summarize(rollup):
+    """Build the /feedback-summary payload from a rollup row."""
+    total_feedback = rollup.total_feedback or 0
+    totals = rollup.rating_totals or {}
+
+    ratings = {}
+    for section in RATING_SECTIONS:
+        total, count = totals.get(section, [0, 0])
+        ratings[section] = {
+            'average': total / count if count else 0,
+            'count': count
+        }
+
+    return {
+        'total_views': HyperLogLog(rollup.visitor_sketch).count() if rollup.visitor_sketch else 0,
+        'total_feedback': total_feedback,
+        'feedback_breakdown': rollup.feedback_breakdown or {},
+        'average_time_spent': (rollup.time_spent_total or 0) / total_feedback if total_feedback else 0,
+        'improvement_suggestions': rollup.improvement_tips or [],
+        'ratings': ratings
+    }
+
+
+def rebuild_rollups(batch_size=1000):
+    """Recompute every rollup from the raw feedback and analytics tables.
+
+    Counts, sums and distinct visitors are aggregated in SQL over the
+    composite (cv_slug, ...) indexes; only feedback rows carrying ratings or
+    tips are streamed into Python. Intended for backfilling existing data;
+    run it while ingest is quiet, since rows written during the rebuild are
+    not reflected.
+    """
+    rollups = {}
+
+    def rollup_for(cv_slug):
+        if cv_slug not in rollups:
+            rollups[cv_slug] = _new_rollup(cv_slug)
+        return rollups[cv_slug]
+
+    feedback_counts = db.session.execute(
+        db.select(CVFeedback.cv_slug, CVFeedback.feedback_type,
+                  db.func.count(), db.func.sum(CVFeedback.time_spent))
+        .group_by(CVFeedback.cv_slug, CVFeedback.feedback_type)
+    )
+    for cv_slug, feedback_type, count, time_spent in feedback_counts:
+        _add_counts(rollup_for(cv_slug), {feedback_type: count}, count, time_spent)
+
+    details = db.session.execute(
+        db.select(CVFeedback.cv_slug, CVFeedback.detailed_ratings, CVFeedback.improvement_tips)
+        .where(db.or_(CVFeedback.detailed_ratings.is_not(None), CVFeedback.improvement_tips.is_not(None)))
+        .order_by(CVFeedback.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for cv_slug, ratings, tips in details:
+        rollup = rollup_for(cv_slug)
+        _add_ratings(rollup, ratings)
+        _add_tips(rollup, tips)
+
+    event_counts = db.session.execute(
+        db.select(CVAnalytics.cv_slug, db.func.count()).group_by(CVAnalytics.cv_slug)
+    )
+    for cv_slug, count in event_counts:
+        rollup_for(cv_slug).event_count = count
+
+    # Compacted events still count, though their visitors cannot be re-sketched
+    compacted_counts = db.session.execute(
+        db.select(CVAnalyticsDaily.cv_slug, db.func.sum(CVAnalyticsDaily.event_count))
+        .group_by(CVAnalyticsDaily.cv_slug)
+    )
+    for cv_slug, count in compacted_counts:
+        rollup = rollup_for(cv_slug)
+        rollup.event_count = (rollup.event_count or 0) + int(count or 0)
+
+    # DISTINCT leaves one row per (CV, visitor) for the sketches
+    visitors = db.session.execute(
+        db.select(CVAnalytics.cv_slug, CVAnalytics.visitor_ip)
+        .where(CVAnalytics.event_type == 'page_view')
+        .distinct()
+        .execution_options(yield_per=batch_size)
+    )
+    sketches = defaultdict(HyperLogLog)
+    for cv_slug, visitor_ip in visitors:
+        sketches[cv_slug].add(visitor_ip or '')
+    for cv_slug, sketch in sketches.items():
+        rollup_for(cv_slug).visitor_sketch = sketch.to_bytes()
+
+    db.session.execute(db.delete(CVRollup))
+    db.session.add_all(rollups.values())
+    db.session.commit()
+    logger.info("Rebuilt rollups for %s CVs", len(rollups))
+    return len(rollups)
+
+
+def unique_visitors_query(cv_slug, since=None):
+    """SELECT counting distinct page_view IPs for one CV (see unique_visitors)."""
+    query = (
+        db.select(db.func.count(db.distinct(db.func.coalesce(CVAnalytics.visitor_ip, ''))))
+        .where(CVAnalytics.cv_slug == cv_slug, CVAnalytics.event_type == 'page_view')
+    )
+    if since is not None:
+        query = query.where(CVAnalytics.timestamp >= since)
+    return query
+
+
+def unique_visitors(cv_slug, since=None):
+    """Exact count of distinct page_view IPs for one CV, computed in SQL.
+
+    Only raw events are counted, so this covers the analytics retention
+    window; ``since`` narrows it further and lets partitioned tables skip
+    older partitions.
+    """
+    return db.session.execute(unique_visitors_query(cv_slug, since)).scalar_one()
@@ -0,0 +1,327 @@
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = ("name", "job", "company", "summary", "skills", "video", "created_by")
+
+
+class ProfileExists(Exception):
+    """Raised by ProfileStore.put when the slug is already taken."""
+
+
+def format_profile(fields, created_at):
+    """Build the template-ready profile dict every store returns."""
+    profile = {field: fields.get(field) for field in PROFILE_FIELDS}
+    profile["skills"] = profile["skills"] or ""
+    profile["video"] = profile["video"] or ""
+    profile["created_at"] = created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else "Unknown"
+    profile["last_modified"] = created_at
+    return profile
+
+
+class ProfileStore:
+    """Storage interface for CV profiles, keyed by slug.
+
+    Profiles are plain dicts with the keys in PROFILE_FIELDS plus
+    ``created_at`` (display string) and ``last_modified`` (datetime or
+    None). ``put`` only creates; it raises ProfileExists for a taken slug.
+    """
+
+    def get(self, slug):
+        raise NotImplementedError
+
+    def get_many(self, slugs):
+        """Return {slug: profile} for the slugs that exist."""
+        profiles = {}
+        for slug in slugs:
+            profile = self.get(slug)
+            if profile is not None:
+                profiles[slug] = profile
+        return profiles
+
+    def put(self, slug, profile):
+        raise NotImplementedError
+
+    def put_many(self, items):
+        """Create several (slug, profile) pairs."""
+        for slug, profile in items:
+            self.put(slug, profile)
+
+    def allocate(self, base_slug, profile, max_attempts=8):
+        """Store a new profile under base_slug, or base_slug plus a random suffix.
+
+        Relies on the store's uniqueness check instead of reading first, so
+        concurrent identical submissions cannot race between check and insert.
+        Stores without an atomic insert override this. Returns the slug that
+        was used.
+        """
+        slug = base_slug
+        for _ in range(max_attempts):
+            try:
+                self.put(slug, profile)
+                return slug
+            except ProfileExists:
+                slug = f"{base_slug}-{secrets.token_hex(3)}"
+        raise ProfileExists(f"Could not allocate a slug for {base_slug}")
+
+
+# Names the unique slug index can have: the one models.CVProfile creates,
+# and PostgreSQL's default for a column-level UNIQUE on older tables
+SLUG_UNIQUE_CONSTRAINTS = ("ix_cv_profiles_slug", "cv_profiles_slug_key")
+
+
+def _is_slug_conflict(error):
+    """True when an IntegrityError was raised by the unique index on cv_profiles.slug."""
+    # psycopg2 and psycopg report the violated constraint by name
+    diag = getattr(error.orig, "diag", None)
+    constraint = getattr(diag, "constraint_name", None)
+    if constraint is not None:
+        return constraint in SLUG_UNIQUE_CONSTRAINTS
+    # SQLite names the columns instead of the index
+    return str(error.orig) == "UNIQUE constraint failed: cv_profiles.slug"
+
+
+class SQLAlchemyProfileStore(ProfileStore):
+    """CVProfile rows in the configured SQL database (needs an app context)."""
+
+    def _to_dict(self, cv_profile):
+        return format_profile({field: getattr(cv_profile, field) for field in PROFILE_FIELDS}, cv_profile.created_at)
+
+    def get(self, slug):
+        from models import CVProfile
+
+        cv_profile = CVProfile.get_by_slug(slug)
+        return self._to_dict(cv_profile) if cv_profile else None
+
+    def get_many(self, slugs):
+        from models import CVProfile
+
+        if not slugs:
+            return {}
+        rows = CVProfile.query.filter(CVProfile.slug.in_(list(slugs))).all()
+        return {row.slug: self._to_dict(row) for row in rows}
+
+    def put(self, slug, profile):
+        self.put_many([(slug, profile)])
+
+    def put_many(self, items):
+        from models import db, CVProfile
+
+        try:
+            for slug, profile in items:
+                db.session.add(CVProfile(slug=slug, **{field: profile.get(field) for field in PROFILE_FIELDS}))
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            # Only a unique-slug violation means the slug is taken
+            if _is_slug_conflict(e):
+                raise ProfileExists(str(e.orig)) from e
+            raise
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class ReplitProfileStore(ProfileStore):
+    """Replit DB key-value store, the fallback when no database is configured.
+
+    Replit DB has no conditional insert, so ``put`` can only check and then
+    write: two workers saving the same slug at once can both pass the check,
+    and the second write replaces the first. This store is not collision-safe
+    under concurrency; ``allocate`` makes collisions unlikely by giving every
+    new slug a random suffix.
+    """
+
+    def __init__(self, replit_db=None):
+        self._db = replit_db
+
+    @property
+    def db(self):
+        # Imported on first use so other backends never load the replit package
+        if self._db is None:
+            from replit import db as replit_db
+            self._db = replit_db
+        return self._db
+
+    def get(self, slug):
+        data = self.db.get(slug, None)
+        if not data:
+            return None
+        data = dict(data)
+        # Older records stored the creator in created_at
+        try:
+            created_at = datetime.fromisoformat(data.get("created_at") or "")
+        except ValueError:
+            created_at = None
+            data.setdefault("created_by", data.get("created_at"))
+        return format_profile(data, created_at)
+
+    def put(self, slug, profile):
+        # Check-then-write, not atomic; see the class docstring
+        if slug in self.db:
+            raise ProfileExists(slug)
+        record = {field: profile.get(field) for field in PROFILE_FIELDS}
+        record["created_at"] = datetime.utcnow().isoformat()
+        self.db[slug] = record
+
+    def allocate(self, base_slug, profile, max_attempts=8):
+        """Store a new profile under base_slug plus a random suffix.
+
+        With no atomic insert the bare base slug is exactly what identical
+        concurrent submissions would race for, so it is never used here.
+        """
+        for _ in range(max_attempts):
+            slug = f"{base_slug}-{secrets.token_hex(4)}"
+            try:
+                self.put(slug, profile)
+                return slug
+            except ProfileExists:
+                continue
+        raise ProfileExists(f"Could not allocate a slug for {base_slug}")
+
+
+class SQLiteProfileStore(ProfileStore):
+    """Standalone SQLite file, useful for local runs and benchmarks."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cv_profiles ("
+                "slug TEXT PRIMARY KEY, name TEXT NOT NULL, job TEXT NOT NULL, company TEXT NOT NULL, "
+                "summary TEXT NOT NULL, skills TEXT, video TEXT, created_by TEXT, created_at TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn.row_factory = sqlite3.Row
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _to_dict(self, row):
+        return format_profile(dict(row), datetime.fromisoformat(row["created_at"]))
+
+    def get(self, slug):
+        row = self._connect().execute("SELECT * FROM cv_profiles WHERE slug = ?", (slug,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_many(self, slugs):
+        slugs = list(slugs)
+        if not slugs:
+            return {}
+        placeholders = ",".join("?" * len(slugs))
+        rows = self._connect().execute(f"SELECT * FROM cv_profiles WHERE slug IN ({placeholders})", slugs).fetchall()
+        return {row["slug"]: self._to_dict(row) for row in rows}
+
+    def put(self, slug, profile):
+        self.put_many([(slug, profile)])
+
+    def put_many(self, items):
+        created_at = datetime.utcnow().isoformat()
+        rows = [
+            [slug] + [profile.get(field) for field in PROFILE_FIELDS] + [created_at]
+            for slug, profile in items
+        ]
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    f"INSERT INTO cv_profiles (slug, {', '.join(PROFILE_FIELDS)}, created_at) "
+                    f"VALUES ({','.join('?' * (len(PROFILE_FIELDS) + 2))})",
+                    rows
+                )
+        except sqlite3.IntegrityError as e:
+            if 'slug' in str(e).lower():
+                raise ProfileExists(str(e)) from e
+            raise
+
+
+class MemoryProfileStore(ProfileStore):
+    """Process-local dict, for tests and benchmarks."""
+
+    def __init__(self):
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def get(self, slug):
+        return self._profiles.get(slug)
+
+    def put(self, slug, profile):
+        self.put_many([(slug, profile)])
+
+    def put_many(self, items):
+        created_at = datetime.utcnow()
+        with self._lock:
+            taken = [slug for slug, _ in items if slug in self._profiles]
+            if taken:
+                raise ProfileExists(", ".join(taken))
+            for slug, profile in items:
+                self._profiles[slug] = format_profile(profile, created_at)
+
+
+class CachedProfileStore(ProfileStore):
+    """Read-through cache in front of another store; writes invalidate."""
+
+    def __init__(self, store, cache):
+        self.store = store
+        self.cache = cache
+
+    def get(self, slug):
+        return self.cache.get_or_load(slug, lambda: self.store.get(slug))
+
+    def get_many(self, slugs):
+        profiles = {}
+        missing = []
+        for slug in slugs:
+            profile = self.cache.get(slug)
+            if profile is None:
+                missing.append(slug)
+            else:
+                profiles[slug] = profile
+        for slug, profile in self.store.get_many(missing).items():
+            self.cache.set(slug, profile)
+            profiles[slug] = profile
+        return profiles
+
+    def put(self, slug, profile):
+        try:
+            self.store.put(slug, profile)
+        finally:
+            self.cache.invalidate(slug)
+
+    def put_many(self, items):
+        try:
+            self.store.put_many(items)
+        finally:
+            for slug, _ in items:
+                self.cache.invalidate(slug)
+
+
+def make_profile_store(database_url, cache=None):
+    """Build the store selected by PROFILE_STORE (sql, replit, sqlite or memory).
+
+    Defaults to the SQL database when DATABASE_URL is set and Replit DB
+    otherwise, matching the app's original behaviour.
+    """
+    kind = os.environ.get("PROFILE_STORE", "sql" if database_url else "replit").lower()
+
+    if kind == "sql":
+        store = SQLAlchemyProfileStore()
+    elif kind == "sqlite":
+        store = SQLiteProfileStore(os.environ.get("PROFILE_STORE_PATH", "profiles.sqlite3"))
+    elif kind == "memory":
+        store = MemoryProfileStore()
+    else:
+        store = ReplitProfileStore()
+
+    logger.info("Using %s for CV profiles", type(store).__name__)
+    return CachedProfileStore(store, cache) if cache is not None else store